@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the latency histograms and slow-request log cover the whole stack
+    'legal_engine.middleware.request_timing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,12 +80,74 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE=sqlite (default) or postgresql. See `manage.py benchmark_db_writes`
+# for write throughput under each configuration.
+
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite').lower()
+
+if DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DATABASE_NAME') or BASE_DIR / 'db.sqlite3',
+        }
     }
-}
+    if os.getenv('SQLITE_TUNING', '1') != '0':
+        DATABASES['default']['OPTIONS'] = {
+            # journal_mode=WAL is persistent: it is written into the database file, which
+            # is why db.sqlite3 is not tracked (`manage.py migrate` creates it).
+            # WAL: readers never block the writer (or each other); with it, synchronous=NORMAL
+            # is still crash-safe and only fsyncs at checkpoints. busy_timeout makes a
+            # connection wait for the write lock instead of failing with "database is locked".
+            'init_command': ';'.join([
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+                f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+            ]),
+            # Transactions take the write lock at BEGIN. A deferred transaction that reads
+            # first and then writes can't wait for the lock (it would deadlock), so it fails
+            # at once, busy_timeout or not.
+            'transaction_mode': 'IMMEDIATE',
+        }
+elif DATABASE_ENGINE in ('postgresql', 'postgres'):
+    # Needs psycopg 3 (`pip install "psycopg[binary,pool]"`).
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DATABASE_NAME', 'modaqiq'),
+            'USER': os.getenv('DATABASE_USER', ''),
+            'PASSWORD': os.getenv('DATABASE_PASSWORD', ''),
+            'HOST': os.getenv('DATABASE_HOST', ''),
+            'PORT': os.getenv('DATABASE_PORT', ''),
+        }
+    }
+    DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', '0'))
+    if DATABASE_POOL_MAX_SIZE:
+        # One psycopg connection pool per process, shared by its threads.
+        # (Django refuses CONN_MAX_AGE together with a pool.)
+        # Each of gemini_service's two thread pools can hold one connection per thread
+        # while its tasks run (they hand it back afterwards), and the request or worker
+        # thread waiting on those tasks holds its own: a smaller pool can starve.
+        pool_floor = 2 * int(os.getenv('GEMINI_MAX_CONCURRENCY', '8')) + 1
+        if DATABASE_POOL_MAX_SIZE < pool_floor:
+            raise ImproperlyConfigured(
+                f"DATABASE_POOL_MAX_SIZE={DATABASE_POOL_MAX_SIZE} is below {pool_floor} "
+                f"(2 * GEMINI_MAX_CONCURRENCY + 1); raise it or lower GEMINI_MAX_CONCURRENCY"
+            )
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+                'max_size': DATABASE_POOL_MAX_SIZE,
+                'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+            },
+        }
+    else:
+        # Persistent connection per thread, checked before reuse after a request
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DATABASE_CONN_MAX_AGE', '60'))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    raise ImproperlyConfigured(f"Unsupported DATABASE_ENGINE {DATABASE_ENGINE!r} (expected 'sqlite' or 'postgresql')")
 
 
 # Password validation
@@ -122,3 +189,19 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+
+# Uploads go to temp files and are hashed while streaming (content-addressed storage, see services/blob_store.py)
+FILE_UPLOAD_HANDLERS = ['legal_engine.uploads.HashingUploadHandler']
+
+
+# Application logs (slow requests, Gemini configuration) go to stderr; see legal_engine/middleware.py
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'legal_engine': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
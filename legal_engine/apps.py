@@ -1,5 +1,19 @@
+import signal
+import threading
+
 from django.apps import AppConfig
 
 
 class LegalEngineConfig(AppConfig):
     name = 'legal_engine'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - connects the receivers
+        from .services.gemini_service import get_gemini_service
+
+        # Build the shared Gemini client once per process instead of per request.
+        get_gemini_service()
+
+        # `kill -HUP <pid>` reloads the Gemini configuration without a restart.
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: get_gemini_service().reload())
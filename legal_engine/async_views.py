@@ -0,0 +1,285 @@
+"""
+Native async views for the endpoints that spend their time waiting (uploads,
+Gemini). They are routed ahead of CaseViewSet in legal_engine/urls.py: DRF views
+are sync-only, and under ASGI every request they serve holds a thread until it
+returns. Here a submission waiting on its analysis costs an event-loop task.
+
+The ORM work stays short and goes through Django's async API; multi-statement
+transactions (which the async ORM cannot open) run as one sync_to_async call.
+
+Serve the project with an ASGI server (e.g. `uvicorn core.asgi:application`) to get
+those savings. Under WSGI (runserver, gunicorn's sync workers) the views still work,
+and the event stream is bridged to a sync iterator so it is not buffered.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .models import AnalysisJob, Case, ValidationResult
+from .serializers import CaseSerializer
+from .services.analysis_jobs import claim_case_job, enqueue_analysis, stream_job
+from .services.blob_store import attach_documents, store_upload
+from .services.logic_engine import RuleValidator
+from .services.metrics import span
+from .views import analysis_payload
+
+# While the worker (not the stream) runs a case's analysis, the stream checks
+# on it this often and gives up after STREAM_MAX_SECONDS (the client then polls).
+STREAM_POLL_SECONDS = 1.0
+STREAM_MAX_SECONDS = 120
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _not_found():
+    return JsonResponse({"detail": "No Case matches the given query."}, status=404)
+
+
+class _CSRFCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        return reason
+
+
+def _csrf_failure(request):
+    """The reason the request fails Django's CSRF check, or None if it passes."""
+    check = _CSRFCheck(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def session_csrf_protect(view):
+    """
+    CSRF protection as DRF's SessionAuthentication applied it to these endpoints:
+    requests of a logged-in session (the judges' dashboard) must pass the CSRF
+    check; API clients without a session are not asked for a token.
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def protected(request, *args, **kwargs):
+        user = await request.auser()
+        if user.is_authenticated:
+            # May read a multipart body for the form token, so off the event loop
+            reason = await asyncio.to_thread(_csrf_failure, request)
+            if reason:
+                return JsonResponse({"detail": f"CSRF Failed: {reason}"}, status=403)
+        return await view(request, *args, **kwargs)
+    return protected
+
+
+def _read_submission(request):
+    """
+    (data, uploads) of a submission: JSON body, or a form (multipart or
+    urlencoded) with the case as a JSON 'data' field or as plain fields. Parsing
+    a multipart body streams the uploads to temporary files
+    (HashingUploadHandler), so it runs off the event loop.
+    """
+    if request.content_type in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        files = request.FILES.getlist('documents')
+        if 'data' in request.POST:
+            return json.loads(request.POST['data']), files
+        return request.POST.dict(), files
+    return json.loads(request.body or b'{}'), []
+
+
+def _save_submission(serializer, stored):
+    with transaction.atomic():
+        # Save Case as Draft
+        case = serializer.save()
+        with span('document_attach'):
+            attach_documents(case, stored)
+
+        # Run Logic Engine (fast, deterministic - stays in the request) on typed facts
+        with span('rules'):
+            validation_output = RuleValidator().validate_case(serializer.build_facts())
+
+        # Save Result; the Gemini fields are filled in later (stream or analysis worker)
+        with span('result_write'):
+            result = ValidationResult.objects.create(
+                case=case,
+                is_accepted=validation_output['is_valid'],
+                rejection_reasons=validation_output['reasons'],
+                confidence_score=0.95 # Mock high confidence
+            )
+            job = enqueue_analysis(case)
+
+            case.status = Case.CaseStatus.SUBMITTED
+            case.save()
+    return case, result, job
+
+
+@session_csrf_protect
+@require_POST
+async def submit_and_validate(request):
+    """
+    Main Endpoint: Receives case data -> Saves Draft -> Runs Logic Engine -> Queues Gemini -> Returns 202
+    """
+    try:
+        data, uploads = await asyncio.to_thread(_read_submission, request)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON in 'data' field"}, status=400)
+
+    serializer = CaseSerializer(data=data)
+    with span('validate'):
+        valid = await sync_to_async(serializer.is_valid)()
+    if not valid:
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        # Uploads were hashed while streaming in; identical files share one blob on disk.
+        # Stored before the transaction so file writes never hold the write lock.
+        with span('document_store'):
+            stored = [(await sync_to_async(store_upload)(f), f.name) for f in uploads]
+        case, result, job = await sync_to_async(_save_submission)(serializer, stored)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    # Return immediately; the client follows stream_url (or polls analysis_url) for the AI part
+    response_data = analysis_payload(case, result, job)
+    response_data["analysis_url"] = request.build_absolute_uri(reverse('case-analysis', kwargs={'pk': case.pk}))
+    response_data["stream_url"] = request.build_absolute_uri(reverse('case-stream', kwargs={'pk': case.pk}))
+    return JsonResponse(response_data, status=202)
+
+
+@session_csrf_protect
+@require_POST
+async def approve_case(request, pk):
+    case = await Case.objects.filter(pk=pk).afirst()
+    if case is None:
+        return _not_found()
+    case.status = Case.CaseStatus.APPROVED
+    await case.asave()
+    return JsonResponse({'status': 'Approved', 'case_id': case.id})
+
+
+@session_csrf_protect
+@require_POST
+async def reject_case(request, pk):
+    case = await Case.objects.filter(pk=pk).afirst()
+    if case is None:
+        return _not_found()
+    # Ideally store the reason (request body 'reason') in a log or field
+    case.status = Case.CaseStatus.REJECTED
+    await case.asave()
+    return JsonResponse({'status': 'Rejected', 'case_id': case.id})
+
+
+@require_GET
+async def stream(request, pk):
+    """
+    GET /api/cases/{id}/stream/ (Server-Sent Events)
+    `validation` (the rule results) is sent at once; then `reasoning` events carry the
+    Gemini reasoning as it is written, `analysis` the full analysis, and `done` the
+    final payload. If the worker already holds the job, its result is relayed when ready.
+    """
+    case = await Case.objects.filter(pk=pk).afirst()
+    result = await ValidationResult.objects.filter(case_id=pk).afirst() if case else None
+    if result is None:
+        error = "No Case matches the given query." if case is None else "Case has not been validated yet"
+        return StreamingHttpResponse([sse_event('error', {"error": error})], status=404,
+                                     content_type='text/event-stream')
+
+    events = _stream_events(case, result)
+    if isinstance(request, WSGIRequest):
+        # WSGI handlers collect an async iterator completely before sending it
+        events = _iterate_in_own_loop(events)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx must not buffer the events
+    return response
+
+
+_END = object()
+
+
+def _iterate_in_own_loop(events):
+    """
+    Sync iterator over an async one: the async iterator runs as one task on an event
+    loop in a thread of its own, with its own thread for sync_to_async calls (as a
+    request under ASGI), and hands each item over as soon as it is produced.
+    Closing the iterator (the client went away) cancels that task.
+    """
+    items, started, failure = queue.Queue(), threading.Event(), []
+    running = {}
+
+    async def pump():
+        running['loop'], running['task'] = asyncio.get_running_loop(), asyncio.current_task()
+        started.set()
+        try:
+            async with ThreadSensitiveContext():
+                try:
+                    async for item in events:
+                        items.put(item)
+                finally:
+                    # The context's thread ends with the stream; so must its connection.
+                    await sync_to_async(connections.close_all)()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            failure.append(e)
+        finally:
+            items.put(_END)
+
+    thread = threading.Thread(target=asyncio.run, args=(pump(),), name='event-stream', daemon=True)
+    thread.start()
+    try:
+        while (item := items.get()) is not _END:
+            yield item
+        if failure:
+            raise failure[0]
+    finally:
+        started.wait()
+        try:
+            running['loop'].call_soon_threadsafe(running['task'].cancel)
+        except RuntimeError:
+            pass  # the stream had already ended and its loop is closed
+        thread.join()
+
+
+async def _stream_events(case, result):
+    job = await case.analysis_jobs.order_by('-id').afirst()
+    yield sse_event('validation', analysis_payload(case, result, job))
+
+    claimed = await sync_to_async(claim_case_job)(case)
+    if claimed is not None:
+        async for event, data in stream_job(claimed):
+            if event == 'reasoning':
+                yield sse_event('reasoning', {"delta": data})
+            elif event == 'analysis':
+                yield sse_event('analysis', {"analysis": data})
+            elif event == 'error':
+                yield sse_event('error', {"error": data})
+                return
+        job = claimed
+    else:
+        # The worker (or another stream) has it: relay the outcome once stored.
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while job is not None and job.status not in (AnalysisJob.JobStatus.DONE, AnalysisJob.JobStatus.FAILED):
+            if time.monotonic() > deadline:
+                yield sse_event('timeout', {"analysis_url": reverse('case-analysis', kwargs={'pk': case.pk})})
+                return
+            yield ": waiting\n\n"  # comment line; keeps proxies from closing the connection
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+            await job.arefresh_from_db(fields=['status', 'error'])
+        if job is not None and job.status == AnalysisJob.JobStatus.FAILED:
+            yield sse_event('error', {"error": job.error})
+            return
+        await result.arefresh_from_db(fields=['ai_analysis', 'generated_reasoning'])
+        yield sse_event('reasoning', {"delta": result.generated_reasoning})
+        yield sse_event('analysis', {"analysis": result.ai_analysis})
+
+    await result.arefresh_from_db(fields=['ai_analysis', 'generated_reasoning'])
+    yield sse_event('done', analysis_payload(case, result, job))
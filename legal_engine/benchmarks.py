@@ -0,0 +1,252 @@
+"""
+Microbenchmarks of the submission hot path, run by `manage.py benchmark`.
+
+Each benchmark is a function that prepares its inputs and returns the callable
+to time. Benchmarks that touch the database run inside one transaction that is
+rolled back at the end, so they can be pointed at any database.
+"""
+import datetime
+import platform
+import statistics
+import timeit
+from typing import Callable, Dict, List, NamedTuple
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.test import Client
+
+from .models import AnalysisJob, Case, ValidationResult
+from .serializers import CaseSerializer, ValidationResultSerializer
+from .services.analysis_jobs import claim_case_job, run_job
+from .services.arabic_text import KeywordAutomaton
+from .services.case_facts import CaseFacts
+from .services.gemini_service import AIResult
+from .services.logic_engine import RuleValidator
+from .services.party_resolver import PartyResolver
+from .services.rule_registry import MandatoryGrievanceRule, rule_registry
+
+# A benchmark regresses when its median time per call exceeds the baseline's by more than this
+DEFAULT_THRESHOLD = 0.25
+
+GRIEVANCE_KEYWORDS = ['ترقية', 'تاديب', 'فصل', 'خدمة مدنية', 'عسكرية', 'راتب']
+SHORT_DESCRIPTION = "تظلم من قرار فصل تعسفي صادر من جهة حكومية دون سابق إنذار أو تحقيق."
+# ~250 KB of pleading text without any keyword, so the scan has to read all of it
+LONG_DESCRIPTION = "وحيث إن المدعي قد تقدم بطلب إلى الجهة المختصة ولم يتلق رداً حتى تاريخه. " * 3500
+
+
+class Benchmark(NamedTuple):
+    name: str
+    prepare: Callable[[], Callable[[], object]]
+    uses_db: bool
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, uses_db: bool = False):
+    def register(prepare):
+        BENCHMARKS.append(Benchmark(name, prepare, uses_db))
+        return prepare
+    return register
+
+
+def case_payload(i: int = 0) -> dict:
+    incident_date = datetime.date.today() - datetime.timedelta(days=10 + i % 90)
+    return {
+        'title': f"Benchmark case {i}",
+        'description': SHORT_DESCRIPTION,
+        'incident_date': incident_date.isoformat(),
+        'grievance_date': incident_date.isoformat() if i % 3 else None,
+        'court_type': "Administrative",
+        'plaintiff': {'name': f"Benchmark Plaintiff {i % 50}", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+        'defendant': {'name': "Ministry of Benchmarks", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+    }
+
+
+def _grievance_automaton() -> KeywordAutomaton:
+    for rule in rule_registry.get_rules():
+        if isinstance(rule, MandatoryGrievanceRule):
+            return rule.automaton
+    return KeywordAutomaton(GRIEVANCE_KEYWORDS)
+
+
+# --- Logic engine ------------------------------------------------------------
+
+@benchmark('rules.validate_case')
+def bench_validate_case():
+    validator = RuleValidator()
+    validator.rules  # compile once, outside the timing
+    facts = CaseFacts.from_mapping(case_payload(1))
+    return lambda: validator.validate_case(facts)
+
+
+@benchmark('rules.validate_case_from_mapping')
+def bench_validate_case_mapping():
+    validator = RuleValidator()
+    validator.rules
+    data = case_payload(1)
+    return lambda: validator.validate_case(data)
+
+
+@benchmark('rules.validate_many_1k')
+def bench_validate_many():
+    validator = RuleValidator()
+    validator.rules
+    facts = [CaseFacts.from_mapping(case_payload(i)) for i in range(1000)]
+    return lambda: validator.validate_many(facts)
+
+
+@benchmark('keywords.scan_short')
+def bench_scan_short():
+    automaton = _grievance_automaton()
+    return lambda: automaton.find_all(SHORT_DESCRIPTION)
+
+
+@benchmark('keywords.scan_long')
+def bench_scan_long():
+    automaton = _grievance_automaton()
+    return lambda: automaton.contains_any(LONG_DESCRIPTION)
+
+
+# --- Serializers -------------------------------------------------------------
+
+@benchmark('serializer.validate', uses_db=True)
+def bench_serializer_validate():
+    data = case_payload(2)
+    return lambda: CaseSerializer(data=data).is_valid(raise_exception=True)
+
+
+@benchmark('serializer.create', uses_db=True)
+def bench_serializer_create():
+    data = case_payload(2)
+
+    def create():
+        serializer = CaseSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+    return create
+
+
+def _seed_cases(count: int) -> List[int]:
+    plaintiff, defendant = PartyResolver().resolve_many([case_payload(0)['plaintiff'], case_payload(0)['defendant']])
+    cases = Case.objects.bulk_create([
+        Case(title=f"Benchmark case {i}", description=SHORT_DESCRIPTION, incident_date=datetime.date.today(),
+             court_type="Administrative", plaintiff=plaintiff, defendant=defendant,
+             status=Case.CaseStatus.PENDING_JUDGE)
+        for i in range(count)
+    ], batch_size=1000)
+    ValidationResult.objects.bulk_create([
+        ValidationResult(case=case, is_accepted=bool(i % 2), ai_analysis="تحليل " * 200,
+                         generated_reasoning="بناءً على ما تقدم " * 50,
+                         ai_status=ValidationResult.AIStatus.COMPLETE)
+        for i, case in enumerate(cases)
+    ], batch_size=1000)
+    return [case.pk for case in cases]
+
+
+def _list_benchmark(count: int):
+    ids = _seed_cases(count)
+    # Same queryset and serializer options as GET /api/cases/ (large AI texts left out)
+    queryset = (
+        Case.objects.filter(pk__in=ids)
+        .select_related('plaintiff', 'defendant', 'validation_result')
+        .defer(*[f'validation_result__{name}' for name in ValidationResultSerializer.LARGE_FIELDS])
+        .order_by('-submission_date', '-id')
+    )
+    return lambda: CaseSerializer(queryset, many=True, expand=set()).data
+
+
+@benchmark('serializer.list_1k', uses_db=True)
+def bench_list_1k():
+    return _list_benchmark(1000)
+
+
+@benchmark('serializer.list_10k', uses_db=True)
+def bench_list_10k():
+    return _list_benchmark(10000)
+
+
+# --- End to end --------------------------------------------------------------
+
+class _StubGemini:
+    """Answers instantly, so the end-to-end run measures our code, not the model."""
+
+    def analyze_and_reason(self, text, case_data, validation_result, reasoning=None):
+        return AIResult("تحليل تجريبي", reasoning or "بناءً على ما تقدم")
+
+
+@benchmark('submit.end_to_end', uses_db=True)
+def bench_submit_end_to_end():
+    # Any host the settings accept ('localhost' is accepted by default under DEBUG)
+    host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+    client = Client(HTTP_HOST=host)
+    gemini = _StubGemini()
+    data = case_payload(3)
+
+    def submit():
+        response = client.post('/api/cases/submit_and_validate/', data, content_type='application/json')
+        assert response.status_code == 202, response.content
+        case = Case.objects.get(pk=response.json()['case_id'])
+        job = run_job(claim_case_job(case), gemini=gemini)
+        assert job.status == AnalysisJob.JobStatus.DONE, job.error
+    return submit
+
+
+# --- Runner ------------------------------------------------------------------
+
+def measure(func: Callable[[], object], repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Seconds per call: `repeat` rounds, each long enough (>= min_time) to be timed reliably."""
+    timer = timeit.Timer(func)
+    number, elapsed = 1, timer.timeit(1)  # also warms caches
+    if elapsed < min_time:
+        number = max(1, int(min_time / max(elapsed, 1e-9)))
+    rounds = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'median': statistics.median(rounds),
+        'min': min(rounds),
+        'mean': statistics.fmean(rounds),
+        'stdev': statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        'calls_per_round': number,
+        'rounds': repeat,
+    }
+
+
+def run_benchmarks(selected: List[Benchmark], repeat: int = 5, progress: Callable[[str], None] = None) -> dict:
+    results = {}
+    with transaction.atomic():
+        for bench in selected:
+            # Each DB benchmark starts from the same (empty) state
+            sid = transaction.savepoint() if bench.uses_db else None
+            results[bench.name] = measure(bench.prepare(), repeat=repeat)
+            if sid is not None:
+                transaction.savepoint_rollback(sid)
+            if progress:
+                progress(bench.name)
+        transaction.set_rollback(True)
+    return {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.platform(),
+        'benchmarks': results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Annotates each result with its ratio to the baseline median and returns the
+    names that regressed. A baseline entry may carry its own "threshold".
+    """
+    regressions = []
+    for name, result in report['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base:
+            continue
+        limit = base.get('threshold', threshold)
+        result['baseline_median'] = base['median']
+        result['ratio'] = result['median'] / base['median']
+        result['regressed'] = result['ratio'] > 1 + limit
+        if result['regressed']:
+            regressions.append(name)
+    return regressions
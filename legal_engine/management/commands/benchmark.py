@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from legal_engine.benchmarks import BENCHMARKS, DEFAULT_THRESHOLD, compare, run_benchmarks
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'legal_engine' / 'benchmark_baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Runs the microbenchmarks and fails if any is slower than the stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', default=[],
+                            help='Run benchmarks whose name starts with this prefix (repeatable)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed rounds per benchmark')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON to compare against')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Allowed slowdown of the median, as a fraction (0.25 = 25%%)')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store these results as the new baseline instead of comparing')
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for bench in BENCHMARKS:
+                self.stdout.write(bench.name)
+            return
+
+        prefixes = options['only']
+        selected = [b for b in BENCHMARKS if not prefixes or b.name.startswith(tuple(prefixes))]
+        if not selected:
+            raise CommandError(f"No benchmark matches {', '.join(prefixes)}")
+
+        report = run_benchmarks(selected, repeat=options['repeat'],
+                                progress=lambda name: self.stderr.write(f"  {name}"))
+
+        baseline_path = Path(options['baseline'])
+        regressions = []
+        if options['update_baseline']:
+            baseline = self._load(baseline_path) if baseline_path.exists() else {'benchmarks': {}}
+            for name, result in report['benchmarks'].items():
+                # Per-benchmark thresholds are hand-tuned; keep them across updates
+                previous = baseline['benchmarks'].get(name, {})
+                entry = {'median': result['median']}
+                if 'threshold' in previous:
+                    entry['threshold'] = previous['threshold']
+                baseline['benchmarks'][name] = entry
+            baseline.update({key: value for key, value in report.items() if key != 'benchmarks'})
+            baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f"Baseline written to {baseline_path}")
+        elif baseline_path.exists():
+            regressions = compare(report, self._load(baseline_path), options['threshold'])
+
+        for name, result in report['benchmarks'].items():
+            line = f"{name:<36} {result['median'] * 1000:>10.3f} ms  (min {result['min'] * 1000:.3f})"
+            if 'ratio' in result:
+                line += f"  x{result['ratio']:.2f} vs baseline"
+            self.stdout.write(self.style.ERROR(line) if result.get('regressed') else line)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+
+        if regressions:
+            raise CommandError(f"Slower than the baseline by more than the threshold: {', '.join(regressions)}")
+
+    @staticmethod
+    def _load(path: Path) -> dict:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
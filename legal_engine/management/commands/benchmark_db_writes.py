@@ -0,0 +1,168 @@
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+from legal_engine.models import Case, Party, ValidationResult
+from legal_engine.services.analysis_jobs import enqueue_analysis
+from legal_engine.services.party_resolver import PartyResolver
+
+# Environment of each profile. The SQLite ones use a fresh temporary database;
+# 'configured' runs against the database the settings point at.
+PROFILES = {
+    'sqlite-default': {'DATABASE_ENGINE': 'sqlite', 'SQLITE_TUNING': '0'},
+    'sqlite-tuned': {'DATABASE_ENGINE': 'sqlite', 'SQLITE_TUNING': '1'},
+    'configured': {},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures concurrent submission-shaped write transactions (parties, case, result, job) '
+        'per second under each database configuration'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                            help="Profiles to run (default: both SQLite ones, plus 'configured' "
+                                 "when DATABASE_ENGINE is not sqlite)")
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--readers', type=int, default=2, help='Concurrent threads listing cases meanwhile')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        # Internal: run one profile in this process (the settings are read from the environment)
+        parser.add_argument('--run', action='store_true', help='(internal)')
+        parser.add_argument('--migrate', action='store_true', help='(internal)')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            result = self._run(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        profiles = options['profile'] or ['sqlite-default', 'sqlite-tuned'] + (
+            ['configured'] if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3' else []
+        )
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in profiles:
+                self.stderr.write(f"  {name}...")
+                results[name] = self._spawn(name, Path(tmp), options)
+
+        self.stdout.write(f"{'profile':<16} {'tx/s':>8} {'ok':>6} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'reads/s':>8}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<16} {r['throughput']:>8.1f} {r['committed']:>6} {r['locked']:>7} "
+                f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['max_ms']:>8.1f} {r['reads_per_second']:>8.1f}"
+            )
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+
+    def _spawn(self, name, tmp: Path, options) -> dict:
+        """Runs a profile in a child process, since the database settings are fixed at startup."""
+        env = dict(os.environ, **PROFILES[name])
+        args = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'benchmark_db_writes', '--run',
+                '--writers', str(options['writers']), '--readers', str(options['readers']),
+                '--seconds', str(options['seconds'])]
+        if name != 'configured':
+            env['DATABASE_NAME'] = str(tmp / f'{name}.sqlite3')
+            args.append('--migrate')
+        proc = subprocess.run(args, env=env, capture_output=True, text=True)
+        if proc.returncode:
+            raise CommandError(f"Profile {name} failed:\n{proc.stderr}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def _run(self, options) -> dict:
+        if options['migrate']:
+            call_command('migrate', verbosity=0)
+        run_id = uuid.uuid4().hex[:8]
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies, errors, reads = [], [], [0]
+
+        def writer(n):
+            payloads = [
+                {'name': f"db-benchmark {run_id} plaintiff {n}", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+                {'name': f"db-benchmark {run_id} ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+            ]
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        # Same statements as a submission (see async_views._save_submission)
+                        with transaction.atomic():
+                            plaintiff, defendant = PartyResolver().resolve_many(payloads)
+                            case = Case.objects.create(
+                                title=f"db-benchmark {run_id}", description="تظلم من قرار فصل",
+                                incident_date=datetime.date.today(), court_type="Administrative",
+                                plaintiff=plaintiff, defendant=defendant,
+                            )
+                            ValidationResult.objects.create(case=case, is_accepted=True, rejection_reasons=[])
+                            enqueue_analysis(case)
+                            case.status = Case.CaseStatus.SUBMITTED
+                            case.save()
+                    except OperationalError as e:
+                        with lock:
+                            errors.append(str(e))
+                    else:
+                        with lock:
+                            latencies.append(time.perf_counter() - started)
+                    # End of "request": the connection is kept or closed as CONN_MAX_AGE says
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    list(Case.objects.select_related('plaintiff', 'defendant').order_by('-id')[:50])
+                    with lock:
+                        reads[0] += 1
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        if not options['migrate']:
+            # Shared database: remove the benchmark's rows (cases cascade from their parties)
+            Party.objects.filter(name__startswith=f"db-benchmark {run_id} ").delete()
+
+        ms = sorted(latency * 1000 for latency in latencies) or [0.0]
+        return {
+            'database': connection.vendor,
+            'options': {key: value for key, value in settings.DATABASES['default'].items()
+                        if key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')},
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'seconds': round(elapsed, 3),
+            'committed': len(latencies),
+            'locked': len(errors),
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': statistics.median(ms),
+            'p95_ms': ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+            'max_ms': ms[-1],
+            'reads_per_second': reads[0] / elapsed,
+            'first_error': errors[0] if errors else None,
+        }
@@ -0,0 +1,96 @@
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from legal_engine.models import Case, CasePrecedent
+from legal_engine.services.similarity import similarity_index
+
+
+@contextmanager
+def exclusive_lock(path):
+    """
+    Holds a non-blocking OS lock on `path` for the duration of the block; raises
+    CommandError if another process holds it. The OS drops it if we crash.
+    """
+    with open(path, 'a+') as lock:
+        lock.seek(0)  # msvcrt locks bytes from the current position
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt  # Windows
+            acquire = lambda: msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+            release = lambda: msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            acquire = lambda: fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            release = lambda: fcntl.flock(lock, fcntl.LOCK_UN)
+        try:
+            acquire()
+        except OSError:
+            raise CommandError('Another build_similarity_index is running')
+        try:
+            yield
+        finally:
+            release()
+
+
+class Command(BaseCommand):
+    help = 'Builds or extends the similar-case index and precomputes each new case\'s precedents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Start over (recomputes IDF from the whole corpus and every precedent)')
+        parser.add_argument('--batch-size', type=int, default=1024)
+        parser.add_argument('--top-k', type=int, default=5, help='Precedents stored per case')
+
+    def handle(self, *args, **options):
+        index = similarity_index
+        index.path.mkdir(parents=True, exist_ok=True)
+        with exclusive_lock(index.path / 'build.lock'):
+            self._build(index, options)
+
+    def _build(self, index, options):
+        started = time.monotonic()
+        index.open_for_writing(rebuild=options['rebuild'])
+        cases = Case.objects.order_by('id')
+
+        if options['rebuild']:
+            # IDF over the whole corpus first, so every row is weighted the same way.
+            index.count_documents(cases.values_list('description', flat=True).iterator(chunk_size=5000))
+            CasePrecedent.objects.all().delete()
+
+        last_id = int(index.case_ids[-1]) if len(index) else 0
+        added = 0
+        while True:
+            batch = list(cases.filter(id__gt=last_id).values_list('id', 'description')[:options['batch_size']])
+            if not batch:
+                break
+            case_ids = [case_id for case_id, _ in batch]
+            descriptions = [description for _, description in batch]
+            if not options['rebuild']:
+                index.count_documents(descriptions)
+
+            base = len(index)
+            index.append(case_ids, index.vectorize(descriptions))
+            # Precedents of each new row: every row indexed before it (earlier cases only).
+            neighbours = index.top_k(
+                index.vectors[base:], options['top_k'], row_limits=range(base, base + len(batch)),
+            )
+            with transaction.atomic():
+                CasePrecedent.objects.filter(case_id__in=case_ids).delete()
+                CasePrecedent.objects.bulk_create([
+                    CasePrecedent(case_id=case_id, precedent_id=precedent_id, similarity=similarity, rank=rank)
+                    for case_id, found in zip(case_ids, neighbours)
+                    for rank, (precedent_id, similarity) in enumerate(found, start=1)
+                ])
+            index.publish()
+
+            added += len(batch)
+            last_id = case_ids[-1]
+            self.stdout.write(f"... {added} case(s) indexed, {len(index)} in total")
+
+        index.publish()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {added} new case(s) ({len(index)} total) in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from legal_engine.models import LLMCacheEntry
+from legal_engine.services.llm_cache import llm_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows, prunes or clears the persistent LLM response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Drop expired and least recently used entries')
+        parser.add_argument('--clear', action='store_true', help='Delete every cached response')
+        parser.add_argument('--template-version', help='With --clear, only drop entries of this prompt version')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            entries = LLMCacheEntry.objects.all()
+            if options['template_version']:
+                entries = entries.filter(template_version=options['template_version'])
+            deleted, _ = entries.delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} cached response(s)."))
+        elif options['prune']:
+            deleted = llm_cache.prune()
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} cached response(s)."))
+
+        now = timezone.now()
+        totals = LLMCacheEntry.objects.aggregate(entries=Count('id'), hits=Sum('hits'))
+        expired = LLMCacheEntry.objects.filter(expires_at__lte=now).count()
+        self.stdout.write(f"Entries: {totals['entries']} (expired: {expired})")
+        self.stdout.write(f"Persistent hits served: {totals['hits'] or 0}")
+        for row in LLMCacheEntry.objects.values('template_version').annotate(n=Count('id')).order_by('template_version'):
+            self.stdout.write(f"  {row['template_version']}: {row['n']}")
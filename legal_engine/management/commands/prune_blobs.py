@@ -0,0 +1,61 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from legal_engine.models import StoredBlob
+from legal_engine.services.blob_store import prune_unreferenced
+
+UPLOAD_DIRS = ('blobs', 'case_documents')
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored document blobs (and optionally stray upload files) no document refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Keep unreferenced blobs younger than this (uploads still in flight)')
+        parser.add_argument('--orphan-files', action='store_true',
+                            help=f"Also delete files under {', '.join(UPLOAD_DIRS)}/ that no blob points at")
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        verb = 'Would delete' if dry_run else 'Deleted'
+
+        removed, freed = prune_unreferenced(timedelta(minutes=options['grace_minutes']), dry_run=dry_run)
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} unreferenced blob(s), {freed:,} bytes."))
+
+        if options['orphan_files']:
+            removed, freed = self._prune_orphan_files(options['grace_minutes'] * 60, dry_run)
+            self.stdout.write(self.style.SUCCESS(f"{verb} {removed} orphan file(s), {freed:,} bytes."))
+
+        totals = StoredBlob.objects.aggregate(blobs=Count('id'), size=Sum('size'), refs=Sum('ref_count'))
+        self.stdout.write(
+            f"Blobs: {totals['blobs']} ({totals['size'] or 0:,} bytes) referenced by {totals['refs'] or 0} document(s)"
+        )
+
+    def _prune_orphan_files(self, grace_seconds, dry_run):
+        # Compared by path below MEDIA_ROOT; the media dirs only ever hold uploads.
+        # Recent files may belong to an upload whose blob row is not committed yet.
+        cutoff = time.time() - grace_seconds
+        known = set(StoredBlob.objects.values_list('file', flat=True))
+        removed = freed = 0
+        for upload_dir in UPLOAD_DIRS:
+            root = os.path.join(settings.MEDIA_ROOT, upload_dir)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                    if name in known or os.path.getmtime(path) > cutoff:
+                        continue
+                    freed += os.path.getsize(path)
+                    removed += 1
+                    if dry_run:
+                        self.stdout.write(f"  {name}")
+                    else:
+                        os.remove(path)
+        return removed, freed
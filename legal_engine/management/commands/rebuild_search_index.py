@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from legal_engine.models import Case, SearchDocument
+from legal_engine.services.search import FTS_TABLE, INDEX_BATCH_SIZE, SQLiteFTSBackend, index_cases
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the case search index from scratch (after analyzer changes or index drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=INDEX_BATCH_SIZE * 10)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        SearchDocument.objects.all().delete()
+
+        indexed = last_id = 0
+        while True:
+            batch = list(
+                Case.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            indexed += index_cases(batch)
+            last_id = batch[-1]
+            self.stdout.write(f"... {indexed} case(s) indexed")
+
+        if SQLiteFTSBackend.available():
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} case(s) in {time.monotonic() - started:.1f}s."
+        ))
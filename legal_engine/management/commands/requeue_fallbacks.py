@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from legal_engine.models import ValidationResult
+from legal_engine.services.analysis_jobs import requeue_fallbacks
+
+
+class Command(BaseCommand):
+    help = 'Queues a new Gemini analysis for results stored as fallbacks while Gemini was unavailable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Queue at most this many cases')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the fallback results')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = ValidationResult.objects.filter(ai_status=ValidationResult.AIStatus.FALLBACK).count()
+            self.stdout.write(f"{count} fallback result(s).")
+            return
+        queued = requeue_fallbacks(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {queued} analysis job(s); run `manage.py run_analysis_worker` to process them."
+        ))
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from legal_engine.models import Case, ValidationResult, Party
 from legal_engine.services.logic_engine import RuleValidator
-from legal_engine.services.gemini_service import GeminiService
+from legal_engine.services.gemini_service import get_gemini_service
 from django.utils import timezone
 import datetime
 
@@ -91,24 +91,21 @@ class Command(BaseCommand):
             }
             validation_output = validator.validate_case(logic_input)
             
-            # Gemini Service
-            gemini = GeminiService()
+            # Gemini Service (shared, process-wide instance)
+            gemini = get_gemini_service()
             # Only run AI if simple logic allows, or run anyway to see what it says
             # We'll run it for all to demonstrate
-            try:
-                ai_analysis = gemini.analyze_text(case.description)
-                reasoning = gemini.generate_reasoning(data, validation_output)
-            except Exception as e:
-                ai_analysis = f"Error: {e}"
-                reasoning = "Error"
+            # Falls back (and marks the result) by itself when Gemini is unavailable
+            ai = gemini.analyze_and_reason(case.description, data, validation_output)
 
             # Save Result
             ValidationResult.objects.create(
                 case=case,
                 is_accepted=validation_output.get('is_valid', True),
                 rejection_reasons=validation_output.get('reasons', []),
-                ai_analysis=ai_analysis,
-                generated_reasoning=reasoning,
+                ai_analysis=ai.analysis,
+                generated_reasoning=ai.reasoning,
+                ai_status=ValidationResult.AIStatus.FALLBACK if ai.fallback else ValidationResult.AIStatus.COMPLETE,
                 confidence_score=0.95
             )
             
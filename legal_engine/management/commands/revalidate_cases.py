@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from legal_engine.models import Case, ValidationResult
+from legal_engine.services.revalidation import CASE_FIELDS, init_worker, reason_codes, validate_chunk
+from legal_engine.services.rule_registry import rule_registry
+
+
+class Command(BaseCommand):
+    help = 'Re-runs the rule engine over existing cases in bounded memory (streamed, resumable, parallel)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Validation processes (0 = validate in this process)')
+        parser.add_argument('--checkpoint', help='JSON file recording the last processed case id')
+        parser.add_argument('--resume', action='store_true', help='Continue after the id stored in --checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Only list cases that would flip, write nothing')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.chunk_size = options['chunk_size']
+        self.state = {'last_id': 0, 'processed': 0, 'flipped': 0, 'written': 0}
+        if options['resume']:
+            if not options['checkpoint']:
+                self.stderr.write(self.style.ERROR('--resume needs --checkpoint'))
+                return
+            self._load_checkpoint()
+            self.stdout.write(f"Resuming after case #{self.state['last_id']}")
+
+        rules = rule_registry.get_rules()
+        self.started = time.monotonic()
+        self.session_processed = 0
+
+        chunks = self._stream_chunks(self.state['last_id'])
+        if options['workers'] > 0:
+            # Keep only a few chunks in flight so memory stays bounded on huge tables.
+            max_in_flight = options['workers'] * 2
+            in_flight = deque()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker, initargs=(rules,)) as pool:
+                for chunk in chunks:
+                    in_flight.append((chunk, pool.submit(validate_chunk, chunk)))
+                    if len(in_flight) >= max_in_flight:
+                        chunk, future = in_flight.popleft()
+                        self._apply(chunk, future.result())
+                while in_flight:
+                    chunk, future = in_flight.popleft()
+                    self._apply(chunk, future.result())
+        else:
+            init_worker(rules)
+            for chunk in chunks:
+                self._apply(chunk, validate_chunk(chunk))
+
+        verb = 'would flip' if options['dry_run'] else 'flipped'
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.state['processed']} case(s) checked, {self.state['flipped']} {verb}, "
+            f"{self.state['written']} result(s) written."
+        ))
+
+    def _stream_chunks(self, after_id):
+        rows = (
+            Case.objects.filter(id__gt=after_id)
+            .order_by('id')
+            .values(*CASE_FIELDS)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _apply(self, chunk, outputs):
+        existing = {
+            result.case_id: result
+            for result in ValidationResult.objects.filter(case_id__in=[row['id'] for row in chunk])
+            .only('id', 'case_id', 'is_accepted', 'rejection_reasons')
+        }
+
+        to_update, to_create = [], []
+        for row, output in zip(chunk, outputs):
+            result = existing.get(row['id'])
+            if result is None:
+                to_create.append(ValidationResult(
+                    case_id=row['id'],
+                    is_accepted=output['is_valid'],
+                    rejection_reasons=output['reasons'],
+                    confidence_score=0.95 # Mock high confidence
+                ))
+                continue
+
+            if result.is_accepted != output['is_valid']:
+                self.state['flipped'] += 1
+                if self.options['dry_run']:
+                    before = 'ACCEPTED' if result.is_accepted else 'REJECTED'
+                    after = 'ACCEPTED' if output['is_valid'] else 'REJECTED'
+                    self.stdout.write(f"Case #{row['id']}: {before} -> {after} {reason_codes(output['reasons'])}")
+
+            if (result.is_accepted != output['is_valid']
+                    or reason_codes(result.rejection_reasons) != reason_codes(output['reasons'])):
+                result.is_accepted = output['is_valid']
+                result.rejection_reasons = output['reasons']
+                to_update.append(result)
+
+        if not self.options['dry_run']:
+            with transaction.atomic():
+                ValidationResult.objects.bulk_update(to_update, ['is_accepted', 'rejection_reasons'], batch_size=500)
+                ValidationResult.objects.bulk_create(to_create, batch_size=500)
+                # Neither sends post_save; the cases' ETags must still change
+                Case.bump_version(pk__in=[result.case_id for result in to_update + to_create])
+            self.state['written'] += len(to_update) + len(to_create)
+
+        self.state['last_id'] = chunk[-1]['id']
+        self.state['processed'] += len(chunk)
+        self.session_processed += len(chunk)
+        if not self.options['dry_run']:
+            self._save_checkpoint()
+
+        elapsed = time.monotonic() - self.started
+        rate = self.session_processed / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"... {self.state['processed']} case(s), last id #{self.state['last_id']}, {rate:,.0f} cases/s"
+        )
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.options['checkpoint'], encoding='utf-8') as f:
+                self.state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+
+    def _save_checkpoint(self):
+        path = self.options['checkpoint']
+        if not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, path)
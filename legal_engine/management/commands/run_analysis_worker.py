@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from legal_engine.services.analysis_jobs import (
+    DEFAULT_LEASE,
+    DEFAULT_MAX_ATTEMPTS,
+    claim_next_job,
+    run_job,
+)
+from legal_engine.services.gemini_service import get_gemini_service
+from legal_engine.services.llm_cache import llm_cache
+from legal_engine.services.metrics import METRICS_TOKEN, serve_metrics
+
+
+class Command(BaseCommand):
+    help = 'Processes queued Gemini analysis jobs with a fixed-size pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of concurrent worker threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--lease-seconds', type=int, default=int(DEFAULT_LEASE.total_seconds()),
+                            help='Reclaim RUNNING jobs older than this (crashed workers)')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling forever')
+        parser.add_argument('--metrics-port', type=int,
+                            help="Serve this worker's metrics (Gemini calls, stages) at :PORT/metrics for "
+                                 "Prometheus; the web app's /metrics only covers its own process")
+        parser.add_argument('--metrics-host', default='127.0.0.1',
+                            help='Interface for --metrics-port (0.0.0.0 for all; set METRICS_TOKEN then)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stop = threading.Event()
+        self.processed = 0
+        self.counter_lock = threading.Lock()
+
+        metrics_server = None
+        if options['metrics_port'] is not None:
+            metrics_server = serve_metrics(options['metrics_port'], options['metrics_host'])
+            host, port = metrics_server.server_address[:2]
+            self.stdout.write(f"Serving metrics at http://{host}:{port}/metrics"
+                              + ("" if METRICS_TOKEN else " (no METRICS_TOKEN: unauthenticated)"))
+
+        threads = [
+            threading.Thread(target=self._work, name=f'analysis-worker-{i}', daemon=True)
+            for i in range(options['workers'])
+        ]
+        self.stdout.write(f"Starting {len(threads)} analysis worker(s)...")
+        for t in threads:
+            t.start()
+
+        try:
+            while any(t.is_alive() for t in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers after their current job...")
+            self.stop.set()
+            for t in threads:
+                t.join()
+
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+        self.stdout.write(self.style.SUCCESS(f"Processed {self.processed} job(s)."))
+        self.stdout.write(f"LLM cache: {llm_cache.stats()}")
+
+    def _work(self):
+        gemini = get_gemini_service()
+        lease = timedelta(seconds=self.options['lease_seconds'])
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = claim_next_job(lease=lease)
+                if job is None:
+                    if self.options['once']:
+                        return
+                    self.stop.wait(self.options['poll_interval'])
+                    continue
+
+                job = run_job(job, gemini=gemini, max_attempts=self.options['max_attempts'])
+                with self.counter_lock:
+                    self.processed += 1
+                self.stdout.write(f"[{threading.current_thread().name}] Job #{job.pk} (case {job.case_id}): {job.status}")
+        finally:
+            connection.close()
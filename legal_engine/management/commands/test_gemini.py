@@ -1,16 +1,21 @@
 from django.core.management.base import BaseCommand
-from legal_engine.services.gemini_service import GeminiService
+from legal_engine.services.gemini_service import get_gemini_service
 
 class Command(BaseCommand):
     help = 'Test Gemini Service Integration'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--reload', action='store_true', help='Re-read .env before testing')
+
     def handle(self, *args, **kwargs):
         self.stdout.write("Testing Gemini Service Integration...")
         try:
-            service = GeminiService()
+            service = get_gemini_service()
+            if kwargs['reload']:
+                service.reload()
             if service.is_active:
                 self.stdout.write(self.style.SUCCESS('Gemini Service is ACTIVE'))
-                self.stdout.write(f"Model: {service.model.model_name}")
+                self.stdout.write(f"Model: {service.backend.model_name}")
                 
                 # Try generation
                 response = service.analyze_text("Test case text")
@@ -0,0 +1,58 @@
+import logging
+import os
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .services.metrics import REQUEST_SECONDS, REQUESTS, end_breakdown, format_breakdown, start_breakdown
+
+logger = logging.getLogger('legal_engine.requests')
+
+# Requests slower than this are logged with their per-stage breakdown
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+
+def _record(request, response, started, breakdown):
+    elapsed = perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    # The route name, never the raw path, so label cardinality stays bounded
+    view = match.view_name if match else 'unmatched'
+    REQUEST_SECONDS.observe(elapsed, view=view, method=request.method)
+    REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        logger.warning(
+            "Slow request %s %s -> %s in %.0f ms: %s",
+            request.method, request.path, response.status_code, elapsed * 1000, format_breakdown(breakdown),
+            extra={'view': view, 'duration_ms': round(elapsed * 1000, 1),
+                   'stages': {stage: round(seconds * 1000, 1) for stage, seconds in breakdown}},
+        )
+
+
+@sync_and_async_middleware
+def request_timing_middleware(get_response):
+    """
+    Request latency histogram and status counter per view, plus the slow-request
+    log. Streaming responses are timed up to their first byte.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            breakdown, token = start_breakdown()
+            started = perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                end_breakdown(token)
+            _record(request, response, started, breakdown)
+            return response
+    else:
+        def middleware(request):
+            breakdown, token = start_breakdown()
+            started = perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                end_breakdown(token)
+            _record(request, response, started, breakdown)
+            return response
+    return middleware
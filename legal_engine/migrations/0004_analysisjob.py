@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0003_document'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='case',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('SUBMITTED', 'Submitted'), ('VALIDATED', 'Validated (AI)'), ('PENDING_JUDGE', 'Pending Judge Approval'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], default='DRAFT', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='validationresult',
+            name='ai_analysis',
+            field=models.TextField(blank=True, default='', help_text="Gemini's analysis of the legal text"),
+        ),
+        migrations.AlterField(
+            model_name='validationresult',
+            name='generated_reasoning',
+            field=models.TextField(blank=True, default='', help_text='The eloquent reasoning generated for the judge'),
+        ),
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='legal_engine.case')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='analysisjob_status_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+# The rules RuleValidator used to hardcode, now editable from the admin.
+DEFAULT_RULES = [
+    {
+        'code': 'ARTICLE_8_GRIEVANCE_MISSING',
+        'name': 'المادة 8 - التظلم الوجوبي',
+        'description': 'Article 8 - Civil service / military cases require a grievance to the entity before suing.',
+        'parameter_value': {
+            'type': 'mandatory_grievance',
+            'keywords': ['ترقية', 'تاديب', 'فصل', 'خدمة مدنية', 'عسكرية', 'راتب'],
+            'message': 'عدم قبول الدعوى لانتفاء شرط التظلم الوجوبي (المادة 8 من نظام المرافعات).',
+            'severity': 'BLOCKER',
+        },
+    },
+    {
+        'code': 'ARTICLE_16_TIMEOUT',
+        'name': 'المادة 16 - ميعاد رفع الدعوى',
+        'description': 'Article 16 - Cases must be filed within 60 days of knowledge or grievance.',
+        'parameter_value': {
+            'type': 'statute_of_limitations',
+            'days': 60,
+            'message': 'عدم قبول الدعوى لرفعها بعد الميعاد المقرر نظاماً ({days} يوماً - المادة 16).',
+            'severity': 'BLOCKER',
+        },
+    },
+]
+
+
+def seed_rules(apps, schema_editor):
+    ProceduralRule = apps.get_model('legal_engine', 'ProceduralRule')
+    for rule in DEFAULT_RULES:
+        ProceduralRule.objects.get_or_create(code=rule['code'], defaults=rule)
+
+
+def unseed_rules(apps, schema_editor):
+    ProceduralRule = apps.get_model('legal_engine', 'ProceduralRule')
+    ProceduralRule.objects.filter(code__in=[rule['code'] for rule in DEFAULT_RULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0005_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_rules, unseed_rules),
+    ]
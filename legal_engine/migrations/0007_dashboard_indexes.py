@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0006_seed_procedural_rules'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['-submission_date', '-id'], name='case_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['status', '-submission_date', '-id'], name='case_status_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['court_type', '-submission_date', '-id'], name='case_court_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='validationresult',
+            index=models.Index(fields=['is_accepted', 'case'], name='result_accepted_case_idx'),
+        ),
+    ]
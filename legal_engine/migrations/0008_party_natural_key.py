@@ -0,0 +1,69 @@
+from django.db import migrations, models
+
+# Frozen copy of legal_engine.services.arabic_text.normalize_arabic as of this
+# migration, so later changes to the live normalizer cannot change its keys.
+_DROPPED = {chr(c) for c in range(0x064B, 0x0653)} | {'ٰ', 'ـ'}
+_FOLDED = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+}
+
+
+def normalize_arabic(text):
+    return ''.join(_FOLDED.get(ch, ch).lower() for ch in text if ch not in _DROPPED)
+
+
+def _natural_key(party):
+    # Mirrors Party.build_natural_key at the time of this migration
+    national_id = (party.national_id or '').strip()
+    license_number = (party.license_number or '').strip()
+    if party.party_type == 'INDIVIDUAL' and national_id:
+        return f"{party.role}:{party.party_type}:ID:{national_id}"
+    if party.party_type == 'COMPANY' and license_number:
+        return f"{party.role}:{party.party_type}:LICENSE:{license_number}"
+    name = " ".join(normalize_arabic(party.name or '').split())
+    return f"{party.role}:{party.party_type}:NAME:{name}"
+
+
+def populate_and_merge(apps, schema_editor):
+    """
+    Fills natural_key and folds duplicate parties into the oldest row,
+    re-pointing their cases, so the unique constraint can be added.
+    """
+    Party = apps.get_model('legal_engine', 'Party')
+    Case = apps.get_model('legal_engine', 'Case')
+
+    keep = {}
+    for party in Party.objects.order_by('id').iterator():
+        key = _natural_key(party)
+        survivor = keep.get(key)
+        if survivor is None:
+            keep[key] = party.pk
+            Party.objects.filter(pk=party.pk).update(natural_key=key)
+            continue
+        Case.objects.filter(plaintiff_id=party.pk).update(plaintiff_id=survivor)
+        Case.objects.filter(defendant_id=party.pk).update(defendant_id=survivor)
+        party.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0007_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='party',
+            name='natural_key',
+            field=models.CharField(editable=False, max_length=300, null=True),
+        ),
+        migrations.RunPython(populate_and_merge, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='party',
+            name='natural_key',
+            field=models.CharField(editable=False, max_length=300, unique=True),
+        ),
+    ]
@@ -0,0 +1,96 @@
+import hashlib
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def link_existing_files(apps, schema_editor):
+    """
+    Hashes every existing Document file and points it at one StoredBlob per hash.
+    The first file seen for a hash becomes the blob's file; later copies are left
+    on disk as orphans for `manage.py prune_blobs --orphan-files`.
+    Stops, changing nothing, if any Document's file is missing from disk: those
+    rows are part of a case record and are never dropped here.
+    """
+    Document = apps.get_model('legal_engine', 'Document')
+    StoredBlob = apps.get_model('legal_engine', 'StoredBlob')
+
+    missing = [
+        f"  document #{pk} (case #{case_id}): {name or '<no file>'}"
+        for pk, case_id, name in Document.objects.order_by('id').values_list('id', 'case_id', 'file')
+        if not name or not default_storage.exists(name)
+    ]
+    if missing:
+        raise RuntimeError(
+            "Cannot move documents to content-addressed storage: these files are missing "
+            "from MEDIA_ROOT. Restore them (or deliberately delete the Document rows) "
+            "and run the migration again.\n" + "\n".join(missing)
+        )
+
+    for document in Document.objects.order_by('id').iterator():
+        name = document.file.name
+        digest = hashlib.sha256()
+        with default_storage.open(name, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+        blob, _ = StoredBlob.objects.get_or_create(
+            sha256=digest.hexdigest(),
+            defaults={'file': name, 'size': default_storage.size(name)},
+        )
+        Document.objects.filter(pk=document.pk).update(blob=blob, original_name=name.rsplit('/', 1)[-1])
+        StoredBlob.objects.filter(pk=blob.pk).update(ref_count=models.F('ref_count') + 1)
+
+
+def restore_files(apps, schema_editor):
+    Document = apps.get_model('legal_engine', 'Document')
+    for document in Document.objects.select_related('blob').iterator():
+        Document.objects.filter(pk=document.pk).update(file=document.blob.file.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0008_party_natural_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(max_length=255, upload_to='blobs/')),
+                ('size', models.PositiveBigIntegerField()),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='legal_engine.storedblob'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='original_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        # Nullable first so the reverse migration can re-add the column before refilling it
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(null=True, upload_to='case_documents/'),
+        ),
+        migrations.RunPython(link_existing_files, restore_files),
+        migrations.RemoveField(
+            model_name='document',
+            name='file',
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='legal_engine.storedblob'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'legal_engine_searchdocument_fts'
+SOURCE_TABLE = 'legal_engine_searchdocument'
+COLUMNS = 'title, description, analysis, documents'
+
+# Frozen copy of legal_engine.services.arabic_text.analyze_for_search as of this
+# migration, so later changes to the live analyzer cannot change what it indexes
+# (`manage.py rebuild_search_index` re-analyzes with the current one).
+_DROPPED = {chr(c) for c in range(0x064B, 0x0653)} | {'ٰ', 'ـ'}
+_FOLDED = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+}
+_SEARCH_FOLD = str.maketrans({'ی': 'ي', 'ک': 'ك'})
+_TOKEN_RE = re.compile(r'\w+')
+_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+
+
+def _light_stem(token):
+    for prefix in _PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            token = token[len(prefix):]
+            break
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            token = token[:-len(suffix)]
+    return token
+
+
+def analyze_for_search(text):
+    normalized = ''.join(
+        _FOLDED.get(ch, ch).lower() for ch in (text or '').translate(_SEARCH_FOLD) if ch not in _DROPPED
+    )
+    return ' '.join(_light_stem(token) for token in _TOKEN_RE.findall(normalized))
+
+
+def create_fts_index(apps, schema_editor):
+    """
+    External-content FTS5 table over SearchDocument, synced by triggers, with
+    prefix indexes so search-as-you-type stays cheap. Other databases use the
+    portable fallback in services/search.py.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    new_values = ', '.join(f'new.{column}' for column in COLUMNS.split(', '))
+    old_values = ', '.join(f'old.{column}' for column in COLUMNS.split(', '))
+    for statement in (
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({COLUMNS}, content='{SOURCE_TABLE}', "
+        f"content_rowid='case_id', tokenize='unicode61 remove_diacritics 0', prefix='2 3 4')",
+        f"CREATE TRIGGER {SOURCE_TABLE}_ai AFTER INSERT ON {SOURCE_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.case_id, {new_values}); END",
+        f"CREATE TRIGGER {SOURCE_TABLE}_ad AFTER DELETE ON {SOURCE_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.case_id, {old_values}); END",
+        f"CREATE TRIGGER {SOURCE_TABLE}_au AFTER UPDATE ON {SOURCE_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.case_id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.case_id, {new_values}); END",
+    ):
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {SOURCE_TABLE}_{trigger}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def index_existing_cases(apps, schema_editor):
+    Case = apps.get_model('legal_engine', 'Case')
+    Document = apps.get_model('legal_engine', 'Document')
+    ExtractedText = apps.get_model('legal_engine', 'ExtractedText')
+    SearchDocument = apps.get_model('legal_engine', 'SearchDocument')
+
+    texts = dict(ExtractedText.objects.exclude(text='').values_list('sha256', 'text'))
+    documents = {}
+    for case_id, sha256 in Document.objects.values_list('case_id', 'blob__sha256'):
+        if sha256 in texts:
+            documents.setdefault(case_id, []).append(texts[sha256])
+
+    rows = Case.objects.order_by('id').values_list('id', 'title', 'description', 'validation_result__ai_analysis')
+    batch = []
+    for case_id, title, description, analysis in rows.iterator(chunk_size=1000):
+        batch.append(SearchDocument(
+            case_id=case_id,
+            title=analyze_for_search(title or ''),
+            description=analyze_for_search(description or ''),
+            analysis=analyze_for_search(analysis or ''),
+            documents=analyze_for_search('\n'.join(documents.get(case_id, ()))),
+        ))
+        if len(batch) >= 1000:
+            SearchDocument.objects.bulk_create(batch)
+            batch = []
+    SearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0010_extractedtext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('case', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='legal_engine.case')),
+                ('title', models.TextField(blank=True, default='')),
+                ('description', models.TextField(blank=True, default='')),
+                ('analysis', models.TextField(blank=True, default='')),
+                ('documents', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+        migrations.RunPython(index_existing_cases, migrations.RunPython.noop),
+    ]
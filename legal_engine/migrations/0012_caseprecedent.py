@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0011_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CasePrecedent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precedents', to='legal_engine.case')),
+                ('precedent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='legal_engine.case')),
+            ],
+            options={
+                'ordering': ['case', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('case', 'rank'), name='caseprecedent_case_rank_uniq')],
+            },
+        ),
+    ]
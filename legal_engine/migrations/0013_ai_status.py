@@ -0,0 +1,51 @@
+from django.db import migrations, models
+from django.db.models import Q
+
+# Texts the service used to store in place of an analysis when Gemini failed or was not configured
+FALLBACK_PREFIXES = (
+    "خطأ في الاتصال بـ Gemini",
+    "Gemini API غير مفعل",
+    "تعذر إكمال التحليل الذكي",
+    "تعذر توليد التسبيب",
+    "التسبيب الافتراضي (تجريبي)",
+    "Error:",
+)
+
+
+def classify_existing_results(apps, schema_editor):
+    ValidationResult = apps.get_model('legal_engine', 'ValidationResult')
+    fallback = Q()
+    for prefix in FALLBACK_PREFIXES:
+        fallback |= Q(ai_analysis__startswith=prefix) | Q(generated_reasoning__startswith=prefix)
+    ValidationResult.objects.filter(fallback).update(ai_status='FALLBACK')
+    ValidationResult.objects.filter(ai_status='PENDING').exclude(ai_analysis='').update(ai_status='COMPLETE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0012_caseprecedent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.FloatField(help_text='Unix time of the last refill')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='validationresult',
+            name='ai_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('COMPLETE', 'Complete'), ('FALLBACK', 'Fallback')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='validationresult',
+            index=models.Index(fields=['ai_status', 'case'], name='result_ai_status_case_idx'),
+        ),
+        migrations.RunPython(classify_existing_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('legal_engine', '0015_rulesetversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='extractedtext',
+            name='status',
+            field=models.CharField(choices=[('DONE', 'Done'), ('EMPTY', 'No text layer'), ('FAILED', 'Failed'), ('UNSUPPORTED', 'No extractor for this file type')], max_length=20),
+        ),
+    ]
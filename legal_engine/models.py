@@ -1,6 +1,9 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .services.arabic_text import normalize_arabic
+
 class Party(models.Model):
     class PartyType(models.TextChoices):
         INDIVIDUAL = 'INDIVIDUAL', _('Individual')
@@ -17,6 +20,29 @@ class Party(models.Model):
     national_id = models.CharField(max_length=20, blank=True, null=True) # For individuals
     license_number = models.CharField(max_length=50, blank=True, null=True) # For companies
 
+    # Identity used to de-duplicate parties: national_id for individuals,
+    # license_number for companies, normalized name otherwise (see build_natural_key).
+    natural_key = models.CharField(max_length=300, unique=True, editable=False)
+
+    @classmethod
+    def build_natural_key(cls, data) -> str:
+        role = data.get('role') or ''
+        party_type = data.get('party_type') or ''
+        national_id = (data.get('national_id') or '').strip()
+        license_number = (data.get('license_number') or '').strip()
+        if party_type == cls.PartyType.INDIVIDUAL and national_id:
+            return f"{role}:{party_type}:ID:{national_id}"
+        if party_type == cls.PartyType.COMPANY and license_number:
+            return f"{role}:{party_type}:LICENSE:{license_number}"
+        name = " ".join(normalize_arabic(data.get('name') or '').split())
+        return f"{role}:{party_type}:NAME:{name}"
+
+    def save(self, *args, **kwargs):
+        self.natural_key = self.build_natural_key(self.__dict__)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'natural_key'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} ({self.get_role_display()})"
 
@@ -38,6 +64,16 @@ class ProceduralRule(models.Model):
     def __str__(self):
         return self.name
 
+class RuleSetVersion(models.Model):
+    """
+    Single-row counter bumped on every ProceduralRule change (legal_engine.signals).
+    Every web and worker process polls it and recompiles its rules when it moves.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Procedural rules v{self.version}"
+
 class Case(models.Model):
     class CaseStatus(models.TextChoices):
         DRAFT = 'DRAFT', _('Draft')
@@ -77,6 +113,38 @@ class Case(models.Model):
     
     documents = models.JSONField(default=list, help_text="List of attached document metadata")
 
+    # Bumped on every change to the case, its parties or its ValidationResult (ETags, see CaseViewSet)
+    version = models.PositiveBigIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Backing indexes for the judge dashboard's keyset pagination (newest first) and filters
+        indexes = [
+            models.Index(fields=['-submission_date', '-id'], name='case_submitted_idx'),
+            models.Index(fields=['status', '-submission_date', '-id'], name='case_status_submitted_idx'),
+            models.Index(fields=['court_type', '-submission_date', '-id'], name='case_court_submitted_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        # Incremented in SQL so concurrent saves can't both write the same version
+        self.version = models.F('version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
+    @classmethod
+    def bump_version(cls, *filters, **lookups) -> int:
+        """
+        Marks the matching cases as changed, for writes that don't go through
+        Case.save(): queryset updates, related rows, bulk_update.
+        """
+        return cls.objects.filter(*filters, **lookups).update(
+            version=models.F('version') + 1, updated_at=timezone.now(),
+        )
+
     def __str__(self):
         return self.title
 
@@ -90,20 +158,170 @@ class ValidationResult(models.Model):
     # Structured reasons for the 'Smart Dashboard'
     rejection_reasons = models.JSONField(default=list, help_text="List of procedural errors if any")
     
-    # Gemini Output
-    ai_analysis = models.TextField(help_text="Gemini's analysis of the legal text")
-    generated_reasoning = models.TextField(help_text="The eloquent reasoning generated for the judge")
+    class AIStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        COMPLETE = 'COMPLETE', 'Complete'
+        # Deterministic stand-in written while Gemini was unavailable; `manage.py requeue_fallbacks` re-runs it
+        FALLBACK = 'FALLBACK', 'Fallback'
+
+    # Gemini Output (filled in asynchronously by the analysis worker)
+    ai_analysis = models.TextField(blank=True, default='', help_text="Gemini's analysis of the legal text")
+    generated_reasoning = models.TextField(blank=True, default='', help_text="The eloquent reasoning generated for the judge")
+    ai_status = models.CharField(max_length=20, choices=AIStatus.choices, default=AIStatus.PENDING)
     
     confidence_score = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_accepted', 'case'], name='result_accepted_case_idx'),
+            models.Index(fields=['ai_status', 'case'], name='result_ai_status_case_idx'),
+        ]
+
     def __str__(self):
         return f"Result for {self.case.title}: {'Accepted' if self.is_accepted else 'Rejected'}"
 
+class AnalysisJob(models.Model):
+    """
+    DB-backed queue entry for the Gemini analysis of a case.
+    Created by submit_and_validate and consumed by `manage.py run_analysis_worker`.
+    """
+    class JobStatus(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        DONE = 'DONE', _('Done')
+        FAILED = 'FAILED', _('Failed')
+
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='analysisjob_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Analysis job #{self.pk} for case {self.case_id} ({self.status})"
+
+class LLMCacheEntry(models.Model):
+    """
+    Persistent (cross-worker) tier of the LLM response cache.
+    Keyed on sha256(normalized prompt + model name + prompt template version).
+    """
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    template_version = models.CharField(max_length=50)
+    response = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.template_version} @ {self.model_name} ({self.key[:12]})"
+
+class RateLimitBucket(models.Model):
+    """
+    Token bucket shared by every process calling one upstream (see llm_resilience.TokenBucket).
+    Updated with compare-and-swap on `version`, so no row lock is needed.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField(help_text="Unix time of the last refill")
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f} token(s)"
+
+class StoredBlob(models.Model):
+    """
+    One uploaded file on disk, stored once per content hash and shared by every
+    Document that attaches the same bytes. ref_count tracks those Documents;
+    unreferenced blobs are removed by `manage.py prune_blobs` once last_used_at
+    (bumped whenever an upload reuses the blob) is older than its grace window.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='blobs/', max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes, {self.ref_count} ref(s))"
+
+class ExtractedText(models.Model):
+    """
+    Text pulled out of an uploaded file by the analysis worker, cached by content
+    hash so identical files (and re-uploads of pruned blobs) are extracted once.
+    """
+    class ExtractionStatus(models.TextChoices):
+        DONE = 'DONE', _('Done')
+        EMPTY = 'EMPTY', _('No text layer')
+        FAILED = 'FAILED', _('Failed')
+        UNSUPPORTED = 'UNSUPPORTED', _('No extractor for this file type')
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=20, choices=ExtractionStatus.choices)
+    text = models.TextField(blank=True, default='')
+    page_count = models.PositiveIntegerField(default=0)
+    truncated = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Text of {self.sha256[:12]} ({self.status}, {len(self.text)} chars)"
+
 class Document(models.Model):
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='case_documents')
-    file = models.FileField(upload_to='case_documents/')
+    blob = models.ForeignKey(StoredBlob, on_delete=models.PROTECT, related_name='documents')
+    original_name = models.CharField(max_length=255, blank=True, default='')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    @property
+    def file(self):
+        return self.blob.file
+
     def __str__(self):
         return f"Document for {self.case.title}"
+
+class SearchDocument(models.Model):
+    """
+    Search-analyzed (normalized, stemmed) text of one case, kept current by
+    services/search.py. On SQLite the FTS5 table legal_engine_searchdocument_fts
+    indexes these columns through triggers (see migration 0011); migrations that
+    rebuild this table must recreate those triggers.
+    """
+    case = models.OneToOneField(Case, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.TextField(blank=True, default='')
+    description = models.TextField(blank=True, default='')
+    analysis = models.TextField(blank=True, default='')
+    documents = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"Search document of case {self.case_id}"
+
+class CasePrecedent(models.Model):
+    """
+    The most similar earlier cases of a case, precomputed from the similarity
+    index by `manage.py build_similarity_index` (see services/similarity.py).
+    """
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='precedents')
+    precedent = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['case', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['case', 'rank'], name='caseprecedent_case_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Case {self.case_id} ~ case {self.precedent_id} ({self.similarity:.2f})"
@@ -1,26 +1,66 @@
 from rest_framework import serializers
 from .models import Party, Case, ValidationResult, ProceduralRule, Document
+from .services.case_facts import CaseFacts
+from .services.hijri import looks_hijri, parse_hijri
+from .services.metrics import span
+from .services.party_resolver import PartyResolver
+
+
+class HijriAwareDateField(serializers.DateField):
+    """
+    DateField that also accepts Umm al-Qura Hijri input such as '1445/01/05'.
+    """
+    def to_internal_value(self, value):
+        if isinstance(value, str) and looks_hijri(value):
+            try:
+                return parse_hijri(value)
+            except ValueError as e:
+                raise serializers.ValidationError(str(e))
+        return super().to_internal_value(value)
+
+
+class SparseFieldsMixin:
+    """
+    Lets callers trim a serializer: `fields` keeps only the named fields, `omit` drops some.
+    """
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in omit or ():
+            self.fields.pop(name, None)
+
 
 class PartySerializer(serializers.ModelSerializer):
     class Meta:
         model = Party
         fields = '__all__'
 
-class ValidationResultSerializer(serializers.ModelSerializer):
+class ValidationResultSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Long Gemini texts; list endpoints leave them out unless ?expand= asks for them
+    LARGE_FIELDS = ('ai_analysis', 'generated_reasoning')
+
     class Meta:
         model = ValidationResult
-        fields = ['is_accepted', 'rejection_reasons', 'ai_analysis', 'generated_reasoning', 'confidence_score']
+        fields = ['is_accepted', 'rejection_reasons', 'ai_analysis', 'generated_reasoning', 'ai_status', 'confidence_score']
 
 class DocumentSerializer(serializers.ModelSerializer):
+    file = serializers.FileField(source='blob.file', read_only=True)
+    size = serializers.IntegerField(source='blob.size', read_only=True)
+    sha256 = serializers.CharField(source='blob.sha256', read_only=True)
+
     class Meta:
         model = Document
-        fields = ['id', 'file', 'uploaded_at']
+        fields = ['id', 'file', 'original_name', 'size', 'sha256', 'uploaded_at']
 
 
-class CaseSerializer(serializers.ModelSerializer):
+class CaseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     plaintiff = PartySerializer()
     defendant = PartySerializer()
     validation_result = ValidationResultSerializer(read_only=True)
+    incident_date = HijriAwareDateField(help_text="Gregorian (YYYY-MM-DD) or Hijri (YYYY/MM/DD)")
+    grievance_date = HijriAwareDateField(required=False, allow_null=True)
     
     class Meta:
         model = Case
@@ -29,17 +69,38 @@ class CaseSerializer(serializers.ModelSerializer):
             'incident_date', 'grievance_date', 'submission_date',
             'plaintiff', 'defendant',
             'court_type', 'request_type', 'claim_amount', 'status', 'documents',
-            'validation_result'
+            'validation_result', 'version'
         ]
 
+    def __init__(self, *args, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is not None and 'validation_result' in self.fields:
+            self.fields['validation_result'] = ValidationResultSerializer(
+                read_only=True,
+                omit=[name for name in ValidationResultSerializer.LARGE_FIELDS if name not in expand],
+            )
+
     def create(self, validated_data):
         # Handle nested writes for parties if needed, or assume IDs. 
         # For simplicity in this demo, we'll create parties if provided as dicts.
         plaintiff_data = validated_data.pop('plaintiff')
         defendant_data = validated_data.pop('defendant')
         
-        plaintiff, _ = Party.objects.get_or_create(**plaintiff_data)
-        defendant, _ = Party.objects.get_or_create(**defendant_data)
+        # Resolved by indexed natural key (national ID / license / normalized name).
+        # A shared resolver can be passed in the context for batch imports.
+        resolver = self.context.get('party_resolver') or PartyResolver()
+        with span('party_resolution'):
+            plaintiff, defendant = resolver.resolve_many([plaintiff_data, defendant_data])
         
-        case = Case.objects.create(plaintiff=plaintiff, defendant=defendant, **validated_data)
+        with span('case_insert'):
+            case = Case.objects.create(plaintiff=plaintiff, defendant=defendant, **validated_data)
         return case
+
+    def build_facts(self) -> CaseFacts:
+        """
+        Typed facts for the rule engine, built once per case from the saved instance
+        (or from validated_data before saving).
+        """
+        if self.instance is not None:
+            return CaseFacts.from_case(self.instance)
+        return CaseFacts.from_mapping(self.validated_data)
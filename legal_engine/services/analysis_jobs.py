@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from typing import AsyncIterator, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from legal_engine.models import AnalysisJob, Case, ValidationResult
+from legal_engine.serializers import CaseSerializer
+from .gemini_service import (
+    ANALYSIS_TIMED_OUT, ANALYSIS_TIMEOUT, ANALYSIS_UNAVAILABLE, REASONING_TIMEOUT,
+    AIResult, GeminiService, get_gemini_service,
+)
+from .metrics import AI_RESULTS, registry, span
+from .revalidation import reason_codes
+from .search import schedule_index
+from .similarity import similarity_index
+from .text_extraction import case_document_text
+
+logger = logging.getLogger(__name__)
+
+# A RUNNING job whose worker died is handed out again after this lease expires.
+DEFAULT_LEASE = timedelta(minutes=5)
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Cosine similarity above which a prior case's reasoning is reused instead of asking
+# Gemini again (same rule outcome required). 0 disables reuse, the default: a judge
+# should opt in once the threshold has been checked against real precedents.
+PRECEDENT_REUSE_THRESHOLD = float(os.getenv("PRECEDENT_REUSE_THRESHOLD") or 0)
+
+
+def enqueue_analysis(case: Case) -> AnalysisJob:
+    """
+    Queues the Gemini analysis of a case. Must be cheap: it runs inside the submission transaction.
+    """
+    return AnalysisJob.objects.create(case=case)
+
+
+def _runnable(lease: timedelta) -> Q:
+    stale_before = timezone.now() - lease
+    return Q(status=AnalysisJob.JobStatus.PENDING) | Q(
+        status=AnalysisJob.JobStatus.RUNNING, started_at__lt=stale_before
+    )
+
+
+def _claim(job_id, job_status, started_at) -> bool:
+    return bool(AnalysisJob.objects.filter(
+        pk=job_id, status=job_status, started_at=started_at
+    ).update(
+        status=AnalysisJob.JobStatus.RUNNING,
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    ))
+
+
+def claim_next_job(lease: timedelta = DEFAULT_LEASE):
+    """
+    Atomically moves the oldest runnable job to RUNNING and returns it (or None).
+    Uses a conditional UPDATE instead of SELECT ... FOR UPDATE so it also works on SQLite.
+    """
+    while True:
+        candidate = (
+            AnalysisJob.objects.filter(_runnable(lease))
+            .order_by('id')
+            .values_list('id', 'status', 'started_at')
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        if _claim(*candidate):
+            return AnalysisJob.objects.select_related('case').get(pk=candidate[0])
+        # Another worker won the race for this row; try the next one.
+
+
+def claim_case_job(case: Case, lease: timedelta = DEFAULT_LEASE):
+    """
+    Claims the latest runnable job of one case, for a client streaming its analysis,
+    or returns None when the worker (or another stream) already has it.
+    """
+    candidate = (
+        AnalysisJob.objects.filter(_runnable(lease), case=case)
+        .order_by('-id')
+        .values_list('id', 'status', 'started_at')
+        .first()
+    )
+    if candidate is None or not _claim(*candidate):
+        return None
+    return AnalysisJob.objects.select_related('case').get(pk=candidate[0])
+
+
+def reusable_reasoning(case: Case, result: ValidationResult) -> str:
+    """
+    generated_reasoning of a near-identical earlier case with the same outcome and
+    rejection codes, or '' when there is none (or reuse is disabled).
+    """
+    if not PRECEDENT_REUSE_THRESHOLD:
+        return ''
+    for precedent_id, similarity in similarity_index.precedents(case.pk, case.description, k=3):
+        if similarity < PRECEDENT_REUSE_THRESHOLD:
+            break
+        prior = (
+            ValidationResult.objects.filter(case_id=precedent_id, is_accepted=result.is_accepted)
+            .exclude(generated_reasoning='')
+            .only('rejection_reasons', 'generated_reasoning')
+            .first()
+        )
+        if prior and reason_codes(prior.rejection_reasons) == reason_codes(result.rejection_reasons):
+            return prior.generated_reasoning
+    return ''
+
+
+def analysis_input(case: Case) -> str:
+    """The text Gemini analyses: the description followed by the attachments' text."""
+    # Attachments are read here, in the worker, never in the submission request.
+    # Cached by content hash, so re-runs and shared files cost nothing.
+    with span('document_text'):
+        document_text = case_document_text(case)
+    return f"{case.description}\n\n{document_text}" if document_text else case.description
+
+
+def _owned(job: AnalysisJob):
+    """The job's row as long as it is still held under the lease this process claimed."""
+    return AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.JobStatus.RUNNING, started_at=job.started_at)
+
+
+def complete_job(job: AnalysisJob, result: ValidationResult, ai: AIResult) -> bool:
+    """
+    Stores the texts; a fallback result is marked so `requeue_fallbacks` can re-run it.
+    Only a case still waiting for its analysis moves on to the judge: a decision
+    already taken is kept. Returns False (and writes nothing) if the lease was lost.
+    """
+    finished_at = timezone.now()
+    with span('result_write'), transaction.atomic():
+        if not _owned(job).update(status=AnalysisJob.JobStatus.DONE, error=ai.error, finished_at=finished_at):
+            logger.warning("Job #%s was reclaimed or finished elsewhere; dropping its result", job.pk)
+            return False
+        ValidationResult.objects.filter(pk=result.pk).update(
+            ai_analysis=ai.analysis,
+            generated_reasoning=ai.reasoning,
+            ai_status=ValidationResult.AIStatus.FALLBACK if ai.fallback else ValidationResult.AIStatus.COMPLETE,
+        )
+        Case.objects.filter(pk=job.case_id, status=Case.CaseStatus.SUBMITTED).update(
+            status=Case.CaseStatus.PENDING_JUDGE,
+        )
+        Case.bump_version(pk=job.case_id)
+        # The updates above bypass post_save (and Case.save); re-index the analysis and attachment text.
+        schedule_index(job.case_id)
+    job.status, job.error, job.finished_at = AnalysisJob.JobStatus.DONE, ai.error, finished_at
+    AI_RESULTS.inc(status='fallback' if ai.fallback else 'complete')
+    return True
+
+
+def fail_job(job: AnalysisJob, error: Exception, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """
+    Hands the job back to the queue, or marks it FAILED once it is out of attempts.
+    A job whose lease was lost is left to its new holder.
+    """
+    job.error = str(error)
+    if job.attempts >= max_attempts:
+        job.status = AnalysisJob.JobStatus.FAILED
+        job.finished_at = timezone.now()
+    else:
+        job.status = AnalysisJob.JobStatus.PENDING
+    if not _owned(job).update(status=job.status, error=job.error, finished_at=job.finished_at):
+        logger.warning("Job #%s was reclaimed or finished elsewhere; not recording its failure", job.pk)
+        job.refresh_from_db(fields=['status', 'error', 'finished_at'])
+
+
+def run_job(job: AnalysisJob, gemini: GeminiService = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> AnalysisJob:
+    """
+    Runs Gemini for a claimed job and fills in the case's ValidationResult.
+    The network calls happen outside any transaction; only the final write is atomic.
+    """
+    case = job.case
+    try:
+        result = ValidationResult.objects.get(case=case)
+        case_data = CaseSerializer(case).data
+        validation_output = {
+            'is_valid': result.is_accepted,
+            'reasons': result.rejection_reasons,
+        }
+        text = analysis_input(case)
+
+        gemini = gemini or get_gemini_service()
+        ai = gemini.analyze_and_reason(
+            text, case_data, validation_output, reasoning=reusable_reasoning(case, result) or None,
+        )
+        complete_job(job, result, ai)
+
+    except Exception as e:
+        fail_job(job, e, max_attempts)
+
+    return job
+
+
+async def stream_job(job: AnalysisJob, gemini: GeminiService = None,
+                     max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> AsyncIterator[Tuple[str, str]]:
+    """
+    run_job for a client watching its own submission (async, for the SSE view):
+    yields ('reasoning', piece) while Gemini writes the reasoning, then
+    ('analysis', text) and ('done', ''). As in run_job, an unavailable Gemini yields
+    the deterministic fallbacks. If the stream breaks off after some reasoning was
+    sent, the job goes back to the queue and ('error', message) is yielded; if the
+    client goes away mid-stream it is requeued without using up an attempt.
+
+    On disconnect the pending analysis is cancelled, but a map-reduce analysis of a
+    long text runs in a worker thread that cannot be interrupted: it finishes in the
+    background and only its responses are kept (in the LLM cache, where the requeued
+    job finds them). Nothing is written to the case until the job runs again.
+    """
+    case = job.case
+    analysis_task = None
+    errors = []
+    try:
+        result = await ValidationResult.objects.aget(case=case)
+        validation_output = {
+            'is_valid': result.is_accepted,
+            'reasons': result.rejection_reasons,
+        }
+        gemini = gemini or get_gemini_service()
+
+        text = await sync_to_async(analysis_input)(case)
+        analysis_task = asyncio.ensure_future(
+            asyncio.wait_for(gemini.analyze_text_async(text, ANALYSIS_TIMEOUT), ANALYSIS_TIMEOUT)
+        )
+
+        reasoning = await sync_to_async(reusable_reasoning)(case, result)
+        if reasoning:
+            yield 'reasoning', reasoning
+        else:
+            case_data = await sync_to_async(lambda: CaseSerializer(case).data)()
+            pieces = []
+            try:
+                async for piece in gemini.stream_reasoning(case_data, validation_output, REASONING_TIMEOUT):
+                    pieces.append(piece)
+                    yield 'reasoning', piece
+            except Exception as e:
+                if pieces:
+                    raise
+                errors.append(str(e))
+                pieces = [gemini.fallback_reasoning(validation_output)]
+                yield 'reasoning', pieces[0]
+            reasoning = ''.join(pieces)
+
+        try:
+            ai_analysis = await analysis_task
+        except asyncio.TimeoutError:
+            errors.append(f"Deadline of {ANALYSIS_TIMEOUT}s exceeded")
+            ai_analysis = ANALYSIS_TIMED_OUT
+        except Exception as e:
+            errors.append(str(e))
+            ai_analysis = ANALYSIS_UNAVAILABLE
+
+        ai = AIResult(ai_analysis, reasoning, fallback=bool(errors), error="; ".join(errors))
+        await sync_to_async(complete_job)(job, result, ai)
+
+    except (GeneratorExit, asyncio.CancelledError):
+        if analysis_task is not None:
+            analysis_task.cancel()
+        await AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.JobStatus.RUNNING).aupdate(
+            status=AnalysisJob.JobStatus.PENDING, attempts=F('attempts') - 1,
+        )
+        raise
+    except Exception as e:
+        if analysis_task is not None:
+            analysis_task.cancel()
+        await sync_to_async(fail_job)(job, e, max_attempts)
+        yield 'error', str(e)
+        return
+
+    yield 'analysis', ai_analysis
+    yield 'done', ''
+
+
+def requeue_fallbacks(limit: int = None) -> int:
+    """
+    Queues a fresh analysis for every case whose stored result is a fallback and
+    that has no job waiting or running. Cases the judge already decided keep their
+    status; the re-run only replaces the texts (see complete_job).
+    Returns the number of jobs queued.
+    """
+    active = AnalysisJob.objects.filter(
+        status__in=[AnalysisJob.JobStatus.PENDING, AnalysisJob.JobStatus.RUNNING]
+    ).values('case_id')
+    case_ids = (
+        ValidationResult.objects.filter(ai_status=ValidationResult.AIStatus.FALLBACK)
+        .exclude(case_id__in=active)
+        .order_by('case_id')
+        .values_list('case_id', flat=True)
+    )
+    if limit:
+        case_ids = case_ids[:limit]
+    jobs = AnalysisJob.objects.bulk_create([AnalysisJob(case_id=case_id) for case_id in case_ids])
+    return len(jobs)
+
+
+def _jobs_by_status():
+    counts = dict(AnalysisJob.objects.order_by().values_list('status').annotate(jobs=Count('id')))
+    return {(status,): counts.get(status, 0) for status in AnalysisJob.JobStatus.values}
+
+
+registry.gauge('modaqiq_analysis_jobs', 'Analysis jobs in the queue table, by status', ('status',),
+               collect=_jobs_by_status)
@@ -0,0 +1,141 @@
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+# Harakat/tashkeel, superscript alef and tatweel carry no meaning for matching
+_DROPPED = {chr(c) for c in range(0x064B, 0x0653)} | {'ٰ', 'ـ'}
+
+# Orthographic variants users mix freely (hamza seats, alef forms, ta-marbuta, alef maqsura)
+_FOLDED = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+}
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    Normalizes Arabic text for matching and returns, for every character of
+    the result, its index in the original text (so matches map back to it).
+    """
+    chars, offsets = [], []
+    for i, ch in enumerate(text):
+        if ch in _DROPPED:
+            continue
+        chars.append(_FOLDED.get(ch, ch).lower())
+        offsets.append(i)
+    return ''.join(chars), offsets
+
+
+def normalize_arabic(text: str) -> str:
+    return normalize_with_offsets(text)[0]
+
+
+# Persian yeh/kaf show up in text extracted from PDFs (NFKC of presentation forms)
+_SEARCH_FOLD = str.maketrans({'ی': 'ي', 'ک': 'ك'})
+_TOKEN_RE = re.compile(r'\w+')
+
+# Light stemming in the spirit of Larkey's light10, on normalized text (ة is already ه).
+# A bare leading و is kept: stripping it conflates root letters ("وزارة") with the conjunction.
+_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+
+
+def light_stem(token: str) -> str:
+    for prefix in _PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            token = token[len(prefix):]
+            break
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            token = token[:-len(suffix)]
+    return token
+
+
+class SearchToken(NamedTuple):
+    stem: str
+    start: int  # offsets into the original text
+    end: int
+
+
+def search_tokens(text: str) -> Iterator[SearchToken]:
+    """
+    Normalized, lightly stemmed tokens of `text` with their original offsets.
+    Index and queries go through the same function, so their forms always agree.
+    """
+    normalized, offsets = normalize_with_offsets(text.translate(_SEARCH_FOLD))
+    for match in _TOKEN_RE.finditer(normalized):
+        yield SearchToken(light_stem(match.group()), offsets[match.start()], offsets[match.end() - 1] + 1)
+
+
+def analyze_for_search(text: str) -> str:
+    return ' '.join(token.stem for token in search_tokens(text or ''))
+
+
+class KeywordMatch(NamedTuple):
+    keyword: str
+    start: int  # offsets into the original (un-normalized) text
+    end: int
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick matcher over normalized keywords.
+    Built once; each scan is a single linear pass over the text regardless
+    of how many keywords there are.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k and k.strip()))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]  # (keyword index, normalized length) pairs ending at each state
+
+        for index, keyword in enumerate(self.keywords):
+            pattern = normalize_arabic(keyword.strip())
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state] += ((index, len(pattern)),)
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def _scan(self, normalized: str):
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for pos, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for hit in out[state]:
+                yield pos, hit
+
+    def contains_any(self, text: str) -> bool:
+        for _ in self._scan(normalize_arabic(text)):
+            return True
+        return False
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        normalized, offsets = normalize_with_offsets(text)
+        return [
+            KeywordMatch(self.keywords[index], offsets[pos - length + 1], offsets[pos] + 1)
+            for pos, (index, length) in self._scan(normalized)
+        ]
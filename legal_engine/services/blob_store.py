@@ -0,0 +1,106 @@
+import hashlib
+import os
+from collections import Counter
+from datetime import timedelta
+from typing import Iterable, List, Tuple
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from legal_engine.models import Document, StoredBlob
+
+CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(uploaded_file) -> str:
+    """
+    Content hash of an upload. HashingUploadHandler computes it while the request
+    body streams in; anything else (tests, shell) is hashed here chunk by chunk.
+    """
+    sha256 = getattr(uploaded_file, 'sha256', None)
+    if sha256:
+        return sha256
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_path(sha256: str, name: str) -> str:
+    # Keep the extension so the media server still sends a sensible content type.
+    extension = os.path.splitext(name or '')[1].lower()[:10]
+    return f"blobs/{sha256[:2]}/{sha256}{extension}"
+
+
+def store_upload(uploaded_file) -> StoredBlob:
+    """
+    Returns the blob holding these bytes, writing them to storage only if no
+    blob has the same hash yet. Call it outside the request's DB transaction:
+    the (possibly slow) file write must not hold the write lock.
+
+    A reused blob may be unreferenced; bumping last_used_at keeps
+    prune_unreferenced off it until the upload has attached it. If the bump
+    matches no row, prune got there first and the bytes are stored afresh.
+    """
+    sha256 = file_sha256(uploaded_file)
+    blob = StoredBlob.objects.filter(sha256=sha256).first()
+    if blob is not None:
+        now = timezone.now()
+        if StoredBlob.objects.filter(pk=blob.pk).update(last_used_at=now):
+            blob.last_used_at = now
+            return blob
+
+    # Temporary uploads are moved into place, not copied.
+    name = default_storage.save(blob_path(sha256, uploaded_file.name), uploaded_file)
+    try:
+        with transaction.atomic():
+            return StoredBlob.objects.create(
+                sha256=sha256,
+                file=name,
+                size=uploaded_file.size,
+                content_type=getattr(uploaded_file, 'content_type', None) or '',
+            )
+    except IntegrityError:
+        # A concurrent request stored the same bytes first; keep theirs.
+        default_storage.delete(name)
+        return StoredBlob.objects.get(sha256=sha256)
+
+
+def attach_documents(case, stored: Iterable[Tuple[StoredBlob, str]]) -> List[Document]:
+    """Creates the case's Document rows for (blob, original name) pairs and bumps the blobs' ref counts."""
+    stored = list(stored)
+    if not stored:
+        return []
+    documents = Document.objects.bulk_create([
+        Document(case=case, blob=blob, original_name=name[:255]) for blob, name in stored
+    ])
+    for blob_id, count in Counter(blob.pk for blob, _ in stored).items():
+        StoredBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + count)
+    return documents
+
+
+def release_blob(blob_id: int) -> None:
+    StoredBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def prune_unreferenced(grace: timedelta = timedelta(hours=1), dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Deletes blobs no Document points at, together with their files.
+    Blobs stored or reused within `grace` are kept: their upload may still be
+    attaching them. The delete re-checks that, so a reuse racing the scan wins.
+    Returns (blobs removed, bytes freed).
+    """
+    unused = dict(ref_count=0, documents__isnull=True, last_used_at__lt=timezone.now() - grace)
+    removed = freed = 0
+    for blob in StoredBlob.objects.filter(**unused).iterator():
+        if not dry_run:
+            deleted, _ = StoredBlob.objects.filter(pk=blob.pk, **unused).delete()
+            if not deleted:
+                continue
+            default_storage.delete(blob.file.name)
+        removed += 1
+        freed += blob.size
+    return removed, freed
@@ -0,0 +1,60 @@
+from typing import Any, Dict, List
+
+from django.db import transaction
+
+from legal_engine.models import AnalysisJob, Case, ValidationResult
+from .logic_engine import RuleValidator
+from .party_resolver import PartyResolver
+from .search import schedule_index
+
+def bulk_create_cases(items: List[Dict[str, Any]], analyze: bool = False,
+                      resolver: PartyResolver = None) -> List[Dict[str, Any]]:
+    """
+    Persists already-validated CaseSerializer data in a handful of statements:
+    parties, cases, validation results (and analysis jobs) are each one bulk INSERT.
+    Returns one summary dict per item, in order.
+    """
+    validations = RuleValidator().validate_many(items)
+
+    with transaction.atomic():
+        resolver = resolver or PartyResolver()
+        parties = resolver.resolve_many(
+            [item['plaintiff'] for item in items] + [item['defendant'] for item in items]
+        )
+        plaintiffs, defendants = parties[:len(items)], parties[len(items):]
+
+        # Without a queued analysis the rule engine result is final and goes straight to the judge.
+        case_status = Case.CaseStatus.SUBMITTED if analyze else Case.CaseStatus.PENDING_JUDGE
+        cases = Case.objects.bulk_create([
+            Case(
+                plaintiff=plaintiff,
+                defendant=defendant,
+                status=case_status,
+                **{k: v for k, v in item.items() if k not in ('plaintiff', 'defendant', 'status')},
+            )
+            for item, plaintiff, defendant in zip(items, plaintiffs, defendants)
+        ])
+
+        ValidationResult.objects.bulk_create([
+            ValidationResult(
+                case=case,
+                is_accepted=validation['is_valid'],
+                rejection_reasons=validation['reasons'],
+                confidence_score=0.95 # Mock high confidence
+            )
+            for case, validation in zip(cases, validations)
+        ])
+
+        jobs = AnalysisJob.objects.bulk_create([AnalysisJob(case=case) for case in cases]) if analyze else []
+        # bulk_create sends no post_save signals
+        schedule_index(*(case.pk for case in cases))
+
+    return [
+        {
+            "case_id": case.id,
+            "status": "ACCEPTED" if validation['is_valid'] else "REJECTED",
+            "validation_details": validation['reasons'],
+            "job_id": jobs[i].id if jobs else None,
+        }
+        for i, (case, validation) in enumerate(zip(cases, validations))
+    ]
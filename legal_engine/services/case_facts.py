@@ -0,0 +1,82 @@
+from datetime import date, datetime
+from typing import Any, Mapping
+
+from .hijri import looks_hijri, parse_hijri
+
+
+def parse_date(value, field_name: str = 'date'):
+    """
+    Accepts date/datetime objects, ISO Gregorian strings and Umm al-Qura Hijri
+    strings ('1445/01/05'). Returns None for empty values, raises ValueError otherwise.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        if looks_hijri(value):
+            return parse_hijri(value)
+        try:
+            return date.fromisoformat(value.strip())
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid {field_name}: {value!r}")
+
+
+class CaseFacts:
+    """
+    The typed, pre-parsed view of a case the rule engine works on.
+    Built once per case; every date is a native `date` (or None).
+    """
+    __slots__ = (
+        'case_id', 'description', 'court_type', 'request_type',
+        'incident_date', 'grievance_date', 'submission_date',
+    )
+
+    def __init__(self, description='', incident_date=None, grievance_date=None, submission_date=None,
+                 court_type='', request_type='', case_id=None):
+        self.case_id = case_id
+        self.description = description or ''
+        self.court_type = court_type or ''
+        self.request_type = request_type or ''
+        self.incident_date = incident_date
+        self.grievance_date = grievance_date
+        # Not yet saved (or bulk intake): the submission is happening today.
+        self.submission_date = submission_date or date.today()
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> 'CaseFacts':
+        """
+        Builds facts from serializer data, validated_data or a values() row.
+        Malformed dates raise ValueError instead of being silently replaced.
+        """
+        return cls(
+            case_id=data.get('id'),
+            description=data.get('description'),
+            court_type=data.get('court_type'),
+            request_type=data.get('request_type'),
+            incident_date=parse_date(data.get('incident_date'), 'incident_date'),
+            grievance_date=parse_date(data.get('grievance_date'), 'grievance_date'),
+            submission_date=parse_date(data.get('submission_date'), 'submission_date'),
+        )
+
+    @classmethod
+    def from_case(cls, case) -> 'CaseFacts':
+        return cls(
+            case_id=case.pk,
+            description=case.description,
+            court_type=case.court_type,
+            request_type=case.request_type,
+            incident_date=case.incident_date,
+            grievance_date=case.grievance_date,
+            submission_date=case.submission_date,
+        )
+
+    @classmethod
+    def coerce(cls, value) -> 'CaseFacts':
+        return value if isinstance(value, cls) else cls.from_mapping(value)
+
+    def __repr__(self):
+        return f"CaseFacts(case_id={self.case_id!r}, incident_date={self.incident_date!r}, grievance_date={self.grievance_date!r})"
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.db import connections
+
+
+def closing_connections(func):
+    """
+    Runs func, then closes the database connections the current thread opened.
+    For threads outside Django's request cycle (pools, to_thread): nothing else
+    applies CONN_MAX_AGE or health checks there, so a connection opened by such a
+    thread would otherwise stay open for the life of the thread.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return run
+
+
+class ConnectionClosingExecutor(ThreadPoolExecutor):
+    """
+    Thread pool whose tasks hold a database connection only while they run.
+    Its threads never share a transaction with the submitter, so closing is safe.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(closing_connections(fn), *args, **kwargs)
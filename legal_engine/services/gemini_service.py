@@ -1,81 +1,440 @@
+import asyncio
+import logging
 import os
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from time import monotonic
+from typing import AsyncIterator, NamedTuple
+
 from dotenv import load_dotenv
 
+from .db_threads import ConnectionClosingExecutor, closing_connections
+from .llm_backends import FakeBackend, GeminiBackend
+from .llm_cache import cache_key, llm_cache
+from .llm_resilience import CircuitBreaker, LLMUnavailable, RetryPolicy, TokenBucket, is_retryable
+from .metrics import LLM_CALLS, registry, span
+from .token_budget import MAX_INPUT_TOKENS, chunk_text, estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Per-call deadlines (seconds) for the concurrent analysis mode
+ANALYSIS_TIMEOUT = float(os.getenv("GEMINI_ANALYSIS_TIMEOUT", "20"))
+REASONING_TIMEOUT = float(os.getenv("GEMINI_REASONING_TIMEOUT", "30"))
+
+# Bounded pool shared by every GeminiService instance, so concurrency toward
+# the API is capped per process no matter how many requests/workers call in.
+# Its tasks query the database (response cache, rate limiter) and close their
+# connection when done: pool threads outlive any request.
+_executor = ConnectionClosingExecutor(
+    max_workers=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    thread_name_prefix="gemini",
+)
+# Map-reduce chunk calls get their own pool: they are submitted from tasks already
+# running on _executor, and waiting on the same bounded pool could deadlock it.
+_chunk_executor = ConnectionClosingExecutor(
+    max_workers=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    thread_name_prefix="gemini-chunk",
+)
+
+
+# Stand in for an analysis that missed its deadline / could not reach Gemini at all
+ANALYSIS_TIMED_OUT = "تعذر إكمال التحليل الذكي في الوقت المحدد، يرجى مراجعة نص الدعوى يدوياً."
+ANALYSIS_UNAVAILABLE = "خدمة التحليل الذكي غير متاحة حالياً وسيعاد التحليل لاحقاً، يرجى مراجعة نص الدعوى يدوياً."
+
+
+class AIResult(NamedTuple):
+    analysis: str
+    reasoning: str
+    # True when either text is a deterministic stand-in; such results are re-run later
+    fallback: bool = False
+    error: str = ''
+
 class GeminiService:
     """
     Wrapper for Google Gemini API for Legal Analysis.
+    The transport is pluggable (LLM_BACKEND=gemini|fake, see llm_backends).
     """
     
+    MODEL_NAME = 'gemini-flash-latest'
+
+    # Bump when a prompt template changes so cached responses are not reused.
+    ANALYSIS_PROMPT_VERSION = 'analysis-v1'
+    ANALYSIS_CHUNK_PROMPT_VERSION = 'analysis-chunk-v1'
+    ANALYSIS_REDUCE_PROMPT_VERSION = 'analysis-reduce-v1'
+    REASONING_PROMPT_VERSION = 'reasoning-v1'
+
     def __init__(self):
-        # Force reload environment to ensure we get the latest file content
-        load_dotenv(override=True)
-        
-        self.api_key = os.getenv("GEMINI_API_KEY")
+        # Environment is read once at import; use reload() to pick up .env changes.
+        self._lock = threading.Lock()
+        self._configure()
+
+    def _configure(self):
+        api_key = os.getenv("GEMINI_API_KEY")
+        backend_name = os.getenv("LLM_BACKEND", "gemini").lower()
 
         # Configure the API
         placeholders = ["ضع_المفتاح_هنا", "YOUR_API_KEY_HERE", "", None]
         
-        # DEBUG: Verify exactly what is being loaded
-        print(f"DEBUG: GeminiService instantiating. Key: {self.api_key[:6] if self.api_key else 'None'}...")
+        # Never log the key itself, not even a prefix
+        logger.debug("Configuring GeminiService (backend=%s, key configured=%s)",
+                     backend_name, api_key not in placeholders)
         
-        if self.api_key and self.api_key not in placeholders:
+        backend, is_active = None, False
+        if backend_name == "fake":
+            # Local stand-in (see llm_backends.FakeBackend) - never touches the network
+            backend = FakeBackend.from_env()
+            is_active = True
+            logger.info("GeminiService using fake backend (latency=%s, errors=%s)", backend.latency, backend.error_rate)
+        elif api_key and api_key not in placeholders:
             try:
-                genai.configure(api_key=self.api_key)
                 # Switch to gemini-flash-latest as that is the available model alias
-                self.model = genai.GenerativeModel('gemini-flash-latest')
-                self.is_active = True
-                print("DEBUG: GeminiService initialized successfully with gemini-flash-latest.")
-            except Exception as e:
-                print(f"Error configuring Gemini: {e}")
-                self.is_active = False
+                backend = GeminiBackend(api_key, self.MODEL_NAME)
+                is_active = True
+                logger.info("GeminiService initialized with %s", self.MODEL_NAME)
+            except Exception:
+                logger.exception("Error configuring Gemini")
         else:
-            print("DEBUG: GeminiService is inactive due to missing/placeholder key.")
-            self.is_active = False
+            logger.warning("GeminiService is inactive: GEMINI_API_KEY is missing or a placeholder")
+
+        # Guards around every upstream call: the rate limit is shared by all processes
+        # (DB-backed), the breaker and retry policy are per process.
+        rate_limiter = TokenBucket.from_env(f"llm:{backend.model_name if backend else 'none'}")
+        breaker, retry_policy = CircuitBreaker.from_env(), RetryPolicy.from_env()
 
-    def analyze_text(self, text: str) -> str:
+        # Swap in the new handle only once it is fully built, so concurrent
+        # callers never see a half-configured service.
+        self.api_key, self.backend, self.is_active = api_key, backend, is_active
+        self.rate_limiter, self.breaker, self.retry_policy = rate_limiter, breaker, retry_policy
+
+    def reload(self):
+        """
+        Re-reads .env and rebuilds the model handle. Triggered explicitly
+        (SIGHUP or `manage.py test_gemini --reload`), never per request.
+        """
+        with self._lock:
+            load_dotenv(override=True)
+            self._configure()
+
+    def analyze_and_reason(self, text: str, case_data: dict, validation_result: dict,
+                           analysis_timeout: float = None, reasoning_timeout: float = None,
+                           reasoning: str = None) -> AIResult:
+        """
+        Runs analyze_text and generate_reasoning in parallel on the shared pool.
+        Latency is max(analysis, reasoning) instead of the sum; a call that misses
+        its deadline or fails is replaced by a deterministic fallback (and the
+        result marked as such) instead of failing both. A known `reasoning` is kept as is.
+        """
+        analysis_timeout = analysis_timeout or ANALYSIS_TIMEOUT
+        reasoning_timeout = reasoning_timeout or REASONING_TIMEOUT
+        errors = []
+
+        started = monotonic()
+        analysis_future = _executor.submit(self.analyze_text, text, analysis_timeout)
+        reasoning_future = None if reasoning else _executor.submit(
+            self.generate_reasoning, case_data, validation_result, reasoning_timeout
+        )
+
+        def wait(future, timeout, timed_out, failed):
+            remaining = max(0.0, timeout - (monotonic() - started))
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                errors.append(f"Deadline of {timeout}s exceeded")
+                return timed_out
+            except Exception as e:
+                errors.append(str(e))
+                return failed
+
+        analysis = wait(analysis_future, analysis_timeout, ANALYSIS_TIMED_OUT, ANALYSIS_UNAVAILABLE)
+        if reasoning_future is not None:
+            fallback_reasoning = self.fallback_reasoning(validation_result)
+            reasoning = wait(reasoning_future, reasoning_timeout, fallback_reasoning, fallback_reasoning)
+        return AIResult(analysis=analysis, reasoning=reasoning, fallback=bool(errors), error="; ".join(errors))
+
+    @staticmethod
+    def fallback_reasoning(validation_result: dict) -> str:
+        status = "Accepted" if validation_result.get('is_valid') else "Rejected"
+        return f"التسبيب الافتراضي (تجريبي): بناءً على المعطيات، فإن التوصية هي {status}."
+
+    def analyze_text(self, text: str, timeout: float = None) -> str:
         """
         Analyzes the plaintiff's text using Gemini.
+        Raises LLMUnavailable (or the upstream error) instead of returning an error text.
         """
         if not self.is_active:
-             return "Gemini API غير مفعل. (الوضع التجريبي)"
+            raise LLMUnavailable("Gemini is not configured")
+
+        if estimate_tokens(text) > MAX_INPUT_TOKENS:
+            return self._map_reduce_analysis(text, timeout)
+        return self._generate(self._analysis_prompt(text), self.ANALYSIS_PROMPT_VERSION, timeout)
+
+    async def analyze_text_async(self, text: str, timeout: float = None) -> str:
+        """
+        analyze_text without holding a thread while Gemini works.
+        """
+        if not self.is_active:
+            raise LLMUnavailable("Gemini is not configured")
+
+        if estimate_tokens(text) > MAX_INPUT_TOKENS:
+            # Rare (long attachments); the map-reduce fan-out has its own thread pool.
+            return await asyncio.to_thread(closing_connections(self._map_reduce_analysis), text, timeout)
+        return await self._agenerate(self._analysis_prompt(text), self.ANALYSIS_PROMPT_VERSION, timeout)
 
-        try:
-            prompt = f"""
+    @staticmethod
+    def _analysis_prompt(text: str) -> str:
+        return f"""
             أنت خبير قانوني في ديوان المظالم السعودي.
             قم بتحليل نص الدعوى التالي واستخرج النقاط الجوهرية فقط:
             "{text}"
             """
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"خطأ في الاتصال بـ Gemini: {str(e)}"
 
-    def generate_reasoning(self, case_data: dict, validation_result: dict) -> str:
+    def _map_reduce_analysis(self, text: str, timeout: float = None) -> str:
+        """
+        Inputs over the token budget (long complaints, attached pleadings): the
+        paragraph-aligned chunks are analyzed concurrently (map), then the partial
+        analyses are merged (reduce, repeated while they still exceed the budget).
+        Every call goes through the response cache, so after an edit only the
+        changed chunk and the reduce step reach the model again.
+        """
+        deadline = monotonic() + timeout if timeout else None
+
+        def remaining():
+            return None if deadline is None else max(0.1, deadline - monotonic())
+
+        def run_all(prompts, template_version):
+            """The answers that came in time, and how many parts were missed."""
+            futures = [_chunk_executor.submit(self._generate, prompt, template_version, remaining())
+                       for prompt in prompts]
+            results, missed = [], 0
+            for future in futures:
+                try:
+                    results.append(future.result(timeout=remaining()))
+                except FutureTimeoutError:
+                    future.cancel()
+                    missed += 1
+                except LLMUnavailable as e:
+                    # Breaker open or retries exhausted: lose this part, not the whole analysis.
+                    logger.warning("Part of a long text was not analyzed: %s", e)
+                    missed += 1
+            if not results:
+                raise TimeoutError("No part of the text was analyzed before the deadline")
+            return results, missed
+
+        partials, missed = run_all(
+            [self._chunk_prompt(chunk) for chunk in chunk_text(text)], self.ANALYSIS_CHUNK_PROMPT_VERSION
+        )
+
+        while True:
+            groups = chunk_text("\n\n".join(partials), MAX_INPUT_TOKENS)
+            if len(groups) >= len(partials) > 1:
+                # Partials too long to pair up: merge what fits in one prompt rather than loop.
+                groups = [truncate_to_tokens("\n\n".join(partials), MAX_INPUT_TOKENS)]
+            if len(groups) == 1:
+                analysis = self._generate(
+                    self._reduce_prompt(groups[0]), self.ANALYSIS_REDUCE_PROMPT_VERSION, remaining()
+                )
+                break
+            partials, reduce_missed = run_all(
+                [self._reduce_prompt(group) for group in groups], self.ANALYSIS_REDUCE_PROMPT_VERSION
+            )
+            missed += reduce_missed
+
+        if missed:
+            analysis += f"\n\n(تعذر تحليل {missed} من أجزاء الملف في الوقت المحدد، يرجى مراجعتها يدوياً.)"
+        return analysis
+
+    @staticmethod
+    def _chunk_prompt(chunk: str) -> str:
+        # No part number in the prompt: the same section must hit the cache wherever it moves.
+        return f"""
+            أنت خبير قانوني في ديوان المظالم السعودي.
+            النص التالي جزء من ملف دعوى طويل. استخرج النقاط الجوهرية الواردة فيه فقط، دون افتراض ما ورد في بقية الملف:
+            "{chunk}"
+            """
+
+    @staticmethod
+    def _reduce_prompt(partials: str) -> str:
+        return f"""
+            أنت خبير قانوني في ديوان المظالم السعودي.
+            فيما يلي تحليلات جزئية لأجزاء متتالية من ملف دعوى واحدة.
+            ادمجها في تحليل واحد موجز يستخرج النقاط الجوهرية فقط، واحذف التكرار:
+            "{partials}"
+            """
+
+    def _generate(self, prompt: str, template_version: str, timeout: float = None) -> str:
+        """
+        generate_content behind the content-addressed response cache.
+        Only successful responses are cached; errors propagate to the caller.
+        """
+        backend = self.backend
+        key = cache_key(prompt, backend.model_name, template_version)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+        text = self._call_backend(prompt, template_version, timeout)
+        llm_cache.set(key, text, backend.model_name, template_version)
+        return text
+
+    def _call_backend(self, prompt: str, template_version: str, timeout: float = None) -> str:
+        """
+        backend.generate behind the shared rate limiter, the circuit breaker and
+        jittered exponential retries of retryable errors, all within `timeout`.
+        Raises LLMUnavailable when no answer can be had in time; other errors propagate.
+        """
+        deadline = monotonic() + timeout if timeout else None
+        for attempt in range(self.retry_policy.attempts):
+            self._check_breaker(template_version)
+            with span('llm_rate_limit'):
+                self.rate_limiter.acquire(deadline)
+            try:
+                with span(f'gemini:{template_version}'):
+                    text = self.backend.generate(prompt, timeout=self._remaining(deadline))
+            except Exception as e:
+                delay = self._after_failure(e, attempt, deadline, template_version)
+                time.sleep(delay)
+            else:
+                self._record_success(template_version)
+                return text
+
+    async def _acall_backend(self, prompt: str, template_version: str, timeout: float = None) -> str:
+        deadline = monotonic() + timeout if timeout else None
+        for attempt in range(self.retry_policy.attempts):
+            self._check_breaker(template_version)
+            with span('llm_rate_limit'):
+                await self.rate_limiter.aacquire(deadline)
+            try:
+                with span(f'gemini:{template_version}'):
+                    text = await self.backend.agenerate(prompt, timeout=self._remaining(deadline))
+            except Exception as e:
+                delay = self._after_failure(e, attempt, deadline, template_version)
+                await asyncio.sleep(delay)
+            else:
+                self._record_success(template_version)
+                return text
+
+    def _check_breaker(self, template_version: str):
+        if not self.breaker.allow():
+            LLM_CALLS.inc(prompt=template_version, outcome='short_circuit')
+            raise LLMUnavailable("Circuit open: recent Gemini calls keep failing")
+
+    def _record_success(self, template_version: str):
+        self.breaker.record_success()
+        LLM_CALLS.inc(prompt=template_version, outcome='ok')
+
+    @staticmethod
+    def _remaining(deadline):
+        if deadline is None:
+            return None
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            raise LLMUnavailable("Deadline exceeded before Gemini could be called")
+        return remaining
+
+    def _after_failure(self, error: Exception, attempt: int, deadline, template_version: str) -> float:
+        """Backoff before the next attempt; raises when `error` should not (or cannot) be retried."""
+        if not is_retryable(error):
+            # The upstream answered (bad request, safety block...): not an outage.
+            LLM_CALLS.inc(prompt=template_version, outcome='error')
+            self.breaker.record_success()
+            raise error
+        LLM_CALLS.inc(prompt=template_version, outcome='retryable_error')
+        self.breaker.record_failure()
+        delay = self.retry_policy.delay(attempt)
+        if attempt + 1 >= self.retry_policy.attempts or (deadline is not None and monotonic() + delay >= deadline):
+            raise LLMUnavailable(f"Gemini call failed after {attempt + 1} attempt(s): {error}") from error
+        return delay
+
+    async def _agenerate(self, prompt: str, template_version: str, timeout: float = None) -> str:
+        backend = self.backend
+        key = cache_key(prompt, backend.model_name, template_version)
+        cached = await llm_cache.aget(key)
+        if cached is not None:
+            return cached
+
+        text = await self._acall_backend(prompt, template_version, timeout)
+        await llm_cache.aset(key, text, backend.model_name, template_version)
+        return text
+
+    async def _astream(self, prompt: str, template_version: str, timeout: float = None) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of _agenerate: yields pieces as the model produces them
+        and caches the assembled response once complete. A cache hit yields it whole.
+        """
+        backend = self.backend
+        key = cache_key(prompt, backend.model_name, template_version)
+        cached = await llm_cache.aget(key)
+        if cached is not None:
+            yield cached
+            return
+
+        pieces = []
+        deadline = monotonic() + timeout if timeout else None
+        for attempt in range(self.retry_policy.attempts):
+            self._check_breaker(template_version)
+            with span('llm_rate_limit'):
+                await self.rate_limiter.aacquire(deadline)
+            try:
+                # Spans the whole stream, pauses of the client reading it included
+                with span(f'gemini:{template_version}'):
+                    async for piece in backend.astream(prompt, timeout=self._remaining(deadline)):
+                        pieces.append(piece)
+                        yield piece
+            except Exception as e:
+                if pieces:
+                    # Part of the answer is already out; the caller decides what to do with it.
+                    LLM_CALLS.inc(prompt=template_version, outcome='error')
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    raise
+                delay = self._after_failure(e, attempt, deadline, template_version)
+                await asyncio.sleep(delay)
+            else:
+                self._record_success(template_version)
+                break
+        await llm_cache.aset(key, ''.join(pieces), backend.model_name, template_version)
+
+    def generate_reasoning(self, case_data: dict, validation_result: dict, timeout: float = None) -> str:
         """
         Generates eloquent legal reasoning for the judge.
+        Raises LLMUnavailable (or the upstream error); analyze_and_reason falls back.
         """
         if not self.is_active:
-            # Mock Response if no key
-            status = "Accepted" if validation_result.get('is_valid') else "Rejected"
-            return f"التسبيب الافتراضي (تجريبي): بناءً على المعطيات، فإن التوصية هي {status}."
-
-        try:
-            # Prepare Context
-            status = "قبول الدعوى شكلاً" if validation_result.get('is_valid') else "عدم قبول الدعوى شكلاً"
-            reasons = validation_result.get('reasons', [])
-            reasons_text = "\n".join([r['message'] for r in reasons]) if reasons else "لا يوجد موانع إجرائية."
-            
-            prompt = f"""
+            raise LLMUnavailable("Gemini is not configured")
+
+        prompt = self._reasoning_prompt(case_data, validation_result)
+        return self._generate(prompt, self.REASONING_PROMPT_VERSION, timeout)
+
+    async def stream_reasoning(self, case_data: dict, validation_result: dict,
+                               timeout: float = None) -> AsyncIterator[str]:
+        """
+        generate_reasoning, streamed. Errors are raised, possibly after some pieces.
+        """
+        if not self.is_active:
+            raise LLMUnavailable("Gemini is not configured")
+        prompt = self._reasoning_prompt(case_data, validation_result)
+        async for piece in self._astream(prompt, self.REASONING_PROMPT_VERSION, timeout):
+            yield piece
+
+    @staticmethod
+    def _reasoning_prompt(case_data: dict, validation_result: dict) -> str:
+        # Prepare Context
+        status = "قبول الدعوى شكلاً" if validation_result.get('is_valid') else "عدم قبول الدعوى شكلاً"
+        reasons = validation_result.get('reasons', [])
+        reasons_text = "\n".join([r['message'] for r in reasons]) if reasons else "لا يوجد موانع إجرائية."
+        
+        return f"""
             بصفتك مستشاراً أول في المحكمة الإدارية (ديوان المظالم)، قم بصياغة "منطوق حكم وتسبيب" مبدئي يوجه للقاضي ناظر القضية.
 
             البيانات الأساسية:
-            - موضوع الدعوى: {case_data.get('description', '')}
+            - موضوع الدعوى: {truncate_to_tokens(case_data.get('description', ''), MAX_INPUT_TOKENS)}
             - تاريخ القرار الإداري: {case_data.get('decision_date', 'غير محدد')}
             - تاريخ العلم بالقرار: {case_data.get('incident_date', 'غير محدد')} (الأساس لحساب المدة)
             - هل يوجد تظلم سابق؟: {'نعم' if case_data.get('grievance_date') else 'لا'}
@@ -90,9 +449,27 @@ class GeminiService:
             يجب أن توضح النص النظامي المستند عليه (مثل المادة 8 أو 16 من نظام المرافعات) وتشرح لماذا تم قبول الدعوى أو رفضها بناءً على التواريخ والوقائع أعلاه.
             اجعل الأسلوب قضائياً بحتاً ومقنعاً.
             """
-            
-            response = self.model.generate_content(prompt)
-            return response.text
-            
-        except Exception as e:
-            return f"تعذر توليد التسبيب: {str(e)}"
+
+
+_shared_service = None
+_shared_lock = threading.Lock()
+
+
+def get_gemini_service() -> GeminiService:
+    """
+    Returns the process-wide GeminiService, creating it on first use.
+    Normally created up front by LegalEngineConfig.ready(); reusing one
+    instance keeps the underlying client and its connections warm.
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_lock:
+            if _shared_service is None:
+                _shared_service = GeminiService()
+    return _shared_service
+
+
+registry.gauge(
+    'modaqiq_llm_circuit_open', 'Whether this process currently short-circuits Gemini calls (1) or not (0)',
+    collect=lambda: {(): int(_shared_service is not None and _shared_service.breaker.state == 'open')},
+)
@@ -0,0 +1,100 @@
+import re
+from array import array
+from datetime import date
+from typing import Tuple
+
+# Umm al-Qura calendar, 1343/01/01 AH (1924-08-01) .. 1500/12/30 AH (2077-11-16).
+# One string per Hijri year, one digit per month: month length - 28.
+# Precomputed from the official Umm al-Qura tables; conversions are table
+# lookups, with no iterative calendar arithmetic.
+HIJRI_MIN_YEAR = 1343
+HIJRI_MAX_YEAR = 1500
+_EPOCH = date(1924, 8, 1).toordinal()
+
+_MONTH_LENGTHS = ''.join((
+    '212212220222' '112121212121' '212131202212' '112212211221' '112212212211' '212121221130'  # 1343-1348
+    '212121222032' '121211212212' '212121112212' '212121212121' '212212122112' '121212212121'  # 1349-1354
+    '212121212212' '112121221121' '212121212122' '221211211221' '222121121121' '212121212122'  # 1355-1360
+    '212121212121' '212121212121' '212121212122' '212121202221' '212121212122' '212121212121'  # 1361-1366
+    '212121212121' '212121212122' '212121221221' '212121212121' '212112121222' '121212112122'  # 1367-1372
+    '121212121212' '212121221122' '212121211221' '121122212121' '211212122122' '212121212121'  # 1373-1378
+    '121212121212' '212121212121' '212212112121' '212212211212' '121221212121' '212121212121'  # 1379-1384
+    '212211212221' '221121212122' '112121212122' '122121212121' '212121212122' '212121221211'  # 1385-1390
+    '212121212122' '112121212122' '212111212122' '212121211221' '212212112121' '212221211212'  # 1391-1396
+    '121221212121' '212121221212' '121212121221' '221211212122' '121212112121' '222121211212'  # 1397-1402
+    '122212121121' '122122212112' '112212212121' '212121212212' '121212121212' '212121211212'  # 1403-1408
+    '212212121121' '212221212112' '121221221211' '211221222121' '121122122122' '112112122212'  # 1409-1414
+    '121211212212' '212121211212' '212122121211' '212122212121' '121212212212' '121121222212'  # 1415-1420
+    '112111222212' '211211122212' '212121121212' '212212112121' '212212122121' '121212212212'  # 1421-1426
+    '112121221221' '211211222122' '121121122122' '122112121212' '122121212112' '122212121211'  # 1427-1432
+    '212212212121' '121212212211' '212121212212' '121212121212' '212211212112' '212221121121'  # 1433-1438
+    '212221212112' '121222121211' '212122122121' '121212122121' '212121212122' '121221121212'  # 1439-1444
+    '122212112112' '122212211211' '212221212121' '121221221212' '112121221221' '212112121221'  # 1445-1450
+    '221211212121' '222121121212' '122211212121' '122212121212' '112212122121' '211212122212'  # 1451-1456
+    '121121122122' '212112112212' '221211211221' '221212121122' '121221212121' '212121212212'  # 1457-1462
+    '121121221221' '212112121222' '121211211222' '212121121212' '212212112121' '212212121212'  # 1463-1468
+    '112212212211' '211221212221' '121121221221' '212121121221' '212212112121' '221221211212'  # 1469-1474
+    '121222121121' '121222122112' '112122122211' '211212212212' '121121212212' '122112121212'  # 1475-1480
+    '122122121121' '212212212112' '112212221211' '211221221221' '121122121222' '112121212122'  # 1481-1486
+    '121212112122' '122121211212' '122212121121' '212212212112' '121212212122' '112121212212'  # 1487-1492
+    '211212112212' '221121121212' '221212112121' '222121211212' '122122112121' '212122121212'  # 1493-1498
+    '121212121221' '221121121222'  # 1499-1500
+))
+
+# Ordinal day of the first day of every month (plus one sentinel past the end)
+_MONTH_STARTS = array('l', [_EPOCH])
+for _length in _MONTH_LENGTHS:
+    _MONTH_STARTS.append(_MONTH_STARTS[-1] + 28 + int(_length))
+
+# Month index for every day in range, so Gregorian -> Hijri is a single index
+_DAY_TO_MONTH = array('H')
+for _index in range(len(_MONTH_LENGTHS)):
+    _DAY_TO_MONTH.extend([_index] * (_MONTH_STARTS[_index + 1] - _MONTH_STARTS[_index]))
+
+GREGORIAN_MIN = date.fromordinal(_MONTH_STARTS[0])
+GREGORIAN_MAX = date.fromordinal(_MONTH_STARTS[-1] - 1)
+
+_HIJRI_PATTERN = re.compile(r'^\s*(\d{4})\s*[/\-.]\s*(\d{1,2})\s*[/\-.]\s*(\d{1,2})\s*(?:هـ|ه)?\s*$')
+_ARABIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+
+
+def month_length(year: int, month: int) -> int:
+    _check_year(year)
+    return 28 + int(_MONTH_LENGTHS[(year - HIJRI_MIN_YEAR) * 12 + month - 1])
+
+
+def hijri_to_gregorian(year: int, month: int, day: int) -> date:
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid Hijri month: {month}")
+    if not 1 <= day <= month_length(year, month):
+        raise ValueError(f"Invalid Hijri day: {year}/{month:02d}/{day:02d}")
+    return date.fromordinal(_MONTH_STARTS[(year - HIJRI_MIN_YEAR) * 12 + month - 1] + day - 1)
+
+
+def gregorian_to_hijri(value: date) -> Tuple[int, int, int]:
+    offset = value.toordinal() - _EPOCH
+    if not 0 <= offset < len(_DAY_TO_MONTH):
+        raise ValueError(f"Date outside the supported Umm al-Qura range: {value}")
+    index = _DAY_TO_MONTH[offset]
+    year, month = divmod(index, 12)
+    return HIJRI_MIN_YEAR + year, month + 1, value.toordinal() - _MONTH_STARTS[index] + 1
+
+
+def parse_hijri(value: str) -> date:
+    """
+    Parses '1445/01/05', '1445-1-5' or '١٤٤٥/٠١/٠٥هـ' into a Gregorian date.
+    """
+    match = _HIJRI_PATTERN.match(value.translate(_ARABIC_DIGITS))
+    if not match:
+        raise ValueError(f"Not a Hijri date: {value!r}")
+    return hijri_to_gregorian(*(int(part) for part in match.groups()))
+
+
+def looks_hijri(value: str) -> bool:
+    match = _HIJRI_PATTERN.match(value.translate(_ARABIC_DIGITS))
+    return bool(match) and int(match.group(1)) <= HIJRI_MAX_YEAR
+
+
+def _check_year(year: int):
+    if not HIJRI_MIN_YEAR <= year <= HIJRI_MAX_YEAR:
+        raise ValueError(f"Hijri year outside the supported Umm al-Qura range: {year}")
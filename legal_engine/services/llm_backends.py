@@ -0,0 +1,188 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from typing import AsyncIterator, Iterator
+
+import google.generativeai as genai
+
+
+class LLMBackend:
+    """
+    Minimal interface GeminiService needs from a text-generation backend.
+    """
+    model_name = ''
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float = None) -> Iterator[str]:
+        """
+        Yields the response in pieces as the model produces them.
+        Backends without streaming yield the whole response once.
+        """
+        yield self.generate(prompt, timeout=timeout)
+
+    async def agenerate(self, prompt: str, timeout: float = None) -> str:
+        """
+        generate() for the async views. Backends without a native async client
+        run the blocking call on a worker thread.
+        """
+        return await asyncio.to_thread(self.generate, prompt, timeout)
+
+    async def astream(self, prompt: str, timeout: float = None) -> AsyncIterator[str]:
+        yield await self.agenerate(prompt, timeout=timeout)
+
+
+class GeminiBackend(LLMBackend):
+    """
+    The real Google Gemini model.
+    """
+
+    def __init__(self, api_key: str, model_name: str):
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        request_options = {"timeout": timeout} if timeout else {}
+        response = self.model.generate_content(prompt, request_options=request_options)
+        return response.text
+
+    def stream(self, prompt: str, timeout: float = None) -> Iterator[str]:
+        request_options = {"timeout": timeout} if timeout else {}
+        for chunk in self.model.generate_content(prompt, stream=True, request_options=request_options):
+            if chunk.text:
+                yield chunk.text
+
+    async def agenerate(self, prompt: str, timeout: float = None) -> str:
+        request_options = {"timeout": timeout} if timeout else {}
+        response = await self.model.generate_content_async(prompt, request_options=request_options)
+        return response.text
+
+    async def astream(self, prompt: str, timeout: float = None) -> AsyncIterator[str]:
+        request_options = {"timeout": timeout} if timeout else {}
+        response = await self.model.generate_content_async(prompt, stream=True, request_options=request_options)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeBackendError(Exception):
+    """
+    Injected failure raised by FakeBackend.
+    """
+
+
+class FakeBackend(LLMBackend):
+    """
+    In-process stand-in for Gemini, for load tests and offline development.
+
+    latency: "constant:SECONDS", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA" (seconds).
+    error_rate: fraction of calls (0..1) that raise FakeBackendError.
+    response_chars: size of the generated response.
+    """
+    model_name = 'fake-llm'
+    STREAM_PIECE_CHARS = 40
+
+    def __init__(self, latency: str = 'constant:0', error_rate: float = 0.0,
+                 response_chars: int = 600, seed: int = None):
+        self.latency = latency
+        self._sample_latency = self._parse_latency(latency)
+        self.error_rate = error_rate
+        self.response_chars = response_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'FakeBackend':
+        seed = os.getenv("LLM_FAKE_SEED")
+        return cls(
+            latency=os.getenv("LLM_FAKE_LATENCY", "lognormal:1.5,0.4"),
+            error_rate=float(os.getenv("LLM_FAKE_ERROR_RATE", "0")),
+            response_chars=int(os.getenv("LLM_FAKE_RESPONSE_CHARS", "600")),
+            seed=int(seed) if seed else None,
+        )
+
+    def _parse_latency(self, spec: str):
+        kind, _, args = spec.partition(':')
+        params = [float(x) for x in args.split(',') if x.strip()]
+        if kind == 'constant':
+            return lambda rnd: params[0] if params else 0.0
+        if kind == 'uniform':
+            return lambda rnd: rnd.uniform(params[0], params[1])
+        if kind == 'lognormal':
+            median, sigma = params
+            return lambda rnd: rnd.lognormvariate(math.log(median), sigma)
+        raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+    def _sample(self):
+        with self._lock:
+            return self._sample_latency(self._random), self._random.random() < self.error_rate
+
+    def _pieces(self):
+        text = self._response()
+        return [text[i:i + self.STREAM_PIECE_CHARS] for i in range(0, len(text), self.STREAM_PIECE_CHARS)]
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        delay, fail = self._sample()
+
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise FakeBackendError(f"Deadline exceeded after {timeout}s")
+        time.sleep(delay)
+        if fail:
+            raise FakeBackendError("Injected upstream error")
+
+        return self._response()
+
+    def stream(self, prompt: str, timeout: float = None) -> Iterator[str]:
+        # Same latency model, but split: a quarter before the first piece, the rest spread over the pieces.
+        delay, fail = self._sample()
+
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise FakeBackendError(f"Deadline exceeded after {timeout}s")
+        time.sleep(delay / 4)
+        if fail:
+            raise FakeBackendError("Injected upstream error")
+
+        pieces = self._pieces()
+        for piece in pieces:
+            time.sleep(delay * 3 / 4 / len(pieces))
+            yield piece
+
+    # The async variants wait with asyncio.sleep, so thousands of them share one thread.
+
+    async def agenerate(self, prompt: str, timeout: float = None) -> str:
+        delay, fail = self._sample()
+
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise FakeBackendError(f"Deadline exceeded after {timeout}s")
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeBackendError("Injected upstream error")
+
+        return self._response()
+
+    async def astream(self, prompt: str, timeout: float = None) -> AsyncIterator[str]:
+        delay, fail = self._sample()
+
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise FakeBackendError(f"Deadline exceeded after {timeout}s")
+        await asyncio.sleep(delay / 4)
+        if fail:
+            raise FakeBackendError("Injected upstream error")
+
+        pieces = self._pieces()
+        for piece in pieces:
+            await asyncio.sleep(delay * 3 / 4 / len(pieces))
+            yield piece
+
+    def _response(self) -> str:
+        body = "تحليل تجريبي من الخادم المحلي. "
+        return (body * (self.response_chars // len(body) + 1))[:self.response_chars]
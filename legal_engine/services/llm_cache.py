@@ -0,0 +1,205 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import registry
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_PERSISTENT_ENTRIES = int(os.getenv("LLM_CACHE_PERSISTENT_ENTRIES", "20000"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Collapses whitespace so prompts that differ only in indentation/line breaks share a key.
+    """
+    return " ".join(prompt.split())
+
+
+def cache_key(prompt: str, model_name: str, template_version: str) -> str:
+    payload = "\x1f".join([model_name, template_version, normalize_prompt(prompt)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier response cache for LLM calls.
+    - Memory tier: per-process LRU with TTL (answers repeats in microseconds).
+    - Persistent tier: LLMCacheEntry table shared by all web/worker processes.
+    The persistent tier queries the database from the calling thread: call it from
+    request or worker threads, sync_to_async, or a ConnectionClosingExecutor pool,
+    never from a bare thread that would keep its connection open forever.
+    """
+
+    def __init__(self, ttl: int = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 max_persistent_entries: int = LLM_CACHE_PERSISTENT_ENTRIES, persistent: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_persistent_entries = max_persistent_entries
+        self.persistent = persistent
+        self._entries = OrderedDict()  # key -> (expires_at monotonic, value)
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key: str, now: float):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+        return None
+
+    def get(self, key: str):
+        now = monotonic()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+
+        value = self._get_persistent(key) if self.persistent else None
+        return self._record_lookup(key, value, now)
+
+    async def aget(self, key: str):
+        """get() for async callers; only the persistent tier leaves the event loop."""
+        now = monotonic()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+
+        value = await sync_to_async(self._get_persistent)(key) if self.persistent else None
+        return self._record_lookup(key, value, now)
+
+    def _record_lookup(self, key, value, now):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+            self._remember(key, value, now)
+        return value
+
+    def set(self, key: str, value: str, model_name: str, template_version: str):
+        with self._lock:
+            self._remember(key, value, monotonic())
+        if self.persistent:
+            self._set_persistent(key, value, model_name, template_version)
+
+    async def aset(self, key: str, value: str, model_name: str, template_version: str):
+        with self._lock:
+            self._remember(key, value, monotonic())
+        if self.persistent:
+            await sync_to_async(self._set_persistent)(key, value, model_name, template_version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+            }
+
+    def _remember(self, key, value, now):
+        # Caller holds the lock
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_persistent(self, key):
+        from legal_engine.models import LLMCacheEntry
+
+        now = timezone.now()
+        try:
+            value = (
+                LLMCacheEntry.objects.filter(key=key, expires_at__gt=now)
+                .values_list("response", flat=True)
+                .first()
+            )
+            if value is not None:
+                LLMCacheEntry.objects.filter(key=key).update(hits=F("hits") + 1, last_used_at=now)
+            return value
+        except DatabaseError:
+            # The cache must never take the request down with it.
+            return None
+
+    def _set_persistent(self, key, value, model_name, template_version):
+        from legal_engine.models import LLMCacheEntry
+
+        now = timezone.now()
+        try:
+            LLMCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    "model_name": model_name,
+                    "template_version": template_version,
+                    "response": value,
+                    "last_used_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                },
+            )
+        except DatabaseError:
+            return
+
+        with self._lock:
+            self._writes_since_prune += 1
+            due = self._writes_since_prune >= 100
+            if due:
+                self._writes_since_prune = 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Drops expired rows, then the least recently used rows above the size limit.
+        """
+        from legal_engine.models import LLMCacheEntry
+
+        try:
+            deleted, _ = LLMCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+            cutoff = (
+                LLMCacheEntry.objects.order_by("-last_used_at")
+                .values_list("last_used_at", flat=True)[self.max_persistent_entries:self.max_persistent_entries + 1]
+            )
+            cutoff = list(cutoff)
+            if cutoff:
+                extra, _ = LLMCacheEntry.objects.filter(last_used_at__lte=cutoff[0]).delete()
+                deleted += extra
+            return deleted
+        except DatabaseError:
+            return 0
+
+
+# Process-wide instance used by GeminiService
+llm_cache = LLMCache()
+
+
+def _cache_lookups():
+    stats = llm_cache.stats()
+    return {('memory',): stats['memory_hits'], ('persistent',): stats['persistent_hits'], ('miss',): stats['misses']}
+
+
+registry.gauge(
+    'modaqiq_llm_cache_lookups', 'LLM response cache lookups in this process, by the tier that answered',
+    labels=('result',), collect=_cache_lookups,
+)
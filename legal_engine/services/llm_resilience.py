@@ -0,0 +1,186 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, IntegrityError
+
+from google.api_core import exceptions as google_exceptions
+
+from legal_engine.models import RateLimitBucket
+from .llm_backends import FakeBackendError
+
+# Errors worth retrying: quota/rate limits, overload, transient transport failures.
+# Anything else (bad request, safety block, bad key) fails on the first attempt.
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    TimeoutError,
+    ConnectionError,
+    FakeBackendError,
+)
+
+
+class LLMUnavailable(Exception):
+    """
+    The upstream could not be used for this call: circuit open, rate-limit wait
+    longer than the deadline, or retries exhausted. Callers fall back.
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class TokenBucket:
+    """
+    Token bucket stored in a RateLimitBucket row, so every web and worker process
+    draws from the same budget. Taking a token is read-refill-write with a
+    compare-and-swap on the row's version; a lost race simply reads again.
+    rate <= 0 disables the limiter.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+
+    @classmethod
+    def from_env(cls, name: str) -> 'TokenBucket':
+        return cls(
+            name,
+            rate=float(os.getenv("LLM_RATE_PER_SECOND", "5")),
+            burst=float(os.getenv("LLM_RATE_BURST", "10")),
+        )
+
+    def _try_take(self) -> float:
+        """Takes one token and returns 0, or returns the seconds until one is available."""
+        while True:
+            now = time.time()
+            row = RateLimitBucket.objects.filter(name=self.name).values_list('tokens', 'updated_at', 'version').first()
+            if row is None:
+                try:
+                    RateLimitBucket.objects.create(name=self.name, tokens=self.burst - 1, updated_at=now)
+                    return 0.0
+                except IntegrityError:
+                    continue  # created concurrently
+
+            tokens, updated_at, version = row
+            tokens = min(self.burst, tokens + max(0.0, now - updated_at) * self.rate)
+            if tokens < 1:
+                return (1 - tokens) / self.rate
+            if RateLimitBucket.objects.filter(name=self.name, version=version).update(
+                tokens=tokens - 1, updated_at=now, version=version + 1,
+            ):
+                return 0.0
+
+    def acquire(self, deadline: float = None):
+        """Blocks until a token is taken; raises LLMUnavailable if that would pass `deadline` (monotonic)."""
+        if self.rate <= 0:
+            return
+        while True:
+            try:
+                wait = self._try_take()
+            except DatabaseError:
+                return  # the limiter must never take the request down with it
+            if not wait:
+                return
+            if deadline is not None and monotonic() + wait > deadline:
+                raise LLMUnavailable(f"Rate limit '{self.name}' would delay the call past its deadline")
+            time.sleep(wait)
+
+    async def aacquire(self, deadline: float = None):
+        if self.rate <= 0:
+            return
+        while True:
+            try:
+                wait = await sync_to_async(self._try_take)()
+            except DatabaseError:
+                return
+            if not wait:
+                return
+            if deadline is not None and monotonic() + wait > deadline:
+                raise LLMUnavailable(f"Rate limit '{self.name}' would delay the call past its deadline")
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Per-process breaker: after `failure_threshold` consecutive retryable failures
+    it opens and every call short-circuits for `reset_timeout` seconds; then one
+    probe call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreaker':
+        return cls(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._probing or monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = monotonic()
+                self._probing = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n waits uniform(0, min(cap, base * 2**n))."""
+
+    def __init__(self, attempts: int = 3, base: float = 0.5, cap: float = 8.0, rng: random.Random = None):
+        self.attempts = max(1, attempts)
+        self.base = base
+        self.cap = cap
+        self._random = rng or random.Random()
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        return cls(
+            attempts=int(os.getenv("LLM_RETRY_ATTEMPTS", "3")),
+            base=float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5")),
+            cap=float(os.getenv("LLM_RETRY_CAP_SECONDS", "8")),
+        )
+
+    def delay(self, attempt: int) -> float:
+        return self._random.uniform(0, min(self.cap, self.base * 2 ** attempt))
@@ -1,105 +1,51 @@
-from datetime import date, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Union
+
+from .case_facts import CaseFacts
+from .rule_registry import CompiledRule, rule_registry
 
 class RuleValidator:
     """
     Core Logic Engine for Mudadeq.
     Validates cases against procedural rules.
+
+    The rules themselves (Article 8 grievance, Article 16 limitation period, ...)
+    live in the ProceduralRule table and are compiled once per process by
+    rule_registry, so a validation never queries the DB.
     """
 
-    def validate_case(self, case_data: Dict[str, Any]) -> Dict[str, Any]:
+    def __init__(self, rules: Iterable[CompiledRule] = None):
+        self._rules = tuple(rules) if rules is not None else None
+
+    @property
+    def rules(self):
+        return self._rules if self._rules is not None else rule_registry.get_rules()
+
+    def validate_case(self, case_data: Union[CaseFacts, Dict[str, Any]]) -> Dict[str, Any]:
         """
         Main entry point for validation.
+        Accepts CaseFacts, or a mapping that is parsed into CaseFacts once.
         """
-        reasons = []
-        
-        # 1. Article 8: Mandatory Grievance for Civil Service/Military
-        # Assumes 'court_type' or plaintiff details imply this. 
-        # For this hackathon, we check if implied by input/description or explicit type.
-        if not self._check_article_8_grievance(case_data):
-             reasons.append({
-                "code": "ARTICLE_8_GRIEVANCE_MISSING",
-                "message": "عدم قبول الدعوى لانتفاء شرط التظلم الوجوبي (المادة 8 من نظام المرافعات).",
-                "severity": "BLOCKER"
-            })
-
-        # 2. Article 16: Statute of Limitations (60 Days)
-        if not self._check_statute_of_limitations(case_data):
-            reasons.append({
-                "code": "ARTICLE_16_TIMEOUT",
-                "message": "عدم قبول الدعوى لرفعها بعد الميعاد المقرر نظاماً (60 يوماً - المادة 16).",
-                "severity": "BLOCKER"
-            })
+        facts = CaseFacts.coerce(case_data)
+        reasons = [rule.reason(facts) for rule in self.rules if not rule.evaluate(facts)]
 
         return {
             "is_valid": len(reasons) == 0,
             "reasons": reasons
         }
 
-    def _check_article_8_grievance(self, case_data: Dict[str, Any]) -> bool:
+    def validate_many(self, cases: List[Union[CaseFacts, Dict[str, Any]]]) -> List[Dict[str, Any]]:
         """
-        Article 8: Certain cases (Civil Service, Military) require a grievance before suing.
+        Batch validation: each rule runs once over the whole batch (see CompiledRule.evaluate_many).
+        Returns one validate_case-shaped dict per input, in order.
         """
-        # Heuristic: If it's an administrative case involving government, assume it might need grievance.
-        # Strict check: If user said "No Grievance" (grievance_date is missing) but it is required.
-        
-        # In our form, we have 'grievance_date'. If it's valid, they did grievance.
-        has_grievance = bool(case_data.get('grievance_date'))
-        
-        # If user explicitly selected "No Grievance" in UI, we might flag it.
-        # But for simplification, if it's an Administrative case, we encourage grievance.
-        # Let's say if it's a "Compensation" or "Contract" case, maybe not needed? 
-        # For Safety/Demo: If Validation logic sees 'Civil Service' keywords, require it.
-        
-        description = case_data.get('description', '').lower()
-        requires_grievance = any(k in description for k in ['ترقية', 'تاديب', 'فصل', 'خدمة مدنية', 'عسكرية', 'راتب'])
-        
-        if requires_grievance and not has_grievance:
-            return False
-        
-        return True
+        facts_list = [CaseFacts.coerce(case_data) for case_data in cases]
+        reasons = [[] for _ in facts_list]
+        for rule in self.rules:
+            for i, passed in enumerate(rule.evaluate_many(facts_list)):
+                if not passed:
+                    reasons[i].append(rule.reason(facts_list[i]))
 
-    def _check_statute_of_limitations(self, case_data: Dict[str, Any]) -> bool:
-        """
-        Article 16: 60 days from Knowledge or Grievance Outcome.
-        """
-        submission_date = case_data.get('submission_date')
-        if not submission_date:
-            submission_date = date.today()
-        elif isinstance(submission_date, str):
-            from datetime import datetime
-            try:
-                submission_date = datetime.strptime(submission_date, "%Y-%m-%d").date()
-            except ValueError:
-                 submission_date = date.today() # Fallback
-        
-        # The start date for calculation:
-        # If there was a grievance, use the grievance outcome date (or date of grievance + 60 days if silent).
-        # If no grievance, use incident/knowledge date.
-        
-        grievance_date = case_data.get('grievance_date')
-        incident_date = case_data.get('incident_date')
-        
-        start_date = None
-        
-        if grievance_date:
-            # If they grieved, valid period starts after grievance response or 60 days silence
-            # For simplicity, if grievance_date is provided, we calculate from it (assuming immediate response or silence start)
-            # A better field would be 'grievance_outcome_date' if we had it mapped in logic.
-            # Let's assume grievance_date represents the END of the grievance process for now or use incident_date as fallback.
-             if isinstance(grievance_date, str):
-                from datetime import datetime
-                grievance_date = datetime.strptime(grievance_date, "%Y-%m-%d").date()
-             start_date = grievance_date # Simplifying: 60 days from grievance date
-        elif incident_date:
-            if isinstance(incident_date, str):
-                from datetime import datetime
-                incident_date = datetime.strptime(incident_date, "%Y-%m-%d").date()
-            start_date = incident_date
-        else:
-            return True # Can't validate without dates
-            
-        limit_days = 60
-        delta = (submission_date - start_date).days
-        
-        return delta <= limit_days
+        return [
+            {"is_valid": len(case_reasons) == 0, "reasons": case_reasons}
+            for case_reasons in reasons
+        ]
@@ -0,0 +1,264 @@
+import contextvars
+import hmac
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# When set, every metrics endpoint (the web app's /metrics, the worker's --metrics-port)
+# requires "Authorization: Bearer <token>". Unset, they are open to anyone who can
+# reach them: keep them off public interfaces.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets (seconds): sub-millisecond rule checks up to minute-long LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# (stage, seconds) of every span finished in the current request, for the slow-request log
+_breakdown: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    'metrics_breakdown', default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Read when scraped: `collect` returns {label values tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), collect: Callable[[], Dict[tuple, float]] = None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Registry:
+    """
+    Per-process metrics; each web or worker process exposes its own (Prometheus
+    sums them across scrape targets).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets=buckets))
+
+    def gauge(self, name, help_text, labels=(), collect=None) -> Gauge:
+        return self.register(Gauge(name, help_text, labels, collect=collect))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def authorized(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header value may read the metrics."""
+    if not METRICS_TOKEN:
+        return True
+    return hmac.compare_digest((authorization or '').encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+        elif not authorized(self.headers.get('Authorization')):
+            self.send_error(401)
+        else:
+            try:
+                body = registry.render().encode()
+            except Exception:
+                logger.exception("Rendering the metrics failed")
+                self.send_error(500)
+                return
+            finally:
+                # Gauges may query the database; this request's thread ends here.
+                connections.close_all()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape would drown the worker's own output
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serves this process's registry at http://host:port/metrics from a daemon thread,
+    for processes without a web server (the analysis worker). Port 0 picks a free one
+    (see server.server_address); server.shutdown() stops it.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+REQUEST_SECONDS = registry.histogram(
+    'modaqiq_request_seconds', 'Time to produce a response, by view', ('view', 'method'),
+)
+REQUESTS = registry.counter(
+    'modaqiq_requests_total', 'Responses by view and status code', ('view', 'method', 'status'),
+)
+STAGE_SECONDS = registry.histogram(
+    'modaqiq_stage_seconds', 'Duration of pipeline stages (submission, analysis, Gemini calls)', ('stage',),
+)
+LLM_CALLS = registry.counter(
+    'modaqiq_llm_calls_total', 'Upstream LLM call attempts by prompt template and outcome', ('prompt', 'outcome'),
+)
+AI_RESULTS = registry.counter(
+    'modaqiq_ai_results_total', 'Stored analyses, by whether the fallback was used', ('status',),
+)
+
+
+@contextmanager
+def span(stage: str):
+    """Times a block into modaqiq_stage_seconds{stage} and the current request's breakdown."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown.append((stage, elapsed))
+
+
+def start_breakdown() -> Tuple[List[Tuple[str, float]], contextvars.Token]:
+    breakdown = []
+    return breakdown, _breakdown.set(breakdown)
+
+
+def end_breakdown(token: contextvars.Token):
+    _breakdown.reset(token)
+
+
+def format_breakdown(breakdown: List[Tuple[str, float]]) -> str:
+    return ' '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in breakdown) or '-'
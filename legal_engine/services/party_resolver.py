@@ -0,0 +1,44 @@
+from typing import Any, Dict, List
+
+from legal_engine.models import Party
+
+PARTY_FIELDS = ('name', 'party_type', 'role', 'national_id', 'license_number')
+
+
+class PartyResolver:
+    """
+    Resolves party payloads to Party rows by their indexed natural key.
+
+    resolve_many() loads every known key of a batch with one SELECT and creates
+    the rest with one bulk INSERT. Resolved rows are kept in memory, so reusing
+    one resolver across a bulk import never asks the DB twice for the same party.
+    """
+
+    def __init__(self):
+        self._by_key: Dict[str, Party] = {}
+
+    def resolve(self, data: Dict[str, Any]) -> Party:
+        return self.resolve_many([data])[0]
+
+    def resolve_many(self, party_dicts: List[Dict[str, Any]]) -> List[Party]:
+        keys = [Party.build_natural_key(data) for data in party_dicts]
+
+        missing = {key for key in keys if key not in self._by_key}
+        if missing:
+            self._load(missing)
+
+        new = {}
+        for key, data in zip(keys, party_dicts):
+            if key not in self._by_key and key not in new:
+                new[key] = Party(natural_key=key, **{field: data.get(field) for field in PARTY_FIELDS})
+        if new:
+            # A concurrent request may insert the same key first; ignore the
+            # conflict and read back whatever row won.
+            Party.objects.bulk_create(new.values(), ignore_conflicts=True)
+            self._load(set(new))
+
+        return [self._by_key[key] for key in keys]
+
+    def _load(self, keys):
+        for party in Party.objects.filter(natural_key__in=keys):
+            self._by_key[party.natural_key] = party
@@ -0,0 +1,26 @@
+from typing import Any, Dict, List, Sequence
+
+from .logic_engine import RuleValidator
+
+CASE_FIELDS = ('id', 'description', 'incident_date', 'grievance_date', 'submission_date')
+
+# Set in each pool process by init_worker()
+_validator = None
+
+
+def init_worker(rules: Sequence) -> None:
+    """
+    Process-pool initializer: the compiled rules are shipped once per worker,
+    so the children never need a DB connection or the rule registry.
+    """
+    global _validator
+    _validator = RuleValidator(rules)
+
+
+def validate_chunk(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    validator = _validator or RuleValidator()
+    return validator.validate_many(cases)
+
+
+def reason_codes(reasons: List[Dict[str, Any]]) -> List[str]:
+    return [reason.get('code') for reason in reasons]
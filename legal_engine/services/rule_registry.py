@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+from time import monotonic
+from typing import Any, Dict, List, Tuple
+
+from django.db import DatabaseError, IntegrityError
+from django.db.models import F
+
+from .arabic_text import KeywordAutomaton
+from .case_facts import CaseFacts
+
+logger = logging.getLogger(__name__)
+
+# How often a process re-reads the shared rule-set version (RuleSetVersion row).
+# A rule edited in another process is picked up within this many seconds;
+# the editing process itself sees it at once.
+RULES_CHECK_SECONDS = float(os.getenv("RULES_CHECK_SECONDS", "2"))
+
+
+class _KeepUnknown(dict):
+    """format_map() mapping that leaves unknown {placeholders} as written."""
+
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def format_message(message, params: Dict[str, Any]) -> str:
+    """
+    Fills {param} placeholders of an admin-entered message. Unknown placeholders,
+    stray braces or bad format specs leave the text as entered instead of failing validation.
+    """
+    message = str(message)
+    try:
+        return message.format_map(_KeepUnknown(params))
+    except (ValueError, IndexError, KeyError, AttributeError, TypeError):
+        return message
+
+
+class CompiledRule:
+    """
+    In-memory predicate built once from a ProceduralRule row.
+    evaluate() returns True when the case satisfies the rule.
+    """
+    type_name = ''
+
+    def __init__(self, code: str, params: Dict[str, Any]):
+        self.code = code
+        self.params = params
+        self.severity = params.get('severity', 'BLOCKER')
+        self.message = format_message(params.get('message', code), params)
+
+    def evaluate(self, facts: CaseFacts) -> bool:
+        raise NotImplementedError
+
+    def evaluate_many(self, facts_list: List[CaseFacts]) -> List[bool]:
+        """
+        Batch form of evaluate(); rule types override it when a batch can be done cheaper.
+        """
+        return [self.evaluate(facts) for facts in facts_list]
+
+    def reason(self, facts: CaseFacts = None) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "severity": self.severity}
+
+
+class MandatoryGrievanceRule(CompiledRule):
+    """
+    Article 8: Certain cases (Civil Service, Military) require a grievance before suing.
+    params: {"keywords": [...]} - description keywords that make a grievance mandatory.
+    Keywords are matched after Arabic normalization (hamza/alef/ta-marbuta/tashkeel).
+    """
+    type_name = 'mandatory_grievance'
+
+    def __init__(self, code, params):
+        super().__init__(code, params)
+        self.automaton = KeywordAutomaton(params.get('keywords', []))
+
+    def evaluate(self, facts):
+        # In our form, we have 'grievance_date'. If it's valid, they did grievance.
+        if facts.grievance_date:
+            return True
+        return not self.automaton.contains_any(facts.description)
+
+    def reason(self, facts=None):
+        reason = super().reason()
+        if facts is not None:
+            # Where in the description the grievance keywords were found (for the dashboard)
+            description = facts.description
+            reason["matches"] = [
+                dict(match._asdict(), text=description[match.start:match.end])
+                for match in self.automaton.find_all(description)
+            ]
+        return reason
+
+
+class StatuteOfLimitationsRule(CompiledRule):
+    """
+    Article 16: N days from Knowledge or Grievance Outcome.
+    params: {"days": 60}
+    """
+    type_name = 'statute_of_limitations'
+
+    def __init__(self, code, params):
+        super().__init__(code, params)
+        self.days = int(params['days'])
+
+    def evaluate(self, facts):
+        # If there was a grievance, the period runs from the grievance date
+        # (assuming immediate response or silence start), otherwise from the incident/knowledge date.
+        start_date = facts.grievance_date or facts.incident_date
+        if not start_date:
+            return True # Can't validate without dates
+
+        return (facts.submission_date - start_date).days <= self.days
+
+    def evaluate_many(self, facts_list):
+        # Columnar pass: dates become day ordinals once, then one subtraction per case.
+        limit = self.days
+        return [
+            start is None or end.toordinal() - start.toordinal() <= limit
+            for end, start in (
+                (facts.submission_date, facts.grievance_date or facts.incident_date)
+                for facts in facts_list
+            )
+        ]
+
+
+RULE_TYPES = {
+    cls.type_name: cls for cls in (MandatoryGrievanceRule, StatuteOfLimitationsRule)
+}
+
+
+def compile_rule(code: str, params: Dict[str, Any]) -> CompiledRule:
+    try:
+        rule_class = RULE_TYPES[params['type']]
+    except KeyError:
+        raise ValueError(f"Procedural rule {code!r} has unknown or missing type: {params.get('type')!r}")
+    return rule_class(code, params)
+
+
+class RuleRegistry:
+    """
+    Process-wide cache of the compiled active ProceduralRule set.
+    Rules are re-read from the DB only when the shared RuleSetVersion counter moves
+    (bumped by the post_save/post_delete handlers in legal_engine.signals); the
+    counter itself is read at most every `check_seconds`.
+    """
+
+    def __init__(self, check_seconds: float = None):
+        self.check_seconds = RULES_CHECK_SECONDS if check_seconds is None else check_seconds
+        self._lock = threading.Lock()
+        self._rules: Tuple[CompiledRule, ...] = ()
+        self._version = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def current_version() -> int:
+        from legal_engine.models import RuleSetVersion
+
+        return RuleSetVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    def get_rules(self) -> Tuple[CompiledRule, ...]:
+        if self._version is not None and monotonic() - self._checked_at < self.check_seconds:
+            return self._rules
+        with self._lock:
+            if self._version is None or monotonic() - self._checked_at >= self.check_seconds:
+                # Version first: an edit made while loading only causes one more reload
+                version = self.current_version()
+                if version != self._version:
+                    self._rules = self._load()
+                    self._version = version
+                self._checked_at = monotonic()
+        return self._rules
+
+    def invalidate(self):
+        from legal_engine.models import RuleSetVersion
+
+        try:
+            if not RuleSetVersion.objects.filter(pk=1).update(version=F('version') + 1):
+                try:
+                    RuleSetVersion.objects.create(pk=1, version=1)
+                except IntegrityError:
+                    RuleSetVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        except DatabaseError:
+            # Other processes keep their rules until the next successful bump
+            logger.exception("Could not bump the procedural rule-set version")
+        with self._lock:
+            self._version = None
+
+    @staticmethod
+    def _load() -> Tuple[CompiledRule, ...]:
+        from legal_engine.models import ProceduralRule
+
+        rows = ProceduralRule.objects.filter(is_active=True).order_by('id').values_list('code', 'parameter_value')
+        return tuple(compile_rule(code, params) for code, params in rows)
+
+
+rule_registry = RuleRegistry()
@@ -0,0 +1,288 @@
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+
+from legal_engine.models import Case, Document, ExtractedText, SearchDocument
+from .arabic_text import analyze_for_search, search_tokens
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'legal_engine_searchdocument_fts'
+# Column order of the FTS table, with bm25 weights: a hit in the title counts most
+SEARCH_COLUMNS = ('title', 'description', 'analysis', 'documents')
+COLUMN_WEIGHTS = (4.0, 1.0, 0.5, 0.5)
+MAX_QUERY_TERMS = 10
+# bm25 has to score every match; past this many, return the newest matches instead
+RANK_MAX_CANDIDATES = int(os.getenv('SEARCH_RANK_MAX_CANDIDATES', '5000'))
+SNIPPET_TOKENS = 24
+INDEX_BATCH_SIZE = 500
+
+
+class SearchQuery(NamedTuple):
+    terms: Tuple[str, ...]  # stems; every one must match
+    prefix: bool  # the last term also matches as a prefix (search-as-you-type)
+
+    def matches(self, stem: str) -> bool:
+        if stem in self.terms:
+            return True
+        return self.prefix and stem.startswith(self.terms[-1])
+
+
+def parse_query(text: str) -> SearchQuery:
+    terms = tuple(dict.fromkeys(token.stem for token in search_tokens(text or '')))[:MAX_QUERY_TERMS]
+    # A query ending mid-word ("قرار ادا") should still find "اداري".
+    prefix = bool(terms) and not (text or '').endswith(' ')
+    return SearchQuery(terms, prefix)
+
+
+# --- Index maintenance -------------------------------------------------------
+
+def _documents_text(case_ids: Iterable[int]) -> Dict[int, List[str]]:
+    by_sha = defaultdict(list)
+    for case_id, sha256 in Document.objects.filter(case_id__in=case_ids).values_list('case_id', 'blob__sha256'):
+        by_sha[sha256].append(case_id)
+    texts = defaultdict(list)
+    for sha256, text in ExtractedText.objects.filter(sha256__in=by_sha, text__gt='').values_list('sha256', 'text'):
+        for case_id in by_sha[sha256]:
+            texts[case_id].append(text)
+    return texts
+
+
+def index_cases(case_ids: Iterable[int]) -> int:
+    """
+    (Re)builds the search documents of the given cases, INDEX_BATCH_SIZE at a time.
+    Returns the number of cases indexed.
+    """
+    case_ids = list(case_ids)
+    indexed = 0
+    for start in range(0, len(case_ids), INDEX_BATCH_SIZE):
+        batch = case_ids[start:start + INDEX_BATCH_SIZE]
+        rows = Case.objects.filter(pk__in=batch).values_list(
+            'id', 'title', 'description', 'validation_result__ai_analysis'
+        )
+        documents = _documents_text(batch)
+        search_documents = [
+            SearchDocument(
+                case_id=case_id,
+                title=analyze_for_search(title),
+                description=analyze_for_search(description),
+                analysis=analyze_for_search(analysis),
+                documents=analyze_for_search('\n'.join(documents.get(case_id, ()))),
+            )
+            for case_id, title, description, analysis in rows
+        ]
+        with transaction.atomic():
+            # Delete + insert rather than upsert: the FTS triggers see each as one change.
+            SearchDocument.objects.filter(case_id__in=batch).delete()
+            SearchDocument.objects.bulk_create(search_documents)
+        indexed += len(search_documents)
+    return indexed
+
+
+def index_case(case_id: int) -> None:
+    index_cases([case_id])
+
+
+def _index_safely(case_ids):
+    try:
+        index_cases(case_ids)
+    except Exception:
+        # A stale search entry must never fail the write that triggered it;
+        # `manage.py rebuild_search_index` repairs the index.
+        logger.exception("Search indexing failed for case(s) %s", case_ids)
+
+
+class _PendingIndex:
+    """On-commit callback re-indexing every case scheduled in its transaction, once."""
+
+    def __init__(self):
+        self.case_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        _index_safely(sorted(self.case_ids))
+
+
+def schedule_index(*case_ids: int) -> None:
+    """
+    Re-indexes the cases once the current transaction commits (immediately outside one).
+    A submission saves its case several times; the saves share one callback, so
+    each case is indexed once per transaction.
+    """
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        _index_safely(list(case_ids))
+        return
+    # Join the callback registered under the same savepoints: if one of them is
+    # rolled back, Django discards the callback along with the ids it collected.
+    savepoint_ids = set(conn.savepoint_ids)
+    pending = next((
+        func for sids, func, *_ in conn.run_on_commit
+        if isinstance(func, _PendingIndex) and not func.done and sids == savepoint_ids
+    ), None)
+    if pending is None:
+        pending = _PendingIndex()
+        transaction.on_commit(pending)
+    pending.case_ids.update(case_ids)
+
+
+# --- Backends ----------------------------------------------------------------
+
+class SearchBackend:
+    """
+    Finds the ids of cases matching a parsed query, best first.
+    """
+    name = ''
+
+    def search(self, query: SearchQuery, limit: int) -> List[Tuple[int, float]]:
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    SQLite FTS5 over SearchDocument, ranked by column-weighted bm25.
+    Queries matching more than RANK_MAX_CANDIDATES cases ("تظلم" on a big corpus)
+    skip ranking and walk the doclist newest-first, which stops after `limit` rows.
+    """
+    name = 'fts5'
+
+    @staticmethod
+    def available() -> bool:
+        if connection.vendor != 'sqlite':
+            return False
+        return FTS_TABLE in connection.introspection.table_names()
+
+    def search(self, query, limit):
+        # Terms are already normalized word characters; quoting keeps FTS5 syntax out of them.
+        phrases = [f'"{term}"' for term in query.terms]
+        if query.prefix:
+            phrases[-1] += '*'
+        match = ' '.join(phrases)
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)",
+                [match, RANK_MAX_CANDIDATES + 1],
+            )
+            if cursor.fetchone()[0] > RANK_MAX_CANDIDATES:
+                cursor.execute(
+                    f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s",
+                    [match, limit],
+                )
+                return [(case_id, 0.0) for case_id, in cursor.fetchall()]
+
+            cursor.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY score LIMIT %s",
+                [match, limit],
+            )
+            # bm25() is negative, lower is better; flip it so higher means more relevant.
+            return [(case_id, -score) for case_id, score in cursor.fetchall()]
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Portable fallback for databases without FTS5: whole-token containment over
+    the analyzed columns, newest cases first. Correct but unranked and unindexed.
+    """
+    name = 'db'
+
+    def search(self, query, limit):
+        documents = SearchDocument.objects.all()
+        for i, term in enumerate(query.terms):
+            is_prefix = query.prefix and i == len(query.terms) - 1
+            term_filter = Q()
+            for column in SEARCH_COLUMNS:
+                # Columns are space-separated stems: match whole tokens (or token prefixes)
+                if is_prefix:
+                    term_filter |= Q(**{f'{column}__startswith': term}) | Q(**{f'{column}__contains': f' {term}'})
+                else:
+                    term_filter |= (
+                        Q(**{column: term}) | Q(**{f'{column}__startswith': f'{term} '})
+                        | Q(**{f'{column}__contains': f' {term} '}) | Q(**{f'{column}__endswith': f' {term}'})
+                    )
+            documents = documents.filter(term_filter)
+        return [(case_id, 0.0) for case_id in documents.order_by('-case_id').values_list('case_id', flat=True)[:limit]]
+
+
+def get_search_backend() -> SearchBackend:
+    choice = os.getenv('SEARCH_BACKEND', 'auto').lower()
+    if choice == 'fts5' or (choice == 'auto' and SQLiteFTSBackend.available()):
+        return SQLiteFTSBackend()
+    return DatabaseSearchBackend()
+
+
+# --- Querying ----------------------------------------------------------------
+
+def highlight(text: str, query: SearchQuery, window: int = SNIPPET_TOKENS) -> str:
+    """
+    HTML-escaped excerpt of `text` around its first matching token, matches wrapped in <mark>.
+    Empty when nothing in the text matches.
+    """
+    tokens = list(search_tokens(text or ''))
+    hits = [i for i, token in enumerate(tokens) if query.matches(token.stem)]
+    if not hits:
+        return ''
+    first = max(0, hits[0] - window // 3)
+    last = min(len(tokens), first + window)
+
+    parts = ['…' if first else '']
+    position = tokens[first].start
+    for token in tokens[first:last]:
+        if query.matches(token.stem):
+            parts.append(escape(text[position:token.start]))
+            parts.append(f'<mark>{escape(text[token.start:token.end])}</mark>')
+            position = token.end
+    parts.append(escape(text[position:tokens[last - 1].end]))
+    parts.append('…' if last < len(tokens) else '')
+    return ''.join(parts)
+
+
+def search_cases(text: str, limit: int = 20) -> List[dict]:
+    """
+    Ranked matches for a free-text query with highlighted snippets per field.
+    The index lookup is one query; snippets are built for the returned page only.
+    """
+    query = parse_query(text)
+    if not query.terms:
+        return []
+    hits = get_search_backend().search(query, limit)
+    if not hits:
+        return []
+
+    case_ids = [case_id for case_id, _ in hits]
+    cases = Case.objects.select_related('validation_result').only(
+        'id', 'title', 'description', 'status', 'submission_date', 'validation_result__ai_analysis',
+    ).in_bulk(case_ids)
+    documents = _documents_text(case_ids)
+
+    results = []
+    for case_id, score in hits:
+        case = cases.get(case_id)
+        if case is None:
+            continue
+        result = getattr(case, 'validation_result', None)
+        fields = {
+            'title': case.title,
+            'description': case.description,
+            'analysis': result.ai_analysis if result else '',
+            'documents': '\n'.join(documents.get(case_id, ())),
+        }
+        results.append({
+            'id': case.id,
+            'title': case.title,
+            'status': case.status,
+            'submission_date': case.submission_date,
+            'score': round(score, 4),
+            'highlights': {
+                name: snippet for name, snippet in ((name, highlight(value, query)) for name, value in fields.items())
+                if snippet
+            },
+        })
+    return results
@@ -0,0 +1,233 @@
+import json
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .arabic_text import normalize_arabic
+
+SIMILARITY_INDEX_DIR = Path(os.getenv("SIMILARITY_INDEX_DIR", settings.BASE_DIR / 'similarity_index'))
+# Hashed feature space; rows are stored as float32 (4 * DIMENSIONS bytes per case on disk).
+# float16 would halve that, but converting it back costs ~10x the matrix product itself.
+DIMENSIONS = int(os.getenv("SIMILARITY_DIMENSIONS", "2048"))
+NGRAM_RANGE = (2, 4)
+# Rows scored per matrix multiplication; bounds the float32 working set while scanning
+SCAN_BLOCK_ROWS = int(os.getenv("SIMILARITY_SCAN_BLOCK_ROWS", "8192"))
+INDEX_VERSION = 1
+
+
+def char_ngrams(text: str) -> Counter:
+    """
+    Character n-grams of the normalized text, per word with boundary spaces,
+    so " قرار " yields " ق", "قر", ..., " قرا", ...
+    """
+    grams = Counter()
+    for word in normalize_arabic(text or '').split():
+        padded = f" {word} "
+        for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+            for i in range(len(padded) - n + 1):
+                grams[padded[i:i + n]] += 1
+    return grams
+
+
+def hashed_counts(text: str, dimensions: int = DIMENSIONS) -> Counter:
+    counts = Counter()
+    for gram, count in char_ngrams(text).items():
+        counts[zlib.crc32(gram.encode('utf-8')) % dimensions] += count
+    return counts
+
+
+class SimilarityIndex:
+    """
+    Character n-gram TF-IDF vectors of Case.description, one L2-normalized float32
+    row per case in case-id order, memory-mapped from SIMILARITY_INDEX_DIR:
+
+        meta.json     dimensions, row count, document frequencies
+        vectors.f32   (rows, dimensions) matrix
+        case_ids.i64  case id of each row
+
+    Built and extended only by `manage.py build_similarity_index` (one writer at a
+    time); readers pick up new rows when meta.json changes. Rows keep the IDF of
+    the build that wrote them until the next --rebuild.
+    """
+
+    def __init__(self, path: Path = SIMILARITY_INDEX_DIR):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self.dimensions = DIMENSIONS
+        self.document_count = 0
+        self.document_frequency = np.zeros(DIMENSIONS, dtype=np.float64)
+        self.published_rows = 0
+        self.vectors = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.case_ids = np.zeros(0, dtype=np.int64)
+
+    # --- Loading -------------------------------------------------------------
+
+    @property
+    def meta_path(self) -> Path:
+        return self.path / 'meta.json'
+
+    def refresh(self) -> 'SimilarityIndex':
+        """Re-maps the files if the writer has published a new version since the last call."""
+        try:
+            mtime = self.meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self
+        if mtime == self._meta_mtime:
+            return self
+        with self._lock:
+            if mtime != self._meta_mtime:
+                self._load()
+                self._meta_mtime = mtime
+        return self
+
+    def _load(self):
+        meta = json.loads(self.meta_path.read_text(encoding='utf-8'))
+        self.dimensions = meta['dimensions']
+        self.document_count = meta['document_count']
+        self.document_frequency = np.asarray(meta['document_frequency'], dtype=np.float64)
+        self.published_rows = meta['rows']
+        self._map(self.published_rows)
+
+    def _map(self, rows: int):
+        if rows:
+            # Only `rows` rows are mapped; a writer may be appending past them.
+            self.vectors = np.memmap(self.path / 'vectors.f32', dtype=np.float32, mode='r',
+                                     shape=(rows, self.dimensions))
+            self.case_ids = np.memmap(self.path / 'case_ids.i64', dtype=np.int64, mode='r', shape=(rows,))
+        else:
+            self.vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+            self.case_ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.case_ids)
+
+    # --- Vectors -------------------------------------------------------------
+
+    def idf(self) -> np.ndarray:
+        # Smoothed IDF, as in scikit-learn's TfidfTransformer
+        return np.log((1 + self.document_count) / (1 + self.document_frequency)) + 1
+
+    def vectorize(self, texts: Sequence[str], idf: np.ndarray = None) -> np.ndarray:
+        """(len(texts), dimensions) float32 matrix of L2-normalized sublinear TF-IDF rows."""
+        idf = self.idf() if idf is None else idf
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = hashed_counts(text, self.dimensions)
+            if counts:
+                columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                values = np.fromiter((1 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+                matrix[row, columns] = values * idf[columns]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    # --- Querying ------------------------------------------------------------
+
+    def top_k(self, queries: np.ndarray, k: int, row_limits: Sequence[int] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k cosine neighbours of each query row as [(case_id, similarity), ...].
+        row_limits[i] restricts query i to rows [0, row_limits[i]), i.e. to cases
+        indexed before it. The matrix is scanned once for the whole batch, in blocks.
+        """
+        n_queries = len(queries)
+        rows = len(self)
+        limits = np.full(n_queries, rows, dtype=np.int64) if row_limits is None else np.asarray(row_limits)
+        best_scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        best_rows = np.full((n_queries, k), -1, dtype=np.int64)
+        queries_t = np.ascontiguousarray(queries, dtype=np.float32).T
+
+        scan_end = int(limits.max(initial=0))
+        for start in range(0, scan_end, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, scan_end)
+            scores = (self.vectors[start:stop] @ queries_t).T  # (queries, block)
+            block_rows = np.arange(start, stop)
+            scores[block_rows[None, :] >= limits[:, None]] = -np.inf
+
+            # Merge this block's candidates with the running best k
+            candidates = np.concatenate([best_scores, scores], axis=1)
+            candidate_rows = np.concatenate([best_rows, np.broadcast_to(block_rows, scores.shape)], axis=1)
+            keep = min(k, candidates.shape[1])
+            top = np.argpartition(-candidates, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(candidates, top, axis=1)
+            best_rows = np.take_along_axis(candidate_rows, top, axis=1)
+
+        results = []
+        for scores, rows_ in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([
+                (int(self.case_ids[row]), float(score))
+                for score, row in zip(scores[order], rows_[order])
+                if row >= 0 and np.isfinite(score) and score > 0
+            ])
+        return results
+
+    def precedents(self, case_id: int, description: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Most similar cases indexed before `case_id` (the case itself need not be indexed)."""
+        self.refresh()
+        if not len(self):
+            return []
+        limit = int(np.searchsorted(self.case_ids, case_id))
+        return self.top_k(self.vectorize([description]), k, [limit])[0]
+
+    # --- Writing (build_similarity_index only) -------------------------------
+
+    def count_documents(self, texts: Iterable[str]):
+        for text in texts:
+            self.document_count += 1
+            for column in hashed_counts(text, self.dimensions):
+                self.document_frequency[column] += 1
+
+    def open_for_writing(self, rebuild: bool = False, dimensions: int = DIMENSIONS):
+        """
+        Loads the published index (or starts an empty one) and drops any rows an
+        interrupted build appended but never published.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        if rebuild or not self.meta_path.exists():
+            for name in ('vectors.f32', 'case_ids.i64', 'meta.json'):
+                (self.path / name).unlink(missing_ok=True)
+            self.dimensions = dimensions
+            self.document_count = 0
+            self.document_frequency = np.zeros(dimensions, dtype=np.float64)
+            self.published_rows = 0
+            self._map(0)
+        else:
+            self._load()
+        for name, row_bytes in (('vectors.f32', 4 * self.dimensions), ('case_ids.i64', 8)):
+            with open(self.path / name, 'ab') as f:
+                f.truncate(self.published_rows * row_bytes)
+
+    def append(self, case_ids: Sequence[int], vectors: np.ndarray):
+        """Appends rows and maps them for this process only; publish() makes them visible."""
+        with open(self.path / 'vectors.f32', 'ab') as f:
+            f.write(np.asarray(vectors, dtype=np.float32).tobytes())
+        with open(self.path / 'case_ids.i64', 'ab') as f:
+            f.write(np.asarray(case_ids, dtype=np.int64).tobytes())
+        self._map(len(self) + len(case_ids))
+
+    def publish(self):
+        """Atomically makes every appended row (and the updated IDF) visible to readers."""
+        meta = {
+            'version': INDEX_VERSION,
+            'dimensions': self.dimensions,
+            'ngram_range': list(NGRAM_RANGE),
+            'rows': len(self),
+            'document_count': self.document_count,
+            'document_frequency': self.document_frequency.tolist(),
+        }
+        tmp_path = self.meta_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(tmp_path, self.meta_path)
+        self.published_rows = len(self)
+        self._meta_mtime = self.meta_path.stat().st_mtime_ns
+
+
+similarity_index = SimilarityIndex()
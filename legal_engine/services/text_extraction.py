@@ -0,0 +1,155 @@
+import logging
+import mmap
+import os
+import unicodedata
+from typing import List, Tuple
+
+from django.db import IntegrityError, transaction
+
+from legal_engine.models import ExtractedText, StoredBlob
+
+logger = logging.getLogger(__name__)
+
+# Hard limits per file, so one huge scan cannot blow the worker's memory.
+EXTRACTION_MAX_PAGES = int(os.getenv("EXTRACTION_MAX_PAGES", "200"))
+EXTRACTION_MAX_CHARS = int(os.getenv("EXTRACTION_MAX_CHARS", "200000"))
+# Share of the analysis prompt given to attached documents.
+DOCUMENT_PROMPT_CHARS = int(os.getenv("DOCUMENT_PROMPT_CHARS", "20000"))
+
+TEXT_EXTENSIONS = ('.txt', '.md', '.csv')
+
+
+class ExtractorUnavailable(Exception):
+    """
+    No extractor is installed for this file type (e.g. pypdf is missing).
+    Cached as UNSUPPORTED; delete those rows to retry once the dependency is there.
+    """
+
+
+class ExtractionError(Exception):
+    """
+    The extractor cannot read the file's content (corrupt or encrypted PDF).
+    Cached as FAILED, since retrying the same bytes fails the same way.
+    """
+
+
+def _clean(text: str) -> str:
+    # NFKC folds the Arabic presentation forms many PDF generators emit back to plain letters.
+    text = unicodedata.normalize('NFKC', text)
+    lines = (" ".join(line.split()) for line in text.replace('\x00', '').splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _pdf_pages(path: str):
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import DependencyError, PyPdfError
+    except ImportError as e:
+        raise ExtractorUnavailable("PDF extraction needs the 'pypdf' package") from e
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ExtractionError("The PDF file is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # pypdf seeks through the mapping and parses objects lazily: the OS pages
+            # the file in and out, the whole PDF is never copied into the heap.
+            try:
+                reader = PdfReader(mapped)
+                for page in reader.pages:
+                    yield page.extract_text() or ''
+            except DependencyError as e:
+                # e.g. an AES-encrypted PDF without the 'cryptography' package
+                raise ExtractorUnavailable(str(e)) from e
+            except PyPdfError as e:
+                raise ExtractionError(f"Unreadable PDF: {e}") from e
+
+
+def _text_pages(path: str):
+    with open(path, 'rb') as f:
+        yield f.read(EXTRACTION_MAX_CHARS * 4).decode('utf-8', errors='replace')
+
+
+def extract_file(path: str) -> Tuple[str, int, bool]:
+    """
+    Extracts text page by page within EXTRACTION_MAX_PAGES / EXTRACTION_MAX_CHARS.
+    Returns (text, pages read, truncated).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        pages = _pdf_pages(path)
+    elif extension in TEXT_EXTENSIONS:
+        pages = _text_pages(path)
+    else:
+        raise ExtractorUnavailable(f"No text extractor for '{extension}' files")
+
+    parts: List[str] = []
+    size = page_count = 0
+    truncated = False
+    try:
+        for page_count, page_text in enumerate(pages, start=1):
+            page_text = _clean(page_text)
+            if size + len(page_text) > EXTRACTION_MAX_CHARS:
+                parts.append(page_text[:EXTRACTION_MAX_CHARS - size])
+                truncated = True
+                break
+            parts.append(page_text)
+            size += len(page_text) + 2
+            if page_count >= EXTRACTION_MAX_PAGES:
+                truncated = True
+                break
+    finally:
+        pages.close()
+    return "\n\n".join(part for part in parts if part), page_count, truncated
+
+
+def extract_blob(blob: StoredBlob):
+    """
+    Returns the cached ExtractedText for the blob's content, extracting it on a miss.
+    Unsupported and unreadable files are cached too (UNSUPPORTED / FAILED); I/O
+    errors propagate, so the analysis job is retried.
+    """
+    cached = ExtractedText.objects.filter(sha256=blob.sha256).first()
+    if cached is not None:
+        return cached
+
+    try:
+        text, page_count, truncated = extract_file(blob.file.path)
+        fields = {
+            'status': ExtractedText.ExtractionStatus.DONE if text else ExtractedText.ExtractionStatus.EMPTY,
+            'text': text,
+            'page_count': page_count,
+            'truncated': truncated,
+        }
+    except ExtractorUnavailable as e:
+        logger.warning("Skipping text extraction of blob %s: %s", blob.sha256[:12], e)
+        fields = {'status': ExtractedText.ExtractionStatus.UNSUPPORTED, 'error': str(e)}
+    except ExtractionError as e:
+        # Corrupt or encrypted files: remember the failure instead of retrying every job.
+        logger.warning("Text extraction failed for blob %s: %s", blob.sha256[:12], e)
+        fields = {'status': ExtractedText.ExtractionStatus.FAILED, 'error': str(e)}
+
+    try:
+        with transaction.atomic():
+            return ExtractedText.objects.create(sha256=blob.sha256, **fields)
+    except IntegrityError:
+        # Another worker extracted the same content meanwhile.
+        return ExtractedText.objects.get(sha256=blob.sha256)
+
+
+def case_document_text(case, max_chars: int = DOCUMENT_PROMPT_CHARS) -> str:
+    """
+    Extracted text of the case's attachments (extracting any not cached yet),
+    headed by the original file names and cut to max_chars overall.
+    """
+    sections = []
+    size = 0
+    for document in case.case_documents.select_related('blob').order_by('id'):
+        extracted = extract_blob(document.blob)
+        if not extracted.text:
+            continue
+        section = f"[{document.original_name or document.blob.sha256[:12]}]\n{extracted.text}"
+        sections.append(section[:max_chars - size])
+        size += len(sections[-1])
+        if size >= max_chars:
+            break
+    return "\n\n".join(sections)
@@ -0,0 +1,82 @@
+import math
+import os
+import re
+import zlib
+from typing import List
+
+# Gemini tokenizes Arabic at roughly 2.5-3.5 characters per token; estimate on the safe side.
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "3.0"))
+# Largest input interpolated into one prompt; longer texts go through map-reduce.
+MAX_INPUT_TOKENS = int(os.getenv("LLM_MAX_INPUT_TOKENS", "6000"))
+# Target size of one map chunk
+CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "1500"))
+
+_PARAGRAPH_RE = re.compile(r'\n\s*\n+')
+_SENTENCE_RE = re.compile(r'(?<=[.!?؟۔])\s+|\n')
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts `text` to about max_tokens, at a whitespace boundary when there is one nearby."""
+    text = text or ''
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(' ', max_chars - 200, max_chars)
+    return text[:cut if cut > 0 else max_chars] + ' …'
+
+
+def _paragraphs(text: str, max_tokens: int) -> List[str]:
+    """Paragraphs, with any paragraph over max_tokens split on sentences (and hard-cut as a last resort)."""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    pieces = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        current = ''
+        for sentence in _SENTENCE_RE.split(paragraph):
+            while len(sentence) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ''
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                pieces.append(current)
+                current = ''
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """
+    Packs paragraphs into chunks of at most chunk_tokens.
+
+    Chunk boundaries are content-defined: a chunk also closes after any paragraph
+    whose hash hits 1-in-4, once the chunk is at least half full. Editing one
+    paragraph therefore only moves the boundaries next to it, and every other
+    chunk keeps its exact text (and its cached analysis).
+    """
+    max_chars = int(chunk_tokens * CHARS_PER_TOKEN)
+    chunks, current, size = [], [], 0
+    for paragraph in _paragraphs(text, chunk_tokens):
+        if current and size + len(paragraph) + 2 > max_chars:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+        if size >= max_chars // 2 and zlib.crc32(paragraph.encode('utf-8')) % 4 == 0:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
@@ -0,0 +1,39 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Case, Document, Party, ProceduralRule, ValidationResult
+from .services.blob_store import release_blob
+from .services.rule_registry import rule_registry
+from .services.search import schedule_index
+
+
+@receiver([post_save, post_delete], sender=ProceduralRule)
+def invalidate_compiled_rules(sender, **kwargs):
+    rule_registry.invalidate()
+
+
+@receiver(post_delete, sender=Document)
+def release_document_blob(sender, instance, **kwargs):
+    release_blob(instance.blob_id)
+
+
+@receiver(post_save, sender=Case)
+def index_saved_case(sender, instance, **kwargs):
+    schedule_index(instance.pk)
+
+
+@receiver(post_save, sender=ValidationResult)
+def index_saved_result(sender, instance, **kwargs):
+    schedule_index(instance.case_id)
+
+
+@receiver([post_save, post_delete], sender=ValidationResult)
+def bump_result_case_version(sender, instance, **kwargs):
+    Case.bump_version(pk=instance.case_id)
+
+
+@receiver(post_save, sender=Party)
+def bump_party_case_versions(sender, instance, created, **kwargs):
+    if not created:
+        Case.bump_version(Q(plaintiff=instance) | Q(defendant=instance))
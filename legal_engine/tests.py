@@ -1,3 +1,1057 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .management.commands.build_similarity_index import exclusive_lock
+from .models import (
+    AnalysisJob, Case, CasePrecedent, Document, ExtractedText, Party, ProceduralRule, StoredBlob, ValidationResult,
+)
+from .services.arabic_text import KeywordAutomaton, normalize_arabic
+from .services.analysis_jobs import (
+    _claim, claim_case_job, claim_next_job, complete_job, fail_job, requeue_fallbacks, run_job, stream_job,
+)
+from .services.db_threads import ConnectionClosingExecutor
+from .services.gemini_service import AIResult, GeminiService
+from .services.hijri import (
+    GREGORIAN_MAX, GREGORIAN_MIN, gregorian_to_hijri, hijri_to_gregorian, month_length, parse_hijri,
+)
+from .services.llm_cache import LLMCache, llm_cache
+from .services.llm_resilience import LLMUnavailable, TokenBucket
+from .services.logic_engine import RuleValidator
+from .services.metrics import LLM_CALLS, serve_metrics
+from .services.party_resolver import PartyResolver
+from .services.rule_registry import RuleRegistry, format_message, rule_registry
+from .services.search import DatabaseSearchBackend, SQLiteFTSBackend, parse_query, schedule_index
+from .services.similarity import SimilarityIndex
+from .services.blob_store import prune_unreferenced, store_upload
+from .services.text_extraction import extract_blob
+
+
+def make_cases(count, start=0):
+    plaintiff, defendant = PartyResolver().resolve_many([
+        {'name': "Ahmed", 'party_type': Party.PartyType.INDIVIDUAL, 'role': Party.Role.PLAINTIFF},
+        {'name': "Ministry", 'party_type': Party.PartyType.GOVERNMENT, 'role': Party.Role.DEFENDANT},
+    ])
+    cases = []
+    for i in range(start, start + count):
+        case = Case.objects.create(
+            title=f"Case {i}",
+            description="تظلم من قرار فصل",
+            incident_date=datetime.date.today(),
+            court_type="Administrative",
+            plaintiff=plaintiff,
+            defendant=defendant,
+        )
+        ValidationResult.objects.create(
+            case=case, is_accepted=True, ai_analysis="تحليل طويل", generated_reasoning="بناءً على ما تقدم",
+        )
+        cases.append(case)
+    return cases
+
+
+class AnalysisJobQueueTests(TestCase):
+    def test_claims_oldest_job_once(self):
+        first, second = [AnalysisJob.objects.create(case=case) for case in make_cases(2)]
+
+        job = claim_next_job()
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.JobStatus.RUNNING, 1))
+        # A worker that read the row before the claim loses the conditional UPDATE
+        self.assertFalse(_claim(first.pk, AnalysisJob.JobStatus.PENDING, None))
+
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_lease_is_reclaimed(self):
+        stale, fresh = [AnalysisJob.objects.create(case=case, status=AnalysisJob.JobStatus.RUNNING, attempts=1)
+                        for case in make_cases(2)]
+        AnalysisJob.objects.filter(pk=stale.pk).update(started_at=timezone.now() - datetime.timedelta(minutes=10))
+        AnalysisJob.objects.filter(pk=fresh.pk).update(started_at=timezone.now())
+
+        job = claim_next_job(lease=datetime.timedelta(minutes=5))
+        self.assertEqual((job.pk, job.attempts), (stale.pk, 2))
+        self.assertIsNone(claim_next_job(lease=datetime.timedelta(minutes=5)))
+
+    def test_failed_job_is_retried_until_out_of_attempts(self):
+        AnalysisJob.objects.create(case=make_cases(1)[0])
+        job = claim_next_job()
+        fail_job(job, RuntimeError("boom"), max_attempts=2)
+        self.assertEqual(job.status, AnalysisJob.JobStatus.PENDING)
+
+        job = claim_next_job()
+        fail_job(job, RuntimeError("boom"), max_attempts=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (AnalysisJob.JobStatus.FAILED, "boom"))
+        self.assertIsNone(claim_next_job())
+
+    def test_completing_a_job_keeps_the_judges_decision(self):
+        case = make_cases(1)[0]
+        Case.objects.filter(pk=case.pk).update(status=Case.CaseStatus.SUBMITTED)
+        AnalysisJob.objects.create(case=case)
+        job = claim_next_job()
+        # The judge decides while the analysis is still running
+        self.client.post(f'/api/cases/{case.pk}/approve_case/')
+        version = Case.objects.get(pk=case.pk).version
+
+        self.assertTrue(complete_job(job, case.validation_result, AIResult("تحليل", "تسبيب")))
+        case.refresh_from_db()
+        self.assertEqual((case.status, case.version), (Case.CaseStatus.APPROVED, version + 1))
+        self.assertEqual(ValidationResult.objects.get(case=case).generated_reasoning, "تسبيب")
+
+    def test_submitted_case_moves_on_to_the_judge(self):
+        case = make_cases(1)[0]
+        Case.objects.filter(pk=case.pk).update(status=Case.CaseStatus.SUBMITTED)
+        AnalysisJob.objects.create(case=case)
+        complete_job(claim_next_job(), case.validation_result, AIResult("تحليل", "تسبيب"))
+        self.assertEqual(Case.objects.get(pk=case.pk).status, Case.CaseStatus.PENDING_JUDGE)
+
+    def test_job_that_lost_its_lease_writes_nothing(self):
+        case = make_cases(1)[0]
+        AnalysisJob.objects.create(case=case)
+        job = claim_next_job()
+        # The lease expired and another worker claimed the job meanwhile
+        AnalysisJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - datetime.timedelta(minutes=10))
+        other = claim_next_job(lease=datetime.timedelta(minutes=5))
+
+        self.assertFalse(complete_job(job, case.validation_result, AIResult("قديم", "قديم")))
+        fail_job(job, RuntimeError("late"))
+        self.assertEqual(ValidationResult.objects.get(case=case).ai_analysis, "تحليل طويل")
+        other.refresh_from_db()
+        self.assertEqual((other.status, other.error), (AnalysisJob.JobStatus.RUNNING, ''))
+
+
+class RuleRegistryTests(TestCase):
+    def setUp(self):
+        # Drop rules compiled from rows this test's rollback removes
+        self.addCleanup(rule_registry.invalidate)
+
+    def test_rule_edits_reach_every_process(self):
+        other_process = RuleRegistry(check_seconds=0)
+
+        def days(registry):
+            return {rule.code: getattr(rule, 'days', None) for rule in registry.get_rules()}.get('ARTICLE_16_TIMEOUT')
+
+        self.assertEqual(days(other_process), 60)
+        rule = ProceduralRule.objects.get(code='ARTICLE_16_TIMEOUT')
+        rule.parameter_value = dict(rule.parameter_value, days=30)
+        rule.save()
+        self.assertEqual(days(rule_registry), 30)
+        self.assertEqual(days(other_process), 30)
+
+        rule.delete()
+        self.assertIsNone(days(rule_registry))
+        self.assertIsNone(days(other_process))
+
+    def test_admin_messages_with_unknown_placeholders_do_not_break_validation(self):
+        ProceduralRule.objects.create(code='CUSTOM_DEADLINE', name="Custom", description="", parameter_value={
+            'type': 'statute_of_limitations', 'days': 1, 'message': "بعد {days} يوم {unknown}",
+        })
+        output = RuleValidator().validate_case({
+            'description': "", 'incident_date': datetime.date.today() - datetime.timedelta(days=5),
+        })
+        reason = next(reason for reason in output['reasons'] if reason['code'] == 'CUSTOM_DEADLINE')
+        self.assertEqual(reason['message'], "بعد 1 يوم {unknown}")
+        self.assertEqual(format_message("{days} {", {'days': 1}), "{days} {")
+        self.assertEqual(format_message("{0} {days!z}", {'days': 1}), "{0} {days!z}")
+
+
+class GrievanceKeywordTests(TestCase):
+    KEYWORDS = ['ترقية', 'تاديب', 'فصل', 'خدمة مدنية', 'عسكرية', 'راتب']
+
+    def test_agrees_with_substring_search(self):
+        import random
+        rng = random.Random(7)
+        # Overlapping keywords exercise the failure links (the classic he/she/his/hers set)
+        for keywords in (self.KEYWORDS, ['he', 'she', 'his', 'hers'], ['ا', 'اب', 'باب', 'بابا']):
+            automaton = KeywordAutomaton(keywords)
+            alphabet = ''.join(sorted(set(''.join(keywords)))) + ' '
+            for _ in range(200):
+                text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+                expected = sorted(
+                    (keyword, i, i + len(keyword))
+                    for keyword in keywords for i in range(len(text)) if text.startswith(keyword, i)
+                )
+                self.assertEqual(sorted(automaton.find_all(text)), expected, text)
+                # The old rule: any(keyword in description)
+                self.assertEqual(automaton.contains_any(text), any(keyword in text for keyword in keywords))
+
+    def test_matches_orthographic_variants(self):
+        automaton = KeywordAutomaton(self.KEYWORDS)
+        for text in ("قرار تأديبي", "تَأْدِيب الموظف", "موظف خدمه مدنيه", "لم يحصل على ترقيـــة"):
+            self.assertTrue(automaton.contains_any(text), text)
+        self.assertFalse(automaton.contains_any("نزاع تجاري حول عقد توريد"))
+
+        text = "صدر قرار تَأْدِيب بحقه"
+        [match] = automaton.find_all(text)
+        # Offsets point into the original text, diacritics included
+        self.assertEqual((match.keyword, text[match.start:match.end]), ('تاديب', "تَأْدِيب"))
+        self.assertEqual(normalize_arabic("تَأْدِيب"), "تاديب")
+
+
+class BulkSubmitTests(TestCase):
+    def payload(self, analyze):
+        return {'analyze': analyze, 'cases': [{
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }]}
+
+    def test_analyze_flag_is_parsed_as_a_boolean(self):
+        for analyze, jobs in (("false", 0), ("0", 0), (False, 0), ("true", 1)):
+            response = self.client.post('/api/cases/bulk_submit/', self.payload(analyze), content_type='application/json')
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(AnalysisJob.objects.count(), jobs, analyze)
+            AnalysisJob.objects.all().delete()
+
+        response = self.client.post('/api/cases/bulk_submit/', self.payload("maybe"), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class HijriDateTests(TestCase):
+    def test_table_edges_and_known_dates(self):
+        self.assertEqual(hijri_to_gregorian(1343, 1, 1), datetime.date(1924, 8, 1))
+        self.assertEqual(hijri_to_gregorian(1500, 12, 30), datetime.date(2077, 11, 16))
+        self.assertEqual((GREGORIAN_MIN, GREGORIAN_MAX), (datetime.date(1924, 8, 1), datetime.date(2077, 11, 16)))
+        self.assertEqual(hijri_to_gregorian(1445, 1, 1), datetime.date(2023, 7, 19))
+        self.assertEqual(hijri_to_gregorian(1444, 9, 1), datetime.date(2023, 3, 23))
+        self.assertEqual(parse_hijri("١٤٤٥/٠١/٠١هـ"), datetime.date(2023, 7, 19))
+
+    def test_round_trip_over_the_whole_table(self):
+        for ordinal in range(GREGORIAN_MIN.toordinal(), GREGORIAN_MAX.toordinal() + 1):
+            day = datetime.date.fromordinal(ordinal)
+            year, month, day_of_month = gregorian_to_hijri(day)
+            self.assertTrue(1 <= day_of_month <= month_length(year, month))
+            self.assertEqual(hijri_to_gregorian(year, month, day_of_month), day)
+
+    def test_rejects_out_of_range_and_invalid_dates(self):
+        for year, month, day in ((1342, 12, 29), (1501, 1, 1), (1445, 13, 1), (1445, 0, 1), (1445, 1, 0), (1445, 1, 31)):
+            with self.assertRaises(ValueError, msg=(year, month, day)):
+                hijri_to_gregorian(year, month, day)
+        short_month = next(m for m in range(1, 13) if month_length(1445, m) == 29)
+        with self.assertRaises(ValueError):
+            hijri_to_gregorian(1445, short_month, 30)
+        for value in (GREGORIAN_MIN - datetime.timedelta(days=1), GREGORIAN_MAX + datetime.timedelta(days=1)):
+            with self.assertRaises(ValueError):
+                gregorian_to_hijri(value)
+        with self.assertRaises(ValueError):
+            parse_hijri("1445/1")
+
+    def test_api_accepts_hijri_and_rejects_invalid_ones(self):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': "1445/01/01", 'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        response = self.client.post('/api/cases/submit_and_validate/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Case.objects.get().incident_date, datetime.date(2023, 7, 19))
+
+        response = self.client.post('/api/cases/submit_and_validate/', dict(data, incident_date="1445/02/31"),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('incident_date', response.json())
+
+
+class CaseListApiTests(TestCase):
+    def test_list_query_count_does_not_grow_with_rows(self):
+        # The page's versions (for the ETag), then the rows with their relations
+        make_cases(3)
+        with self.assertNumQueries(2):
+            self.client.get('/api/cases/')
+
+        make_cases(20, start=3)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cases/')
+        self.assertEqual(len(response.json()['results']), 23)
+
+    def test_list_is_cursor_paginated(self):
+        make_cases(5)
+        response = self.client.get('/api/cases/?page_size=2')
+        body = response.json()
+        self.assertEqual(len(body['results']), 2)
+        self.assertIn('cursor=', body['next'])
+
+        seen = [case['id'] for case in body['results']]
+        while body['next']:
+            body = self.client.get(body['next']).json()
+            seen += [case['id'] for case in body['results']]
+        self.assertEqual(sorted(seen), sorted(Case.objects.values_list('id', flat=True)))
+
+    def test_list_leaves_out_large_texts_unless_expanded(self):
+        make_cases(1)
+        result = self.client.get('/api/cases/').json()['results'][0]['validation_result']
+        self.assertNotIn('ai_analysis', result)
+        self.assertNotIn('generated_reasoning', result)
+
+        result = self.client.get('/api/cases/?expand=ai_analysis').json()['results'][0]['validation_result']
+        self.assertEqual(result['ai_analysis'], "تحليل طويل")
+        self.assertNotIn('generated_reasoning', result)
+
+    def test_sparse_fieldsets(self):
+        case = make_cases(1)[0]
+        row = self.client.get('/api/cases/?fields=id,title,status').json()['results'][0]
+        self.assertEqual(set(row), {'id', 'title', 'status'})
+
+        detail = self.client.get(f'/api/cases/{case.id}/').json()
+        self.assertEqual(detail['validation_result']['generated_reasoning'], "بناءً على ما تقدم")
+
+
+class ConditionalGetTests(TestCase):
+    def test_detail_etag_changes_with_case_parties_and_result(self):
+        case = make_cases(1)[0]
+        url = f'/api/cases/{case.id}/'
+        version = Case.objects.get(pk=case.pk).version
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(self.client.get(url)['Last-Modified'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # Another representation of the same version
+        self.assertEqual(self.client.get(url + '?fields=id', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        def changed():
+            nonlocal etag
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+        case.status = Case.CaseStatus.APPROVED
+        case.save(update_fields=['status'])
+        changed()
+        case.plaintiff.name = "Renamed"
+        case.plaintiff.save()
+        changed()
+        ValidationResult.objects.filter(case=case).first().save()
+        changed()
+        job = AnalysisJob.objects.create(case=case, status=AnalysisJob.JobStatus.RUNNING, attempts=1)
+        run_job(job, gemini=mock.Mock(analyze_and_reason=mock.Mock(return_value=AIResult("تحليل", "تسبيب"))))
+        changed()
+        self.assertEqual(Case.objects.get(pk=case.pk).version, version + 4)
+
+    def test_list_answers_304_until_a_case_on_the_page_changes(self):
+        cases = make_cases(3)
+        etag = self.client.get('/api/cases/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/cases/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.post(f'/api/cases/{cases[1].id}/approve_case/')
+        self.assertEqual(self.client.get('/api/cases/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class PartyResolverTests(TestCase):
+    def test_resolves_batch_with_constant_queries(self):
+        payloads = [
+            {'name': f"مواطن {i}", 'party_type': Party.PartyType.INDIVIDUAL, 'role': Party.Role.PLAINTIFF,
+             'national_id': str(1000000000 + i)}
+            for i in range(50)
+        ]
+        # SELECT known keys, bulk INSERT the rest, read the new rows back.
+        with self.assertNumQueries(3):
+            parties = PartyResolver().resolve_many(payloads + payloads)
+        self.assertEqual(len({party.pk for party in parties}), 50)
+
+        with self.assertNumQueries(1):
+            again = PartyResolver().resolve_many(payloads)
+        self.assertEqual([party.pk for party in again], [party.pk for party in parties[:50]])
+
+    def test_name_key_ignores_spelling_variants(self):
+        first = PartyResolver().resolve(
+            {'name': "وزارة الصحة", 'party_type': Party.PartyType.GOVERNMENT, 'role': Party.Role.DEFENDANT})
+        second = PartyResolver().resolve(
+            {'name': "  وزاره   الصحه ", 'party_type': Party.PartyType.GOVERNMENT, 'role': Party.Role.DEFENDANT})
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Party.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentStorageTests(TestCase):
+    def submit(self, *files):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        response = self.client.post('/api/cases/submit_and_validate/', {'data': json.dumps(data), 'documents': list(files)})
+        self.assertEqual(response.status_code, 202, response.content)
+        return Case.objects.get(pk=response.json()['case_id'])
+
+    def test_identical_uploads_share_one_blob(self):
+        content = b"%PDF-1.4 " + os.urandom(1024)
+        first = self.submit(SimpleUploadedFile("a.pdf", content), SimpleUploadedFile("b.pdf", content))
+        self.submit(SimpleUploadedFile("a.pdf", content))
+
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(blob.size, len(content))
+        self.assertEqual(sorted(Document.objects.values_list('original_name', flat=True)), ['a.pdf', 'a.pdf', 'b.pdf'])
+        with blob.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+        first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_urlencoded_form_is_read_like_multipart(self):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        response = self.client.post(
+            '/api/cases/submit_and_validate/', urllib.parse.urlencode({'data': json.dumps(data)}),
+            content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(response.status_code, 202, response.content)
+        case = Case.objects.get(pk=response.json()['case_id'])
+        self.assertEqual((case.title, case.plaintiff.name), ("تظلم", "Ahmed"))
+        self.assertFalse(case.case_documents.exists())
+
+    def test_worker_extracts_attachments_once_per_content(self):
+        content = "قرار إداري بفصل الموظف\nصادر بتاريخ 1445/01/05".encode()
+        cases = [self.submit(SimpleUploadedFile("decision.txt", content)) for _ in range(2)]
+        self.assertFalse(ExtractedText.objects.exists())  # nothing is read during submission
+
+        prompts = []
+
+        class RecordingGemini:
+            def analyze_and_reason(self, text, case_data, validation_result, reasoning=None):
+                prompts.append(text)
+                return AIResult("analysis", "reasoning")
+
+        for case in cases:
+            run_job(claim_case_job(case), gemini=RecordingGemini())
+
+        extracted = ExtractedText.objects.get()
+        self.assertEqual(extracted.status, ExtractedText.ExtractionStatus.DONE)
+        self.assertIn("[decision.txt]\nقرار إداري بفصل الموظف", prompts[0])
+        self.assertEqual(prompts[0], prompts[1])
+
+    def test_unsupported_and_unreadable_files_are_cached(self):
+        docx = store_upload(SimpleUploadedFile("decision.docx", b"PK\x03\x04" + os.urandom(64)))
+        pdf = store_upload(SimpleUploadedFile("scan.pdf", b"%PDF-1.4 " + os.urandom(1024)))
+        self.assertEqual(extract_blob(docx).status, ExtractedText.ExtractionStatus.UNSUPPORTED)
+        self.assertEqual(extract_blob(pdf).status, ExtractedText.ExtractionStatus.FAILED)
+
+        with mock.patch('legal_engine.services.text_extraction.extract_file') as extract_file:
+            extract_blob(docx)
+            extract_blob(pdf)
+        extract_file.assert_not_called()
+
+    def test_io_errors_are_not_cached(self):
+        blob = store_upload(SimpleUploadedFile("decision.txt", "قرار إداري".encode()))
+        os.remove(blob.file.path)
+        with self.assertRaises(OSError):
+            extract_blob(blob)
+        self.assertFalse(ExtractedText.objects.exists())
+
+    def test_prune_keeps_a_blob_an_upload_just_reused(self):
+        content = b"%PDF-1.4 " + os.urandom(256)
+        blob = store_upload(SimpleUploadedFile("a.pdf", content))
+        StoredBlob.objects.update(created_at=timezone.now() - datetime.timedelta(days=1),
+                                  last_used_at=timezone.now() - datetime.timedelta(days=1))
+
+        reused = store_upload(SimpleUploadedFile("b.pdf", content))
+        self.assertEqual(reused.pk, blob.pk)
+        self.assertEqual(prune_unreferenced(), (0, 0))
+        self.assertTrue(os.path.exists(blob.file.path))
+
+        StoredBlob.objects.update(last_used_at=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(prune_unreferenced(), (1, len(content)))
+        self.assertFalse(os.path.exists(blob.file.path))
+
+    def test_reuse_that_loses_to_prune_stores_the_bytes_again(self):
+        content = b"%PDF-1.4 " + os.urandom(256)
+        blob = store_upload(SimpleUploadedFile("a.pdf", content))
+
+        def pruned_meanwhile():
+            StoredBlob.objects.filter(pk=blob.pk).delete()
+            return timezone.now()
+
+        # The reuse branch reads the clock between finding the blob and bumping it.
+        with mock.patch('legal_engine.services.blob_store.timezone') as clock:
+            clock.now.side_effect = pruned_meanwhile
+            stored = store_upload(SimpleUploadedFile("b.pdf", content))
+
+        self.assertNotEqual(stored.pk, blob.pk)
+        self.assertEqual(StoredBlob.objects.get().pk, stored.pk)
+        with stored.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+
+class CaseSearchTests(TestCase):
+    def make_case(self, title, description):
+        with self.captureOnCommitCallbacks(execute=True):
+            case = make_cases(1)[0]
+            case.title, case.description = title, description
+            case.save()
+        return case
+
+    def test_search_folds_spelling_and_affixes(self):
+        target = self.make_case("تظلم من قرار إداري", "قررت الوزارة فصل الموظفين بعد انتهاء المدة")
+        self.make_case("مطالبة مالية", "مستحقات متأخرة عن عقد توريد")
+
+        body = self.client.get('/api/cases/search/', {'q': 'موظف وزاره'}).json()
+        self.assertEqual([row['id'] for row in body['results']], [target.id])
+        self.assertIn('<mark>الموظفين</mark>', body['results'][0]['highlights']['description'])
+
+        # search-as-you-type: the last word matches as a prefix
+        body = self.client.get('/api/cases/search/', {'q': 'قرار ادا'}).json()
+        self.assertEqual([row['id'] for row in body['results']], [target.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        case = self.make_case("مطالبة مالية", "عقد توريد")
+        with self.captureOnCommitCallbacks(execute=True):
+            case.title = "تعويض عن ضرر"
+            case.save()
+        self.assertEqual(self.client.get('/api/cases/search/', {'q': 'مطالبة'}).json()['results'], [])
+        self.assertEqual(len(self.client.get('/api/cases/search/', {'q': 'تعويض'}).json()['results']), 1)
+
+        case.delete()
+        self.assertEqual(self.client.get('/api/cases/search/', {'q': 'تعويض'}).json()['results'], [])
+
+    def test_a_submission_is_indexed_once(self):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار فصل", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        with mock.patch('legal_engine.services.search.index_cases') as index_cases:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/cases/submit_and_validate/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 202, response.content)
+        index_cases.assert_called_once_with([response.json()['case_id']])
+
+    def test_rolled_back_savepoint_drops_its_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first, second = make_cases(2)
+        with mock.patch('legal_engine.services.search.index_cases') as index_cases:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_index(first.pk)
+                try:
+                    with transaction.atomic():
+                        schedule_index(second.pk)
+                        raise ValueError
+                except ValueError:
+                    pass
+                schedule_index(first.pk)
+        index_cases.assert_called_once_with([first.pk])
+
+    def test_fallback_backend_agrees_with_fts(self):
+        self.assertTrue(SQLiteFTSBackend.available())
+        target = self.make_case("تظلم من قرار إداري", "قررت الوزارة فصل الموظفين")
+        self.make_case("قرارات", "عقد توريد")
+        for text in ('موظف وزاره', 'قرار ادا', 'قرار'):
+            query = parse_query(text)
+            self.assertEqual(
+                sorted(case_id for case_id, _ in DatabaseSearchBackend().search(query, 10)),
+                sorted(case_id for case_id, _ in SQLiteFTSBackend().search(query, 10)),
+                text,
+            )
+        self.assertEqual(DatabaseSearchBackend().search(parse_query('موظف'), 10), [(target.id, 0.0)])
+
+
+class SimilarCaseTests(TestCase):
+    DESCRIPTIONS = [
+        "تظلم من قرار فصل الموظف من الخدمة المدنية",
+        "مطالبة بمستحقات مالية عن عقد توريد أجهزة",
+        "تظلم من قرار فصل موظفة من الخدمة",
+        "طلب تعويض عن ضرر ناتج عن حادث",
+    ]
+
+    def setUp(self):
+        self.index = SimilarityIndex(tempfile.mkdtemp())
+        patcher = mock.patch('legal_engine.management.commands.build_similarity_index.similarity_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cases = make_cases(len(self.DESCRIPTIONS))
+        for case, description in zip(self.cases, self.DESCRIPTIONS):
+            case.description = description
+            case.save()
+
+    def test_build_precomputes_earlier_precedents_only(self):
+        call_command('build_similarity_index', stdout=StringIO())
+        self.assertEqual(len(self.index), 4)
+
+        dismissal = CasePrecedent.objects.filter(case=self.cases[2]).first()
+        self.assertEqual(dismissal.precedent, self.cases[0])
+        self.assertFalse(CasePrecedent.objects.filter(case=self.cases[0]).exists())
+        self.assertFalse(CasePrecedent.objects.filter(case=self.cases[2], precedent_id__gte=self.cases[2].id).exists())
+
+        # incremental: only the new case is vectorized and gets precedents
+        new_case = make_cases(1)[0]
+        new_case.description = "تظلم من قرار فصل موظف"
+        new_case.save()
+        call_command('build_similarity_index', stdout=StringIO())
+        self.assertEqual(len(self.index), 5)
+        top = CasePrecedent.objects.filter(case=new_case).order_by('rank').first()
+        self.assertIn(top.precedent_id, (self.cases[0].id, self.cases[2].id))
+
+    def test_concurrent_builds_are_refused(self):
+        self.index.path.mkdir(parents=True, exist_ok=True)
+        with exclusive_lock(self.index.path / 'build.lock'):
+            with self.assertRaisesMessage(CommandError, 'Another build_similarity_index is running'):
+                call_command('build_similarity_index', stdout=StringIO())
+        call_command('build_similarity_index', stdout=StringIO())
+        self.assertEqual(len(self.index), 4)
+
+    def test_similar_action_scores_unindexed_cases_on_the_fly(self):
+        call_command('build_similarity_index', stdout=StringIO())
+        new_case = make_cases(1)[0]
+        new_case.description = "مستحقات مالية متأخرة عن عقد توريد"
+        new_case.save()
+
+        with mock.patch('legal_engine.views.similarity_index', self.index):
+            body = self.client.get(f'/api/cases/{new_case.id}/similar/', {'k': 2}).json()
+        self.assertEqual(body['results'][0]['id'], self.cases[1].id)
+        self.assertTrue(body['results'][0]['is_accepted'])
+
+
+class MapReduceAnalysisTests(TestCase):
+    def setUp(self):
+        with mock.patch.dict(os.environ, {'LLM_BACKEND': 'fake', 'LLM_FAKE_LATENCY': 'constant:0', 'LLM_RATE_PER_SECOND': '0'}):
+            self.service = GeminiService()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+        words = "تظلم قرار إداري فصل موظف وزارة عقد توريد مستحقات تعويض ضرر".split()
+        self.paragraphs = [f"الفقرة {i}: " + " ".join(words[(i + j) % len(words)] for j in range(150)) for i in range(40)]
+
+    def analyze(self, paragraphs):
+        prompts = []
+        generate = self.service.backend.generate
+
+        def recording_generate(prompt, timeout=None):
+            prompts.append(prompt)
+            return generate(prompt, timeout)
+
+        with mock.patch.object(self.service.backend, 'generate', side_effect=recording_generate):
+            self.service.analyze_text("\n\n".join(paragraphs), timeout=30)
+        return prompts
+
+    def test_long_text_is_chunked_and_only_edited_chunks_rerun(self):
+        prompts = self.analyze(self.paragraphs)
+        chunk_calls = [p for p in prompts if "جزء من ملف دعوى طويل" in p]
+        self.assertGreater(len(chunk_calls), 3)
+        self.assertEqual(len(prompts), len(chunk_calls) + 1)  # one reduce step
+        self.assertTrue(all(len(p) < 6000 * 3 for p in prompts))
+
+        edited = list(self.paragraphs)
+        edited[20] += " وقد تم تعديل هذه الفقرة"
+        prompts = self.analyze(edited)
+        self.assertLessEqual(len([p for p in prompts if "جزء من ملف دعوى طويل" in p]), 2)
+        self.assertIn("وقد تم تعديل هذه الفقرة", "".join(prompts))
+
+    def test_short_text_keeps_single_prompt(self):
+        self.assertEqual(len(self.analyze(self.paragraphs[:2])), 1)
+
+    def analyze_failing(self, fail):
+        """analyze_text where the calls for which fail(prompt, reduce calls so far) is true are unavailable."""
+        generate, reduce_calls, lock = self.service._generate, [0], threading.Lock()
+
+        def failing_generate(prompt, template_version, timeout=None):
+            with lock:
+                if template_version == GeminiService.ANALYSIS_REDUCE_PROMPT_VERSION:
+                    reduce_calls[0] += 1
+                failed = fail(prompt, reduce_calls[0])
+            if failed:
+                raise LLMUnavailable("Circuit open")
+            return generate(prompt, template_version, timeout)
+
+        with mock.patch.object(self.service, '_generate', side_effect=failing_generate):
+            return self.service.analyze_text("\n\n".join(self.paragraphs), timeout=30)
+
+    def test_unavailable_chunk_is_reported_as_missed(self):
+        analysis = self.analyze_failing(lambda prompt, reduce_calls: "الفقرة 20:" in prompt and not reduce_calls)
+        self.assertIn("تعذر تحليل 1 من أجزاء الملف", analysis)
+
+    def test_missed_intermediate_reduce_is_reported(self):
+        # Partials long enough that merging them takes a round of two reduce calls, then a final one
+        self.service.backend.response_chars = 4000
+        analysis = self.analyze_failing(lambda prompt, reduce_calls: reduce_calls == 1)
+        self.assertIn("تعذر تحليل 1 من أجزاء الملف", analysis)
+
+    def test_reduce_round_without_answers_raises(self):
+        self.service.backend.response_chars = 4000
+        with self.assertRaises(TimeoutError):
+            self.analyze_failing(lambda prompt, reduce_calls: reduce_calls > 0)
+
+
+class StreamAnalysisTests(TestCase):
+    def setUp(self):
+        with mock.patch.dict(os.environ, {'LLM_BACKEND': 'fake', 'LLM_FAKE_LATENCY': 'constant:0', 'LLM_RATE_PER_SECOND': '0'}):
+            self.service = GeminiService()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+        patcher = mock.patch('legal_engine.services.analysis_jobs.get_gemini_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def submit(self):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        response = await self.async_client.post('/api/cases/submit_and_validate/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()
+
+    async def events(self, url):
+        response = await self.async_client.get(url, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = "".join([chunk.decode() async for chunk in response.streaming_content])
+        events = []
+        for block in body.split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if lines:
+                events.append((lines['event'], json.loads(lines['data'])))
+        return events
+
+    async def test_rule_results_first_then_reasoning_pieces(self):
+        submitted = await self.submit()
+        events = await self.events(submitted['stream_url'])
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'validation')
+        self.assertIsNone(events[0][1]['ai_insight']['generated_reasoning'])
+        self.assertGreater(names.count('reasoning'), 1)
+        self.assertEqual(names[-2:], ['analysis', 'done'])
+
+        streamed = "".join(data['delta'] for name, data in events if name == 'reasoning')
+        result = await ValidationResult.objects.aget(case_id=submitted['case_id'])
+        self.assertEqual(streamed, result.generated_reasoning)
+        self.assertEqual(events[-1][1]['ai_insight']['generated_reasoning'], streamed)
+        job = await AnalysisJob.objects.aget(case_id=submitted['case_id'])
+        self.assertEqual(job.status, AnalysisJob.JobStatus.DONE)
+
+        # A finished job is replayed from the database, without calling the model again
+        with mock.patch.object(self.service.backend, 'astream') as astream:
+            replay = await self.events(submitted['stream_url'])
+        astream.assert_not_called()
+        self.assertEqual([name for name, _ in replay], ['validation', 'reasoning', 'analysis', 'done'])
+        self.assertEqual(replay[1][1]['delta'], streamed)
+
+    async def test_disconnect_requeues_without_using_an_attempt(self):
+        submitted = await self.submit()
+        case = await Case.objects.aget(pk=submitted['case_id'])
+        job = await sync_to_async(claim_case_job)(case)
+        self.assertEqual(job.attempts, 1)
+
+        analysis_cancelled = asyncio.Event()
+
+        async def slow_analysis(text, timeout=None):
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                analysis_cancelled.set()
+                raise
+
+        with mock.patch.object(self.service, 'analyze_text_async', side_effect=slow_analysis):
+            stream = stream_job(job)
+            self.assertEqual((await stream.__anext__())[0], 'reasoning')
+            await stream.aclose()  # what Django does when the client goes away
+            await asyncio.wait_for(analysis_cancelled.wait(), 5)
+
+        job = await AnalysisJob.objects.aget(pk=job.pk)
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.JobStatus.PENDING, 0))
+        result = await ValidationResult.objects.aget(case=case)
+        self.assertEqual(result.generated_reasoning, '')
+
+        # The worker (or the next stream) picks the job up again
+        job = await sync_to_async(lambda: run_job(claim_case_job(case)))()
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.JobStatus.DONE, 1))
+
+    async def test_judge_actions(self):
+        submitted = await self.submit()
+        response = await self.async_client.post(f"/api/cases/{submitted['case_id']}/approve_case/")
+        self.assertEqual(response.json(), {'status': 'Approved', 'case_id': submitted['case_id']})
+        case = await Case.objects.aget(pk=submitted['case_id'])
+        self.assertEqual(case.status, Case.CaseStatus.APPROVED)
+        self.assertEqual((await self.async_client.post('/api/cases/999999/reject_case/')).status_code, 404)
+
+
+class WSGIStreamTests(TransactionTestCase):
+    """The stream under WSGI runs on a thread of its own, so the data must be committed."""
+
+    def setUp(self):
+        with mock.patch.dict(os.environ, {'LLM_BACKEND': 'fake', 'LLM_FAKE_LATENCY': 'constant:0', 'LLM_RATE_PER_SECOND': '0'}):
+            self.service = GeminiService()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+        patcher = mock.patch('legal_engine.services.analysis_jobs.get_gemini_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submit(self):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        return self.client.post('/api/cases/submit_and_validate/', data, content_type='application/json').json()
+
+    def test_events_are_sent_as_they_are_produced(self):
+        submitted = self.submit()
+
+        released, finished = threading.Event(), threading.Event()
+
+        async def gated_analysis(text, timeout=None):
+            await asyncio.to_thread(released.wait, 10)
+            finished.set()
+            return "التحليل"
+
+        with mock.patch.object(self.service, 'analyze_text_async', side_effect=gated_analysis):
+            response = self.client.get(submitted['stream_url'], headers={'Accept': 'text/event-stream'})
+            self.assertFalse(response.is_async)
+            chunks = iter(response.streaming_content)
+            self.assertTrue(next(chunks).decode().startswith("event: validation"))
+            self.assertTrue(next(chunks).decode().startswith("event: reasoning"))
+            self.assertFalse(finished.is_set())  # nothing waited for the analysis
+            released.set()
+            body = b"".join(chunks).decode()
+        self.assertIn('event: analysis\ndata: {"analysis": "التحليل"}', body)
+        self.assertIn("event: done", body)
+        job = AnalysisJob.objects.get(case_id=submitted['case_id'])
+        self.assertEqual(job.status, AnalysisJob.JobStatus.DONE)
+
+    def test_closing_the_response_requeues_the_job(self):
+        submitted = self.submit()
+
+        async def slow_analysis(text, timeout=None):
+            await asyncio.sleep(60)
+
+        with mock.patch.object(self.service, 'analyze_text_async', side_effect=slow_analysis):
+            response = self.client.get(submitted['stream_url'], headers={'Accept': 'text/event-stream'})
+            chunks = iter(response.streaming_content)
+            next(chunks), next(chunks)
+            response.close()  # what the WSGI server does when the client goes away
+        job = AnalysisJob.objects.get(case_id=submitted['case_id'])
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.JobStatus.PENDING, 0))
+
+
+class SessionCsrfTests(TestCase):
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.case = make_cases(1)[0]
+        self.url = f'/api/cases/{self.case.pk}/approve_case/'
+
+    def test_logged_in_judges_need_the_token(self):
+        self.client.force_login(User.objects.create_user('judge'))
+        self.assertEqual(self.client.post(self.url).status_code, 403)
+        self.case.refresh_from_db()
+        self.assertNotEqual(self.case.status, Case.CaseStatus.APPROVED)
+
+        token = 'k' * 32
+        self.client.cookies['csrftoken'] = token
+        self.assertEqual(self.client.post(self.url, headers={'X-CSRFToken': token}).status_code, 200)
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.status, Case.CaseStatus.APPROVED)
+
+    def test_api_clients_without_a_session_need_no_token(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+
+
+class LLMCacheTests(TransactionTestCase):
+    """The persistent tier is used from pool threads, so the data must be committed."""
+
+    def record_closes(self):
+        """Names of the threads that close a database connection, from now on."""
+        closed_in = []
+        backend = type(connections['default'])
+        close = backend.close
+
+        def recording_close(wrapper):
+            closed_in.append(threading.current_thread().name)
+            close(wrapper)
+
+        patcher = mock.patch.object(backend, 'close', recording_close)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return closed_in
+
+    def test_pool_threads_release_their_connection(self):
+        closed_in = self.record_closes()
+        cache = LLMCache(persistent=True)
+        with ConnectionClosingExecutor(max_workers=1, thread_name_prefix='cache-test') as pool:
+            pool.submit(cache.set, 'key', "رد محفوظ", 'fake-llm', 'v1').result()
+            self.assertEqual(closed_in, ['cache-test_0'])
+            # Answered by the table, from a fresh connection
+            self.assertEqual(pool.submit(LLMCache(persistent=True).get, 'key').result(), "رد محفوظ")
+        self.assertEqual(closed_in, ['cache-test_0', 'cache-test_0'])
+
+    def test_gemini_pools_release_their_connections(self):
+        with mock.patch.dict(os.environ, {'LLM_BACKEND': 'fake', 'LLM_FAKE_LATENCY': 'constant:0'}):
+            service = GeminiService()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+        closed_in = self.record_closes()
+
+        ai = service.analyze_and_reason("نص الدعوى", {}, {'is_valid': True})
+        self.assertFalse(ai.fallback)
+        # Both calls (analysis, reasoning) closed what they opened on their pool thread
+        self.assertEqual(len([name for name in closed_in if name.startswith('gemini_')]), 2)
+
+
+class LLMResilienceTests(TestCase):
+    def setUp(self):
+        env = {
+            'LLM_BACKEND': 'fake', 'LLM_FAKE_LATENCY': 'constant:0', 'LLM_FAKE_ERROR_RATE': '1',
+            'LLM_RATE_PER_SECOND': '0', 'LLM_RETRY_ATTEMPTS': '2', 'LLM_RETRY_BASE_SECONDS': '0',
+            'LLM_BREAKER_FAILURES': '4',
+        }
+        with mock.patch.dict(os.environ, env):
+            self.service = GeminiService()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+
+    def test_outage_falls_back_marks_result_and_opens_circuit(self):
+        case = make_cases(1)[0]
+        job = AnalysisJob.objects.create(case=case, status=AnalysisJob.JobStatus.RUNNING, attempts=1)
+
+        with mock.patch.object(self.service.backend, 'generate', wraps=self.service.backend.generate) as generate:
+            run_job(job, gemini=self.service)
+            self.assertEqual(generate.call_count, 4)  # two calls, two attempts each
+            self.assertEqual(self.service.breaker.state, 'open')
+
+            result = ValidationResult.objects.get(case=case)
+            self.assertEqual(result.ai_status, ValidationResult.AIStatus.FALLBACK)
+            self.assertEqual(job.status, AnalysisJob.JobStatus.DONE)
+            self.assertIn("Injected upstream error", job.error)
+
+            # While open, calls short-circuit without reaching the backend
+            ai = self.service.analyze_and_reason("نص", {}, {'is_valid': True})
+            self.assertTrue(ai.fallback)
+            self.assertEqual(generate.call_count, 4)
+
+        self.assertEqual(requeue_fallbacks(), 1)
+        self.assertEqual(requeue_fallbacks(), 0)  # already queued
+
+    def test_rerunning_a_decided_case_only_refreshes_the_texts(self):
+        case = make_cases(1)[0]
+        ValidationResult.objects.filter(case=case).update(ai_status=ValidationResult.AIStatus.FALLBACK)
+        Case.objects.filter(pk=case.pk).update(status=Case.CaseStatus.APPROVED)
+
+        self.assertEqual(requeue_fallbacks(), 1)
+        job = claim_next_job()
+        with mock.patch.object(self.service, 'analyze_and_reason', return_value=AIResult("تحليل", "تسبيب")):
+            run_job(job, gemini=self.service)
+
+        self.assertEqual(Case.objects.get(pk=case.pk).status, Case.CaseStatus.APPROVED)
+        result = ValidationResult.objects.get(case=case)
+        self.assertEqual((result.ai_status, result.ai_analysis), (ValidationResult.AIStatus.COMPLETE, "تحليل"))
+
+    def test_token_bucket_is_shared_between_instances(self):
+        first, second = TokenBucket('test', rate=1, burst=2), TokenBucket('test', rate=1, burst=2)
+        self.assertEqual(first._try_take(), 0)
+        self.assertEqual(second._try_take(), 0)
+        self.assertGreater(first._try_take(), 0.5)
+
+
+class MetricsTests(TestCase):
+    def test_submission_stages_reach_metrics_and_slow_log(self):
+        data = {
+            'title': "تظلم", 'description': "تظلم من قرار", 'incident_date': str(datetime.date.today()),
+            'court_type': "Administrative",
+            'plaintiff': {'name': "Ahmed", 'party_type': 'INDIVIDUAL', 'role': 'PLAINTIFF'},
+            'defendant': {'name': "Ministry", 'party_type': 'GOVERNMENT', 'role': 'DEFENDANT'},
+        }
+        with mock.patch('legal_engine.middleware.SLOW_REQUEST_SECONDS', 0), \
+                self.assertLogs('legal_engine.requests', 'WARNING') as logs:
+            response = self.client.post('/api/cases/submit_and_validate/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        for stage in ('validate', 'party_resolution', 'case_insert', 'rules', 'result_write'):
+            self.assertIn(f"{stage}=", logs.output[0])
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('modaqiq_stage_seconds_count{stage="rules"}', body)
+        self.assertIn('modaqiq_requests_total{view="case-submit-and-validate",method="POST",status="202"}', body)
+        self.assertIn('modaqiq_analysis_jobs{status="PENDING"} 1', body)
+
+
+
+class WorkerMetricsTests(TransactionTestCase):
+    """The metrics server answers from threads of its own, so the data must be committed."""
+
+    def test_worker_serves_its_own_metrics(self):
+        server = serve_metrics(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        LLM_CALLS.inc(prompt='worker-test', outcome='ok')
+
+        with urllib.request.urlopen(url) as response:
+            self.assertIn('modaqiq_llm_calls_total{prompt="worker-test",outcome="ok"}', response.read().decode())
+
+        with mock.patch('legal_engine.services.metrics.METRICS_TOKEN', 'secret'):
+            with self.assertRaises(urllib.error.HTTPError) as refused:
+                urllib.request.urlopen(url)
+            self.assertEqual(refused.exception.code, 401)
+            with urllib.request.urlopen(urllib.request.Request(url, headers={'Authorization': 'Bearer secret'})) as response:
+                self.assertEqual(response.status, 200)
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmarks_run_and_roll_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            call_command('benchmark', only=['rules.validate_case', 'submit.'], repeat=1,
+                         baseline=baseline, update_baseline=True, stdout=StringIO(), stderr=StringIO())
+            with open(baseline) as f:
+                stored = json.load(f)
+        self.assertEqual(set(stored['benchmarks']), {
+            'rules.validate_case', 'rules.validate_case_from_mapping', 'submit.end_to_end',
+        })
+        # The benchmarks' rows were rolled back
+        self.assertFalse(Case.objects.exists())
+
+    def test_regression_against_baseline_fails_the_run(self):
+        # Synthetic timings, so the verdict does not depend on this machine's speed
+        report = {'benchmarks': {
+            name: {'median': median, 'min': median}
+            for name, median in [('steady', 1.0), ('slower', 1.3), ('tolerant', 1.3), ('new', 5.0)]
+        }}
+        baseline = {'benchmarks': {
+            'steady': {'median': 1.0},
+            'slower': {'median': 1.0},
+            'tolerant': {'median': 1.0, 'threshold': 0.5},
+        }}
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline_path = os.path.join(tmp, 'baseline.json')
+            output = os.path.join(tmp, 'results.json')
+            with open(baseline_path, 'w') as f:
+                json.dump(baseline, f)
+            with mock.patch('legal_engine.management.commands.benchmark.run_benchmarks', return_value=report), \
+                    self.assertRaisesMessage(CommandError, 'threshold: slower'):
+                call_command('benchmark', baseline=baseline_path, output=output, stdout=StringIO(), stderr=StringIO())
+            with open(output) as f:
+                results = json.load(f)['benchmarks']
+        self.assertEqual({name for name, result in results.items() if result.get('regressed')}, {'slower'})
+        self.assertAlmostEqual(results['tolerant']['ratio'], 1.3)
+        self.assertNotIn('ratio', results['new'])
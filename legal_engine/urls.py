@@ -1,10 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import CaseViewSet
 
 router = DefaultRouter()
 router.register(r'cases', CaseViewSet)
 
 urlpatterns = [
+    # Async views; listed before the router so they take these case URLs
+    path('cases/submit_and_validate/', async_views.submit_and_validate, name='case-submit-and-validate'),
+    path('cases/<int:pk>/approve_case/', async_views.approve_case, name='case-approve-case'),
+    path('cases/<int:pk>/reject_case/', async_views.reject_case, name='case-reject-case'),
+    path('cases/<int:pk>/stream/', async_views.stream, name='case-stream'),
     path('', include(router.urls)),
 ]
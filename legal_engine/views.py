@@ -1,117 +1,282 @@
-from rest_framework import viewsets, status
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-from django.db import transaction
 
-from .models import Case, ValidationResult, Party
+from .models import Case, CasePrecedent, ValidationResult, Party, AnalysisJob
 from .serializers import CaseSerializer, ValidationResultSerializer
-from .services.logic_engine import RuleValidator
-from .services.gemini_service import GeminiService
+from .services.bulk_intake import bulk_create_cases
+from .services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, authorized as metrics_authorized, registry
+from .services.search import search_cases
+from .services.similarity import similarity_index
+
+BULK_SUBMIT_MAX_CASES = 500
+SEARCH_MAX_RESULTS = 50
+SIMILAR_MAX_RESULTS = 20
+
+
+def metrics(request):
+    """
+    Prometheus text exposition of this process's request, stage and Gemini metrics.
+    Unauthenticated unless METRICS_TOKEN is set; the analysis worker's metrics are
+    served by the worker itself (run_analysis_worker --metrics-port).
+    """
+    if not metrics_authorized(request.headers.get('Authorization')):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def analysis_payload(case, result, job):
+    job_status = job.status if job else AnalysisJob.JobStatus.DONE
+    analysis_done = job_status == AnalysisJob.JobStatus.DONE
+    return {
+        "case_id": case.id,
+        "status": "ACCEPTED" if result.is_accepted else "REJECTED",
+        "validation_details": result.rejection_reasons,
+        "job": {
+            "id": job.id if job else None,
+            "status": job_status,
+            "error": job.error if job else "",
+        },
+        "ai_insight": {
+            "analysis": result.ai_analysis if analysis_done else None,
+            "generated_reasoning": result.generated_reasoning if analysis_done else None
+        },
+        "ui_hints": {
+            "steps_completed": 3 if analysis_done else 2,
+            "steps_total": 5,
+            "next_action": "File Officially" if result.is_accepted else "Amend Complaint"
+        }
+    }
+
+
+class CaseCursorPagination(CursorPagination):
+    ordering = ('-submission_date', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
 
 class CaseViewSet(viewsets.ModelViewSet):
+    """
+    GET /api/cases/ is cursor-paginated and N+1 free. Both list and detail accept
+    ?fields=id,title,... (sparse fieldsets) and ?expand=ai_analysis,generated_reasoning;
+    the long Gemini texts are left out of (and deferred in) the list unless expanded.
+
+    Submission, the judge's approve/reject and the SSE stream are async views (async_views.py).
+
+    list and retrieve send ETag/Last-Modified from Case.version/updated_at; a matching
+    If-None-Match (or If-Modified-Since) gets a 304 after only reading those columns.
+    """
     queryset = Case.objects.all()
     serializer_class = CaseSerializer
+    pagination_class = CaseCursorPagination
+
+    def _query_list(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+    def _expansions(self):
+        expand = self._query_list('expand')
+        if expand is None:
+            # Detail responses stay complete by default; lists are lean by default.
+            return set(ValidationResultSerializer.LARGE_FIELDS) if self.action == 'retrieve' else set()
+        return expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        fields = self._query_list('fields')
+        relations = [name for name in ('plaintiff', 'defendant', 'validation_result') if fields is None or name in fields]
+        queryset = queryset.select_related(*relations)
+
+        deferred = []
+        if fields is not None and 'description' not in fields:
+            deferred.append('description')
+        if 'validation_result' in relations:
+            deferred += [
+                f'validation_result__{name}'
+                for name in ValidationResultSerializer.LARGE_FIELDS if name not in self._expansions()
+            ]
+        return queryset.defer(*deferred) if deferred else queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self._query_list('fields'))
+            kwargs.setdefault('expand', self._expansions())
+        return super().get_serializer(*args, **kwargs)
+
+    def _conditional_get(self, versions, last_modified, render):
+        """
+        304 if the client's validators still match `versions` ([(case id, version)]),
+        otherwise render(); either way with ETag and Last-Modified.
+        """
+        # ?fields=, ?expand=, ?cursor= and the renderer select a different representation
+        key = repr((versions, self.request.META.get('QUERY_STRING', ''), self.request.accepted_renderer.format))
+        etag = quote_etag(hashlib.blake2b(key.encode(), digest_size=12).hexdigest())
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            response['Cache-Control'] = 'no-cache'  # always revalidate; a 304 is cheap
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            state = Case.objects.filter(pk=kwargs['pk']).values_list('version', 'updated_at').first()
+        except (TypeError, ValueError):
+            state = None
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)  # the usual 404
+        version, updated_at = state
+        return self._conditional_get(
+            [(int(kwargs['pk']), version)], updated_at, lambda: super(CaseViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
+    def list(self, request, *args, **kwargs):
+        # Page through the version columns only; the rows are loaded and serialized on a miss
+        page = self.paginate_queryset(
+            self.filter_queryset(self.queryset.all()).only('id', 'submission_date', 'version', 'updated_at')
+        )
+        if page is None:
+            return super().list(request, *args, **kwargs)
+
+        def render():
+            rows = self.get_queryset().in_bulk([case.pk for case in page])
+            serializer = self.get_serializer([rows[case.pk] for case in page if case.pk in rows], many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return self._conditional_get(
+            [(case.pk, case.version) for case in page],
+            max((case.updated_at for case in page), default=None),
+            render,
+        )
 
     @action(detail=False, methods=['post'])
-    def submit_and_validate(self, request):
+    def bulk_submit(self, request):
         """
-        Main Endpoint: Receives case data -> Saves Draft -> Runs Logic Engine -> Runs Gemini -> Return Result
+        Batch intake: {"cases": [...], "analyze": false}
+        Validates every item, persists the valid ones with bulk inserts and reports per-item status.
+        AI analysis is only queued when "analyze" is true.
         """
-        # 1. Validate Input Data
-        import json
-        
-        # Check if 'data' field exists (Multipart) or use request.data directly (JSON)
-        if 'data' in request.data:
-             try:
-                 data = json.loads(request.data['data'])
-             except json.JSONDecodeError:
-                 return Response({"error": "Invalid JSON in 'data' field"}, status=status.HTTP_400_BAD_REQUEST)
+        items = request.data.get('cases')
+        if not isinstance(items, list) or not items:
+            return Response({"error": "'cases' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_SUBMIT_MAX_CASES:
+            return Response({"error": f"At most {BULK_SUBMIT_MAX_CASES} cases per request"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # "false"/"0" from form posts must not queue Gemini for the whole batch
+            analyze = serializers.BooleanField().to_internal_value(request.data.get('analyze', False))
+        except serializers.ValidationError:
+            return Response({"error": "'analyze' must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid_indexes, valid_data = [], []
+        for i, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                valid_indexes.append(i)
+                valid_data.append(serializer.validated_data)
+            else:
+                results[i] = {"index": i, "status": "INVALID", "errors": serializer.errors}
+
+        if valid_data:
+            try:
+                created = bulk_create_cases(valid_data, analyze=analyze)
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for i, summary in zip(valid_indexes, created):
+                results[i] = {"index": i, **summary}
+
+        if not valid_data:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(valid_data) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
         else:
-             data = request.data
+            response_status = status.HTTP_201_CREATED
 
-        serializer = self.get_serializer(data=data)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "created": len(valid_data),
+            "invalid": len(items) - len(valid_data),
+            "results": results,
+        }, status=response_status)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET /api/cases/search/?q=...&limit=20
+        Ranked full-text search over titles, descriptions, AI analyses and attachment text,
+        Arabic-normalized and lightly stemmed, with <mark>-highlighted snippets.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            with transaction.atomic():
-                # 2. Save Case as Draft
-                case = serializer.save()
-
-                # 2.1 Handle File Uploads
-                files = request.FILES.getlist('documents')
-                if files:
-                    from .models import Document
-                    for f in files:
-                        Document.objects.create(case=case, file=f)
-
-
-                # 3. Serialize again to get full representation for Logic Engine (dates as strings/obj validation)
-                case_data = serializer.data
-                
-                # 4. Run Logic Engine
-                validator = RuleValidator()
-                validation_output = validator.validate_case(case_data)
-                
-                # 5. Run Gemini AI (Simulated for Hackathon/ MVP)
-                gemini = GeminiService()
-                print(f"DEBUG VIEW: Service Active? {gemini.is_active}")
-                if gemini.is_active:
-                     print(f"DEBUG VIEW: Key used: {gemini.api_key[:10]}...")
-                     print(f"DEBUG VIEW: Model used: {gemini.model.model_name}")
-                
-                # Combine Logic Output + Case Text for Gemini
-                # In real scenario: prompt = f"Case: {case.description}. Validation said: {validation_output}..."
-                ai_analysis = gemini.analyze_text(case.description)
-                reasoning = gemini.generate_reasoning(case_data, validation_output)
-                
-                # 6. Save Result
-                result = ValidationResult.objects.create(
-                    case=case,
-                    is_accepted=validation_output['is_valid'],
-                    rejection_reasons=validation_output['reasons'],
-                    ai_analysis=ai_analysis,
-                    generated_reasoning=reasoning,
-                    confidence_score=0.95 # Mock high confidence
-                )
-                
-                # 7. Update Case Status
-                case.status = Case.CaseStatus.PENDING_JUDGE
-                case.save()
-                
-                # 8. Return "Stunning" Response
-                response_data = {
-                    "case_id": case.id,
-                    "status": "ACCEPTED" if result.is_accepted else "REJECTED",
-                    "validation_details": validation_output['reasons'],
-                    "ai_insight": {
-                        "analysis": ai_analysis,
-                        "generated_reasoning": reasoning
-                    },
-                    "ui_hints": {
-                        "steps_completed": 3,
-                        "steps_total": 5,
-                        "next_action": "File Officially" if result.is_accepted else "Amend Complaint"
-                    }
-                }
-                
-                return Response(response_data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    @action(detail=True, methods=['post'])
-    def approve_case(self, request, pk=None):
+            limit = max(1, min(int(request.query_params.get('limit', 20)), SEARCH_MAX_RESULTS))
+        except ValueError:
+            return Response({"error": "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"query": query, "results": search_cases(query, limit)})
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        GET /api/cases/{id}/similar/?k=5
+        Most similar earlier cases (character n-gram TF-IDF over the description) with their outcomes.
+        Served from the precomputed precedents when the case is indexed, otherwise scored on the fly.
+        """
         case = self.get_object()
-        case.status = Case.CaseStatus.APPROVED
-        case.save()
-        return Response({'status': 'Approved', 'case_id': case.id})
+        try:
+            k = max(1, min(int(request.query_params.get('k', 5)), SIMILAR_MAX_RESULTS))
+        except ValueError:
+            return Response({"error": "'k' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post'])
-    def reject_case(self, request, pk=None):
+        stored = list(
+            CasePrecedent.objects.filter(case=case).order_by('rank').values_list('precedent_id', 'similarity')[:k]
+        )
+        neighbours = stored if len(stored) == k else similarity_index.precedents(case.pk, case.description, k)
+
+        precedents = Case.objects.select_related('validation_result').in_bulk([case_id for case_id, _ in neighbours])
+        results = []
+        for case_id, similarity in neighbours:
+            precedent = precedents.get(case_id)
+            if precedent is None:
+                continue  # deleted since it was indexed
+            result = getattr(precedent, 'validation_result', None)
+            results.append({
+                "id": precedent.id,
+                "title": precedent.title,
+                "similarity": round(similarity, 4),
+                "submission_date": precedent.submission_date,
+                "status": precedent.status,
+                "is_accepted": result.is_accepted if result else None,
+                "rejection_codes": [reason.get('code') for reason in result.rejection_reasons] if result else [],
+                "generated_reasoning": result.generated_reasoning if result else "",
+            })
+        return Response({"case_id": case.id, "results": results})
+
+    @action(detail=True, methods=['get'])
+    def analysis(self, request, pk=None):
+        """
+        Polling endpoint for the asynchronous Gemini analysis of a submitted case.
+        """
         case = self.get_object()
-        reason = request.data.get('reason', 'No reason provided')
-        # Ideally store reason in a log or field
-        case.status = Case.CaseStatus.REJECTED
-        case.save()
-        return Response({'status': 'Rejected', 'case_id': case.id})
+        result = ValidationResult.objects.filter(case=case).first()
+        job = case.analysis_jobs.order_by('-id').first()
+        if result is None:
+            return Response({"error": "Case has not been validated yet"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(analysis_payload(case, result, job))
+
@@ -0,0 +1,151 @@
+"""
+Concurrent load generator for POST /api/cases/submit_and_validate/.
+
+Run the server against the local fake LLM so no Gemini quota is spent:
+
+    LLM_BACKEND=fake LLM_FAKE_LATENCY=lognormal:1.5,0.4 python manage.py runserver
+    LLM_BACKEND=fake python manage.py run_analysis_worker --workers 8
+    python load_test.py --requests 500 --concurrency 32 --wait-analysis
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Smallest valid single-page PDF, used when --document is not given
+MINIMAL_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+_local = threading.local()
+
+
+def session():
+    # One keep-alive connection pool per client thread
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def build_payload(i, unique):
+    incident_date = (datetime.date.today() - datetime.timedelta(days=10 + i % 90)).isoformat()
+    suffix = f" (طلب رقم {i})" if unique else ""
+    return {
+        "title": f"Load test case {i}",
+        "description": "تظلم من قرار فصل تعسفي صادر من جهة حكومية دون سابق إنذار أو تحقيق." + suffix,
+        "incident_date": incident_date,
+        "grievance_date": incident_date if i % 3 else None,
+        "court_type": "Administrative",
+        "plaintiff": {
+            "name": f"Load Tester {i % 50}",
+            "party_type": "INDIVIDUAL",
+            "role": "PLAINTIFF",
+            "national_id": str(1000000000 + i % 50),
+        },
+        "defendant": {"name": "Ministry of X", "party_type": "GOVERNMENT", "role": "DEFENDANT"},
+        "documents": [],
+    }
+
+
+def submit(i, args, document):
+    payload = build_payload(i, not args.repeat)
+    files = [("documents", (args.document_name, document, "application/pdf"))] if document else None
+    started = time.perf_counter()
+    try:
+        response = session().post(args.url, data={"data": json.dumps(payload)}, files=files, timeout=args.timeout)
+        outcome = str(response.status_code)
+        if args.wait_analysis and response.status_code == 202:
+            outcome = wait_for_analysis(response.json()["analysis_url"], args)
+    except requests.RequestException as e:
+        outcome = type(e).__name__
+    return time.perf_counter() - started, outcome
+
+
+def wait_for_analysis(url, args):
+    deadline = time.perf_counter() + args.timeout
+    while time.perf_counter() < deadline:
+        response = session().get(url, timeout=args.timeout)
+        if response.status_code != 200:
+            return f"poll-{response.status_code}"
+        job_status = response.json()["job"]["status"]
+        if job_status in ("DONE", "FAILED"):
+            return "202" if job_status == "DONE" else "analysis-failed"
+        time.sleep(args.poll_interval)
+    return "analysis-timeout"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/cases/submit_and_validate/")
+    parser.add_argument("--requests", type=int, default=100, help="Total submissions to send")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent client threads")
+    parser.add_argument("--document", help="PDF to attach to every submission (default: a tiny built-in PDF)")
+    parser.add_argument("--no-document", action="store_true", help="Submit without attachments")
+    parser.add_argument("--repeat", action="store_true", help="Send identical descriptions (exercises the LLM cache)")
+    parser.add_argument("--wait-analysis", action="store_true", help="Measure until the AI analysis is done, not just the 202")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    document = None
+    args.document_name = "load_test.pdf"
+    if not args.no_document:
+        if args.document:
+            with open(args.document, "rb") as f:
+                document = f.read()
+            args.document_name = args.document.rsplit("/", 1)[-1]
+        else:
+            document = MINIMAL_PDF
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda i: submit(i, args, document), range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    ok_latencies = sorted(latency for latency, outcome in results if outcome in ("201", "202"))
+    outcomes = Counter(outcome for _, outcome in results)
+    errors = sum(n for outcome, n in outcomes.items() if outcome not in ("201", "202"))
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / args.requests, 4) if args.requests else 0.0,
+        "latency_s": {
+            "p50": round(percentile(ok_latencies, 50), 4),
+            "p95": round(percentile(ok_latencies, 95), 4),
+            "p99": round(percentile(ok_latencies, 99), 4),
+            "max": round(ok_latencies[-1], 4) if ok_latencies else 0.0,
+        },
+        "outcomes": dict(outcomes),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Sent {report['requests']} requests with concurrency {report['concurrency']} in {report['elapsed_s']}s")
+    print(f"Throughput: {report['throughput_rps']} req/s, error rate: {report['error_rate']:.2%}")
+    latency = report["latency_s"]
+    print(f"Latency p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s max={latency['max']}s")
+    print("Outcomes:", ", ".join(f"{k}: {v}" for k, v in sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -123,8 +123,17 @@ async function submitCase() {
             throw new Error(result.error || JSON.stringify(result));
         }
 
-        // 4. Redirect to Success Page
-        window.location.href = "/success/";
+        // 4. Case is saved and validated; show the rule results now and the AI reasoning as it is written
+        document.getElementById('loading-text').innerText = "جاري التحليل الذكي للدعوى...";
+        if (window.EventSource && result.stream_url) {
+            renderDashboard(result);
+            document.getElementById('ai-reasoning-body').innerText = "";
+            streamAnalysis(result);
+        } else {
+            await pollAnalysis(result.analysis_url);
+            // 5. Redirect to Success Page
+            window.location.href = "/success/";
+        }
 
     } catch (error) {
         console.error("Submission Error:", error);
@@ -134,6 +143,51 @@ async function submitCase() {
     }
 }
 
+// Polls the analysis endpoint until the worker has finished (or we give up waiting).
+// The case is already stored at this point, so a timeout is not an error.
+async function pollAnalysis(url, intervalMs = 1500, maxWaitMs = 60000) {
+    const deadline = Date.now() + maxWaitMs;
+    while (Date.now() < deadline) {
+        const response = await fetch(url);
+        if (response.ok) {
+            const data = await response.json();
+            if (data.job.status === "DONE" || data.job.status === "FAILED") {
+                return data;
+            }
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    return null;
+}
+
+// Follows the submission's event stream: rule results first, then the Gemini
+// reasoning piece by piece. Falls back to polling if the stream breaks off.
+function streamAnalysis(submission) {
+    const source = new EventSource(submission.stream_url);
+    const reasoningBody = document.getElementById('ai-reasoning-body');
+    const reasoning = document.createElement('p');
+    reasoning.style = "line-height: 1.8; color: #e2e8f0; white-space: pre-wrap;";
+    reasoningBody.appendChild(reasoning);
+    let finished = false;
+
+    const finish = async (data) => {
+        finished = true;
+        source.close();
+        renderDashboard(data || await pollAnalysis(submission.analysis_url) || submission);
+    };
+
+    source.addEventListener('validation', (event) => renderDashboard(JSON.parse(event.data)));
+    source.addEventListener('reasoning', (event) => {
+        reasoning.textContent += JSON.parse(event.data).delta;
+    });
+    source.addEventListener('done', (event) => finish(JSON.parse(event.data)));
+    source.addEventListener('timeout', () => finish(null));
+    // Server-sent `error` events and dropped connections both land here
+    source.addEventListener('error', () => {
+        if (!finished) finish(null);
+    });
+}
+
 function renderDashboard(data) {
     document.getElementById('loading').classList.add('hidden');
     document.getElementById('dashboard').classList.remove('hidden');
@@ -152,8 +206,10 @@ function renderDashboard(data) {
 
     // AI Reasoning
     const aiDiv = document.getElementById('ai-reasoning-body');
-    const reasoningText = data.ai_insight.generated_reasoning || "لا يوجد تسبيب متاح.";
-    aiDiv.innerHTML = `<p style="line-height: 1.8; color: #e2e8f0;">${reasoningText}</p>`;
+    if (data.ai_insight.generated_reasoning !== null) {
+        const reasoningText = data.ai_insight.generated_reasoning || "لا يوجد تسبيب متاح.";
+        aiDiv.innerHTML = `<p style="line-height: 1.8; color: #e2e8f0;">${reasoningText}</p>`;
+    }
 
     // Validation Steps
     const list = document.getElementById('validation-list');
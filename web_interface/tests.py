@@ -1,3 +1,62 @@
+import datetime
+from urllib.parse import parse_qs
+
 from django.test import TestCase
 
-# Create your tests here.
+from legal_engine.models import Case, Party, ValidationResult
+from legal_engine.services.party_resolver import PartyResolver
+
+
+class JudgeDashboardTests(TestCase):
+    def setUp(self):
+        plaintiff, defendant = PartyResolver().resolve_many([
+            {'name': "Ahmed", 'party_type': Party.PartyType.INDIVIDUAL, 'role': Party.Role.PLAINTIFF},
+            {'name': "Ministry", 'party_type': Party.PartyType.GOVERNMENT, 'role': Party.Role.DEFENDANT},
+        ])
+        self.cases = []
+        for i in range(7):
+            case = Case.objects.create(
+                title=f"Case {i}", description="تظلم من قرار", incident_date=datetime.date.today(),
+                court_type="Administrative", plaintiff=plaintiff, defendant=defendant,
+                status=Case.CaseStatus.PENDING_JUDGE,
+            )
+            ValidationResult.objects.create(case=case, is_accepted=bool(i % 2))
+            self.cases.append(case)
+        # Two submission days, so pages cross a date boundary as well as id ties within a day
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        Case.objects.filter(pk__in=[case.pk for case in self.cases[4:]]).update(submission_date=yesterday)
+
+    def pages(self, query):
+        ids, url = [], f'/judge-dashboard/?{query}'
+        while url:
+            response = self.client.get(url)
+            ids.append([case.id for case in response.context['cases']])
+            url = f"/judge-dashboard/?{response.context['next_query']}" if response.context['next_query'] else None
+        return ids
+
+    def test_pages_follow_the_submission_date_and_id_order(self):
+        pk = [case.pk for case in self.cases]
+        # Newest day first (cases 0-3), then yesterday (4-6); within a day, highest id first
+        self.assertEqual(self.pages('page_size=3'), [
+            [pk[3], pk[2], pk[1]], [pk[0], pk[6], pk[5]], [pk[4]],
+        ])
+        self.assertEqual(self.pages('page_size=4'), [[pk[3], pk[2], pk[1], pk[0]], [pk[6], pk[5], pk[4]]])
+
+    def test_filters_are_kept_across_pages(self):
+        response = self.client.get('/judge-dashboard/?outcome=accepted&page_size=2')
+        self.assertEqual(parse_qs(response.context['next_query'])['outcome'], ['accepted'])
+        accepted = [case.pk for case in self.cases if case.validation_result.is_accepted]
+        self.assertEqual(sorted(sum(self.pages('outcome=accepted&page_size=2'), [])), sorted(accepted))
+
+    def test_query_count_does_not_depend_on_page_size_or_position(self):
+        # The page of cases with their parties and result, then the precedents of every card
+        for query in ('page_size=2', 'page_size=7', f'page_size=2&before={datetime.date.today()}_{self.cases[2].pk}'):
+            with self.assertNumQueries(2):
+                self.client.get(f'/judge-dashboard/?{query}')
+
+    def test_page_size_is_clamped_to_a_valid_range(self):
+        for value in ('0', '-3'):
+            response = self.client.get(f'/judge-dashboard/?page_size={value}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([case.id for case in response.context['cases']], [self.cases[3].pk])
+            self.assertIn('page_size=1', response.context['next_query'])
@@ -1,5 +1,10 @@
+import datetime
+from urllib.parse import urlencode
+
+from django.db.models import Q
 from django.shortcuts import render
-from legal_engine.models import Case
+from legal_engine.models import Case, CasePrecedent
+from legal_engine.services.search import get_search_backend, parse_query
 
 def index(request):
     return render(request, 'index.html')
@@ -7,9 +12,96 @@ def index(request):
 def about(request):
     return render(request, 'about.html')
 
+DASHBOARD_PAGE_SIZE = 20
+DASHBOARD_MAX_PAGE_SIZE = 100
+# Full-text matches considered by the dashboard search box
+DASHBOARD_SEARCH_LIMIT = 500
+# Precomputed similar earlier cases shown on each card
+DASHBOARD_PRECEDENTS = 3
+
+
+def _parse_cursor(value):
+    """
+    Keyset cursor '<submission_date>_<id>' of the last case on the previous page.
+    """
+    try:
+        day, case_id = value.split('_', 1)
+        return datetime.date.fromisoformat(day), int(case_id)
+    except (AttributeError, ValueError):
+        return None
+
+
 def judge_dashboard(request):
-    cases = Case.objects.select_related('plaintiff', 'validation_result').order_by('-submission_date')
-    return render(request, 'judge_dashboard.html', {'cases': cases})
+    """
+    Newest-first case list with server-side filters and keyset (seek) pagination.
+    Each page is one indexed query whatever the table size (see Case.Meta.indexes),
+    plus one for the precomputed precedents shown on the cards.
+    """
+    filters = {
+        'q': request.GET.get('q', '').strip(),
+        'status': request.GET.get('status', ''),
+        'court_type': request.GET.get('court_type', '').strip(),
+        'outcome': request.GET.get('outcome', ''),
+    }
+    try:
+        page_size = max(1, min(int(request.GET.get('page_size', DASHBOARD_PAGE_SIZE)), DASHBOARD_MAX_PAGE_SIZE))
+    except ValueError:
+        page_size = DASHBOARD_PAGE_SIZE
+
+    cases = Case.objects.select_related('plaintiff', 'defendant', 'validation_result')
+    if filters['status'] in Case.CaseStatus.values:
+        cases = cases.filter(status=filters['status'])
+    if filters['court_type']:
+        cases = cases.filter(court_type=filters['court_type'])
+    if filters['outcome'] == 'accepted':
+        cases = cases.filter(validation_result__is_accepted=True)
+    elif filters['outcome'] == 'rejected':
+        cases = cases.filter(validation_result__is_accepted=False)
+    if filters['q']:
+        query = parse_query(filters['q'])
+        hits = get_search_backend().search(query, DASHBOARD_SEARCH_LIMIT) if query.terms else []
+        cases = cases.filter(id__in=[case_id for case_id, _ in hits])
+
+    cursor = _parse_cursor(request.GET.get('before'))
+    if cursor:
+        day, case_id = cursor
+        cases = cases.filter(Q(submission_date__lt=day) | Q(submission_date=day, id__lt=case_id))
+
+    page = list(cases.order_by('-submission_date', '-id')[:page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+
+    # One extra query for the whole page: the top precedents of every card
+    precedents = (
+        CasePrecedent.objects.filter(case__in=page, rank__lte=DASHBOARD_PRECEDENTS)
+        .select_related('precedent__validation_result')
+        .only('case_id', 'similarity', 'rank', 'precedent__id', 'precedent__title',
+              'precedent__validation_result__is_accepted')
+        .order_by('rank')
+    )
+    by_case = {}
+    for precedent in precedents:
+        by_case.setdefault(precedent.case_id, []).append(precedent)
+    for case in page:
+        case.top_precedents = by_case.get(case.id, [])
+
+    next_query = None
+    if has_next:
+        last = page[-1]
+        params = {k: v for k, v in filters.items() if v}
+        params['before'] = f"{last.submission_date.isoformat()}_{last.id}"
+        if page_size != DASHBOARD_PAGE_SIZE:
+            params['page_size'] = page_size
+        next_query = urlencode(params)
+
+    return render(request, 'judge_dashboard.html', {
+        'cases': page,
+        'filters': filters,
+        'status_choices': Case.CaseStatus.choices,
+        'next_query': next_query,
+        'is_first_page': cursor is None,
+        'first_query': urlencode({k: v for k, v in filters.items() if v}),
+    })
 
 def success_page(request):
     return render(request, 'success.html')